@@ -1,60 +1,108 @@
-from bs4 import BeautifulSoup
-import shelve
-import os, re
-
-
-
-
-stop_words = {
-    "a", "about", "above", "after", "again", "against", "all", "am", "an", "and", "any", "are", "arent", "as", "at",
-    "be", "because", "been", "before", "being", "below", "between", "both", "but", "by", "cant", "cannot", "could",
-    "couldnt", "did", "didnt", "do", "does", "doesnt", "doing", "dont", "down", "during", "each", "few", "for",
-    "from", "further", "had", "hadnt", "has", "hasnt", "have", "havent", "having", "he", "hed", "hell", "hes",
-    "her", "here", "heres", "hers", "herself", "him", "himself", "his", "how", "hows", "i", "id", "ill", "im",
-    "ive", "if", "in", "into", "is", "isnt", "it", "its", "itself", "lets", "me", "more", "most", "mustnt",
-    "my", "myself", "no", "nor", "not", "of", "off", "on", "once", "only", "or", "other", "ought", "our", "ours",
-    "ourselves", "out", "over", "own", "same", "shant", "she", "shed", "shell", "shes", "should", "shouldnt",
-    "so", "some", "such", "than", "that", "thats", "the", "their", "theirs", "them", "themselves", "then", "there",
-    "theres", "these", "they", "theyd", "theyll", "theyre", "theyve", "this", "those", "through", "to", "too",
-    "under", "until", "up", "very", "was", "wasnt", "we", "wed", "well", "were", "weve", "were", "werent",
-    "what", "whats", "when", "whens", "where", "wheres", "which", "while", "who", "whos", "whom", "why", "whys",
-    "with", "wont", "would", "wouldnt", "you", "youd", "youll", "youre", "youve", "your", "yours", "yourself",
-    "yourselves"
-}
-
-def getWords(soup, lock, url, limit = 50):
-    file_exists = os.path.exists("words.shelve")
-    with lock:
-        with shelve.open("words.shelve") as word_store:
-            if not file_exists:
-                word_store['*']=(0,None)
-
-    text = soup.get_text(separator=" ", strip=True).lower()
-    english_text = re.sub(r"[^a-z\s]", "", text)
-    words = english_text.split()
-
-    words = [word for word in words if len(word) > 2]
-
-
-    num_words = len(words)
-    if num_words < limit:
-        return 0
-    
-    counts = {}
-    for word in words:
-        if word in stop_words:
-            continue
-        if word not in counts:
-            counts[word] = 0
-        counts[word] += 1
-    
-    with lock:
-        with shelve.open("words.shelve") as word_store:
-            for word in counts:
-                if word not in word_store:
-                    word_store[word] = 0
-                word_store[word] += counts[word]
-            if num_words > word_store['*'][0]:
-                word_store['*'] = (num_words, url)
-
-    return num_words
+import atexit
+import sqlite3
+import time
+from collections import Counter
+from threading import Lock
+
+
+class WordStore(object):
+    '''Word frequencies and the longest page of the crawl.
+
+    Workers only update an in-memory Counter under a short lock. The
+    counts are added to a sqlite database in one transaction once
+    `flush_pages` pages or `flush_seconds` have gone by, whenever the
+    store is queried or closed, and before the frontier commits pages as
+    downloaded (FrontierStore.before_commit), so a crash never loses the
+    counts of a page that will not be downloaded again.
+    '''
+    def __init__(self, path, flush_pages=200, flush_seconds=30):
+        self.path = path
+        self.flush_pages = flush_pages
+        self.flush_seconds = flush_seconds
+        self.lock = Lock()
+        self.flush_lock = Lock()
+        self.counts = Counter()
+        self.longest = (0, None)
+        self.longest_dirty = False
+        self.pending_pages = 0
+        self.last_flush = time.monotonic()
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS words "
+                    "(word TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS longest_page "
+                    "(id INTEGER PRIMARY KEY CHECK (id = 0), words INTEGER, url TEXT)")
+            row = self._db.execute(
+                "SELECT words, url FROM longest_page WHERE id = 0").fetchone()
+            if row is not None:
+                with self.lock:
+                    if row[0] > self.longest[0]:
+                        self.longest = row
+        return self._db
+
+    def add_page(self, url, counts, num_words):
+        with self.lock:
+            self.counts.update(counts)
+            if num_words > self.longest[0]:
+                self.longest = (num_words, url)
+                self.longest_dirty = True
+            self.pending_pages += 1
+            due = (self.pending_pages >= self.flush_pages or
+                   time.monotonic() - self.last_flush >= self.flush_seconds)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.flush_lock:
+            db = self._connect()
+            with self.lock:
+                counts, self.counts = self.counts, Counter()
+                longest, longest_dirty = self.longest, self.longest_dirty
+                self.longest_dirty = False
+                self.pending_pages = 0
+                self.last_flush = time.monotonic()
+            if not counts and not longest_dirty:
+                return
+            with db:
+                db.executemany(
+                    "INSERT INTO words (word, count) VALUES (?, ?) "
+                    "ON CONFLICT (word) DO UPDATE SET count = count + excluded.count",
+                    counts.items())
+                if longest_dirty:
+                    db.execute(
+                        "INSERT INTO longest_page (id, words, url) VALUES (0, ?, ?) "
+                        "ON CONFLICT (id) DO UPDATE SET words = excluded.words, url = excluded.url "
+                        "WHERE excluded.words > longest_page.words",
+                        longest)
+
+    def top_words(self, n=50):
+        '''[(word, count)] of the n most frequent words'''
+        self.flush()
+        with self.flush_lock:
+            return self._db.execute(
+                "SELECT word, count FROM words ORDER BY count DESC, word LIMIT ?",
+                (n,)).fetchall()
+
+    def longest_page(self):
+        '''(number of words, url) of the longest page crawled'''
+        self.flush()
+        with self.lock:
+            return self.longest
+
+    def close(self):
+        if self._db is None and not self.pending_pages:
+            return
+        self.flush()
+        with self.flush_lock:
+            self._db.close()
+            self._db = None
+
+
+word_store = WordStore("words.db")
+atexit.register(word_store.close)
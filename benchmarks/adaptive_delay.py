@@ -0,0 +1,92 @@
+'''Crawl of a stub site where some hosts answer every request slowly with
+a server error, with the fixed POLITENESS delay and with the adaptive
+per-host delay. Reports when the last page of a healthy host was
+downloaded, how many requests went to the failing hosts in that time, and
+the shortest gap between two downloads from the same healthy host, which
+must not be below POLITENESS.
+
+    python -m benchmarks.adaptive_delay --failing 4 --threads 4
+'''
+import logging
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+from multiprocessing import Process
+
+from benchmarks.stub_cache_server import StubCacheServer, SyntheticSite, make_payload, make_config
+
+
+class FlakySite(SyntheticSite):
+    '''SyntheticSite whose first `failing` hosts take `fail_latency`
+    seconds to answer 500, remembering when each url was served.'''
+    def __init__(self, hosts, pages, failing, fail_latency):
+        super().__init__(hosts, pages)
+        self.failing = set(self.hosts[:failing])
+        self.fail_latency = fail_latency
+        self.served = []
+
+    def payload(self, url):
+        host = url.split("/")[2]
+        self.served.append((host, time.monotonic()))
+        if host in self.failing:
+            time.sleep(self.fail_latency)
+            return make_payload(url, 500, b"")
+        return super().payload(url)
+
+
+def crawl(cache_server, seed_urls, properties):
+    os.chdir(tempfile.mkdtemp())
+    logging.disable(logging.CRITICAL)
+    from crawler import Crawler
+    config = make_config(cache_server, seed_urls, **properties)
+    Crawler(config, True).start()
+
+
+def main(args):
+    site = FlakySite(args.hosts, args.pages, args.failing, args.fail_latency)
+    server = StubCacheServer(site, latency=args.latency)
+    cache_server = server.start()
+
+    print(f"{'delay':>9} {'healthy':>8} {'done at':>8} {'failing':>8} {'min gap':>8}")
+    for adaptive in (False, True):
+        site.served = []
+        process = Process(target=crawl, args=(cache_server, site.seed_urls(), {
+            "politeness": args.politeness,
+            "adaptivedelay": adaptive,
+            "threadcount": args.threads}))
+        start = time.monotonic()
+        process.start()
+        # parked hosts keep the crawl going long after the healthy ones are
+        # done, so it is cut off after a while
+        process.join(args.timeout)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+        healthy = [(host, at) for host, at in site.served if host not in site.failing]
+        done_at = max(at for _, at in healthy) - start
+        failing = sum(1 for host, at in site.served
+                      if host in site.failing and at - start <= done_at)
+        times = defaultdict(list)
+        for host, at in healthy:
+            times[host].append(at)
+        gap = min(later - earlier for stamps in times.values()
+                  for earlier, later in zip(stamps, stamps[1:]))
+        print(f"{'adaptive' if adaptive else 'fixed':>9} {len(healthy):>8} "
+              f"{done_at:>8.2f} {failing:>8} {gap:>8.3f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=16)
+    parser.add_argument("--pages", type=int, default=25)
+    parser.add_argument("--failing", type=int, default=4)
+    parser.add_argument("--fail-latency", type=float, default=0.5)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--politeness", type=float, default=0.2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    main(parser.parse_args())
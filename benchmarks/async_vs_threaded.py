@@ -0,0 +1,60 @@
+'''Pages per second of the threaded Crawler and the AsyncCrawler against a
+local stub cache server that adds a fixed latency to every download.
+
+    python -m benchmarks.async_vs_threaded --latency 0.05 --threads 4
+'''
+import logging
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from multiprocessing import Process, Queue
+
+from benchmarks.stub_cache_server import StubCacheServer, SyntheticSite, make_config
+
+
+def crawl(mode, cache_server, site, properties, results):
+    # separate process and directory so the shelves and the module level
+    # simhash index start empty for every run
+    os.chdir(tempfile.mkdtemp())
+    logging.disable(logging.CRITICAL)
+    from crawler import Crawler, AsyncCrawler
+    config = make_config(cache_server, site.seed_urls(), **properties)
+    crawler = (AsyncCrawler if mode == "async" else Crawler)(config, True)
+    start = time.perf_counter()
+    crawler.start()
+    results.put(time.perf_counter() - start)
+
+
+def main(args):
+    site = SyntheticSite(args.hosts, args.pages)
+    server = StubCacheServer(site, latency=args.latency)
+    cache_server = server.start()
+    properties = {
+        "politeness": args.politeness,
+        "threadcount": args.threads,
+        "concurrency": args.concurrency}
+
+    print(f"{'mode':>10} {'pages':>8} {'seconds':>8} {'pages/s':>8}")
+    for mode in ("threaded", "async"):
+        server.requests = 0
+        results = Queue()
+        process = Process(
+            target=crawl, args=(mode, cache_server, site, properties, results))
+        process.start()
+        elapsed = results.get()
+        process.join()
+        print(f"{mode:>10} {server.requests:>8} {elapsed:>8.2f} "
+              f"{server.requests / elapsed:>8.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=16)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--politeness", type=float, default=0.0)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=100)
+    main(parser.parse_args())
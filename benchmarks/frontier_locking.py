@@ -0,0 +1,89 @@
+'''Pages per second of the threaded Crawler for growing numbers of threads,
+with downloads that only sleep `latency` seconds and pages parsed ahead
+of time, so what is left is the frontier, dedup and the stores. Reports
+the time workers waited for the dedup lock and the time add_urls took per
+page, and how long the crawl took to stop after its last download.
+
+    python -m benchmarks.frontier_locking --hosts 50 --pages 100 --threads 1 8 32
+'''
+import logging
+import os
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import Counter
+from multiprocessing import Process, Queue
+from types import SimpleNamespace
+
+from benchmarks.stub_cache_server import WORDS, make_config
+
+
+def site(hosts, pages, links=20):
+    '''url -> what parse_page returns for it, pages per host, every page
+    linking to pages of its own host and of others.'''
+    rng = random.Random(0)
+    urls = [f"https://host{host}.ics.uci.edu/page/{number}"
+            for host in range(hosts) for number in range(pages)]
+    parsed = {}
+    for url in urls:
+        words = [rng.choice(WORDS) + rng.choice(WORDS) for _ in range(200)]
+        parsed[url] = (rng.getrandbits(64), Counter(words), len(words),
+                       rng.sample(urls, links))
+    return parsed
+
+
+def crawl(parsed, seed_urls, latency, threads, results):
+    os.chdir(tempfile.mkdtemp())
+    logging.disable(logging.CRITICAL)
+    import scraper
+    import crawler.worker
+    from crawler import Crawler
+    from utils.telemetry import telemetry
+    finished = []
+
+    def download(url, config, logger):
+        time.sleep(latency)
+        return SimpleNamespace(url=url, status=200, raw_response=None)
+
+    def parse_response(url, resp):
+        finished.append(time.perf_counter())
+        return parsed[url]
+
+    crawler.worker.download = download
+    scraper.parse_response = parse_response
+    config = make_config(None, seed_urls, politeness=0, robots=False,
+                         sitemaps=False, threadcount=threads)
+    crawl = Crawler(config, True)
+    start = time.perf_counter()
+    crawl.start()
+    end = time.perf_counter()
+    stages = telemetry.snapshot()["stages"]
+    results.put((len(finished), end - start, end - max(finished),
+                 stages["dedup_wait"]["sum"], stages["add_urls"]["sum"]))
+
+
+def main(args):
+    parsed = site(args.hosts, args.pages)
+    seed_urls = [f"https://host{host}.ics.uci.edu/page/0" for host in range(args.hosts)]
+    results = Queue()
+    print(f"{'threads':>7} {'pages':>6} {'seconds':>8} {'pages/s':>8} "
+          f"{'dedup wait ms':>13} {'add_urls ms':>11} {'stop ms':>8}")
+    for threads in args.threads:
+        process = Process(target=crawl, args=(
+            parsed, seed_urls, args.latency, threads, results))
+        process.start()
+        pages, seconds, stop, wait, add = results.get()
+        process.join()
+        print(f"{threads:>7} {pages:>6} {seconds:>8.2f} {pages / seconds:>8.1f} "
+              f"{wait / pages * 1e3:>13.3f} {add / pages * 1e3:>11.3f} "
+              f"{stop * 1e3:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    main(parser.parse_args())
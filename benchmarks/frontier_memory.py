@@ -0,0 +1,180 @@
+'''Memory of the frontier's queues: RSS per queued url of UrlHeap and of
+the heap of entry lists it replaced, every url a str in a list entry, for
+urls spread over many domains. Also times pushing and popping them and
+checks that both hand out the same urls in the same order, links
+included.
+
+    python -m benchmarks.frontier_memory --urls 500000 --domains 200
+'''
+import random
+import resource
+import time
+from argparse import ArgumentParser
+from heapq import heappush, heappop, heapify
+from itertools import count
+from math import log2
+from multiprocessing import Process, Queue
+
+from crawler.priority import UrlHeap, url_priority, INLINK_WEIGHT
+
+
+class EntryHeap(object):
+    '''UrlHeap of entry lists: url -> [priority, order, url, links].'''
+    __slots__ = ("heap", "entries", "order")
+
+    def __init__(self):
+        self.heap = list()
+        self.entries = {}
+        self.order = count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def push(self, url, priority, links=1):
+        if url in self.entries:
+            return
+        entry = [priority, next(self.order), url, links]
+        self.entries[url] = entry
+        heappush(self.heap, entry)
+
+    def pop(self):
+        while self.heap:
+            entry = heappop(self.heap)
+            if entry[2] is not None:
+                del self.entries[entry[2]]
+                return entry[2]
+        return None
+
+    def linked(self, url):
+        entry = self.entries.get(url)
+        if entry is None:
+            return False
+        links = entry[3] + 1
+        entry[2] = None
+        moved = [self._moved(entry, links), entry[1], url, links] + entry[4:]
+        self.entries[url] = moved
+        heappush(self.heap, moved)
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.heap = [entry for entry in self.heap if entry[2] is not None]
+            heapify(self.heap)
+        return True
+
+    def _moved(self, entry, links):
+        return entry[0] - INLINK_WEIGHT * (log2(links) - log2(links - 1))
+
+
+class ExactEntryHeap(EntryHeap):
+    '''EntryHeap that also keeps the priority as pushed and works a moved
+    priority out from it, rounded to 9 decimals, rather than lowering it
+    link by link. Equal priorities are then equal, as in UrlHeap's fixed
+    point, and the first found comes first.'''
+    __slots__ = ()
+
+    def push(self, url, priority, links=1):
+        if url in self.entries:
+            return
+        entry = [priority, next(self.order), url, links,
+                 priority + INLINK_WEIGHT * log2(links)]
+        self.entries[url] = entry
+        heappush(self.heap, entry)
+
+    def _moved(self, entry, links):
+        return round(entry[4] - INLINK_WEIGHT * log2(links), 9)
+
+
+def urls(number, domains, seed=0):
+    '''number (domain, url) of department-site shapes over domains hosts.'''
+    rng = random.Random(seed)
+    hosts = [f"www.host{i}.ics.uci.edu" for i in range(domains)]
+    shapes = (
+        "/~user{a}/courses/cs{b}/lecture{c}.html",
+        "/people/faculty/profile{a}",
+        "/news/{b}/article-{c}",
+        "/wiki/Project{a}?do=revisions&rev={c}",
+        "/events/list/?page={b}&tribe-bar-search=seminar{a}",
+        "/research/areas/group{a}/publications/paper{c}")
+    for _ in range(number):
+        host = rng.choice(hosts)
+        shape = rng.choice(shapes)
+        yield host, "https://" + host + shape.format(
+            a=rng.randrange(1000), b=rng.randrange(100), c=rng.randrange(100000))
+
+
+def rss():
+    '''Peak resident set of this process in bytes (Linux reports KB).'''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss << 10
+
+
+def measure(heap_class, number, domains, results):
+    # urls are made as they are pushed, like the frontier's, so the heap
+    # that keeps them pays for them; making them is timed on its own
+    start = time.process_time()
+    for _, url in urls(number, domains):
+        url_priority(url)
+    making = time.process_time() - start
+    before = rss()
+    start = time.process_time()
+    queues = {}
+    for domain, url in urls(number, domains):
+        heap = queues.get(domain)
+        if heap is None:
+            heap = queues[domain] = heap_class()
+        heap.push(url, url_priority(url))
+    pushed = time.process_time() - start - making
+    queued = sum(len(heap) for heap in queues.values())
+    grown = rss() - before
+    start = time.process_time()
+    for heap in queues.values():
+        while heap.pop() is not None:
+            pass
+    popped = time.process_time() - start
+    results.put((queued, grown, pushed, popped))
+
+
+def order(heap_class, number, domains):
+    '''Every url popped from one heap per domain, with a link to a random
+    queued url after every push and pops mixed in.'''
+    rng = random.Random(1)
+    queues = {}
+    popped = []
+    seen = []
+    for domain, url in urls(number, domains, seed=2):
+        heap = queues.setdefault(domain, heap_class())
+        heap.push(url, url_priority(url))
+        seen.append((domain, url))
+        linked_domain, linked_url = rng.choice(seen)
+        queues[linked_domain].linked(linked_url)
+        if rng.random() < 0.3:
+            popped.append(queues[rng.choice(seen)[0]].pop())
+    for heap in queues.values():
+        while len(heap):
+            popped.append(heap.pop())
+    return popped
+
+
+def main(args):
+    results = Queue()
+    print(f"{'heap':>10} {'urls':>8} {'MB':>8} {'bytes/url':>10} "
+          f"{'push us':>8} {'pop us':>7}")
+    per_url = {}
+    for name, heap_class in (("entries", EntryHeap), ("UrlHeap", UrlHeap)):
+        process = Process(target=measure, args=(
+            heap_class, args.urls, args.domains, results))
+        process.start()
+        queued, grown, pushed, popped = results.get()
+        process.join()
+        per_url[name] = grown / queued
+        print(f"{name:>10} {queued:>8} {grown / 2 ** 20:>8.1f} "
+              f"{per_url[name]:>10.1f} {pushed / queued * 1e6:>8.2f} "
+              f"{popped / queued * 1e6:>7.2f}")
+    print(f"reduction: {per_url['entries'] / per_url['UrlHeap']:.1f}x")
+    same = order(ExactEntryHeap, args.check, 20) == order(UrlHeap, args.check, 20)
+    print(f"same order on {args.check} urls with links: {same}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=500000)
+    parser.add_argument("--domains", type=int, default=200)
+    parser.add_argument("--check", type=int, default=20000)
+    main(parser.parse_args())
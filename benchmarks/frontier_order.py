@@ -0,0 +1,113 @@
+'''Order in which the frontier hands out urls, on a link graph with a few
+pages worth crawling per host (home, sections, articles) next to deep
+paging and wiki revision traps. Every download is simulated, so only the
+frontier is measured. Reports how many of the pages worth crawling were
+fetched within a budget of as many downloads as there are such pages, for
+the priority frontier and for the last-in first-out lists it replaced,
+and the most urls held in memory with a small QUEUEWINDOW.
+
+    python -m benchmarks.frontier_order --hosts 4 --window 50
+'''
+import logging
+import os
+import re
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import crawler.frontier
+from benchmarks.stub_cache_server import make_config
+from crawler.frontier import Frontier
+from crawler.priority import UrlHeap
+
+SECTIONS = 20
+ARTICLES = 5
+TRAP_DEPTH = 2000
+VALUABLE = re.compile(r"^https://[^/]+(?:/section/\d+(?:/article/\d+)?)?/?$")
+
+
+class ListHeap(list):
+    '''The frontier's per domain list before priorities: last in first out.'''
+    def push(self, url, priority, links=1):
+        self.append(url)
+
+    def linked(self, url):
+        return False
+
+    def trim(self, size):
+        pass
+
+
+def links(url):
+    # the frontier strips the slash of a home page
+    host, _, path = url.split("/", 2)[2].partition("/")
+    base = f"https://{host}/"
+    if path == "":
+        return ([f"{base}section/{i}" for i in range(SECTIONS)]
+                + [f"{base}news?page=1", f"{base}wiki/Main?oldid=1"])
+    match = re.match(r"section/(\d+)$", path)
+    if match:
+        return ([f"{path}/article/{j}" for j in range(ARTICLES)]
+                + [base, f"{base}news?page=1"])
+    match = re.match(r"section/(\d+)/article/(\d+)$", path)
+    if match:
+        return [base, f"{base}section/{match[1]}",
+                f"{base}wiki/Article{match[1]}x{match[2]}?oldid=1"]
+    match = re.match(r"news\?page=(\d+)$", path)
+    if match:
+        number = int(match[1])
+        more = [f"{base}news?page={number + 1}"] if number < TRAP_DEPTH else []
+        return more + [f"{base}news/{number}/{k}" for k in range(3)]
+    match = re.match(r"wiki/(\w+)\?oldid=(\d+)$", path)
+    if match:
+        number = int(match[2])
+        more = ([f"{base}wiki/{match[1]}?oldid={number + 1}"]
+                if number < TRAP_DEPTH else [])
+        return more + [f"{base}wiki/{match[1]}?oldid={number}&diff=prev"]
+    return []
+
+
+def crawl(hosts, heap_class, window):
+    os.chdir(tempfile.mkdtemp())
+    crawler.frontier.UrlHeap = heap_class
+    seeds = [f"https://host{i}.ics.uci.edu/" for i in range(hosts)]
+    config = make_config(None, seeds, politeness=0.0, robots=False,
+                         sitemaps=False, queuewindow=window)
+    frontier = Frontier(config, True)
+    budget = hosts * (1 + SECTIONS + SECTIONS * ARTICLES)
+    valuable = 0
+    most_queued = 0
+    start = time.perf_counter()
+    for _ in range(budget):
+        url = frontier.get_tbd_url()
+        if url is None:
+            break
+        valuable += VALUABLE.match(url) is not None
+        frontier.add_urls([link if link.startswith("https") else
+                           f"https://{url.split('/')[2]}/{link}" for link in links(url)])
+        frontier.mark_url_complete(url)
+        most_queued = max(most_queued, frontier._queued_urls())
+    elapsed = time.perf_counter() - start
+    frontier.store.close()
+    crawler.frontier.UrlHeap = UrlHeap
+    return valuable, budget, most_queued, elapsed
+
+
+def main(args):
+    logging.disable(logging.CRITICAL)
+    print(f"{'frontier':>10} {'worth it':>9} {'of':>6} {'in memory':>10} {'ms/url':>7}")
+    # the lists were never spilled
+    for name, heap_class, window in (("lifo", ListHeap, 1 << 30),
+                                     ("priority", UrlHeap, 1 << 30),
+                                     ("windowed", UrlHeap, args.window)):
+        valuable, budget, most_queued, elapsed = crawl(
+            args.hosts, heap_class, window)
+        print(f"{name:>10} {valuable:>9} {budget:>6} {most_queued:>10} "
+              f"{elapsed / budget * 1e3:>7.3f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--window", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,97 @@
+'''Time a crawler thread spends per logged message: the previous
+get_logger, writing to its file and console handlers in the calling thread
+(one more pair per get_logger call for the same name), against the queue
+fed by utils.logs, where the time also covers the writer thread catching
+up on the same cores. Console output goes to /dev/null for both.
+
+    python -m benchmarks.log_latency --messages 20000 --threads 4
+'''
+import logging
+import os
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from queue import SimpleQueue
+from threading import Thread
+
+
+def reference_logger(name, filename=None):
+    '''get_logger before utils.logs'''
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    if not os.path.exists("Logs"):
+        os.makedirs("Logs")
+    fh = logging.FileHandler(f"Logs/{filename if filename else name}.log")
+    fh.setLevel(logging.DEBUG)
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    formatter = logging.Formatter(
+       "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    fh.setFormatter(formatter)
+    ch.setFormatter(formatter)
+    logger.addHandler(fh)
+    logger.addHandler(ch)
+    return logger
+
+
+def run(loggers, messages, extra=None):
+    '''seconds per message with every thread logging through its logger'''
+    def log(logger):
+        for i in range(messages):
+            logger.info(f"Downloaded https://www.ics.uci.edu/page/{i}, "
+                        f"status <200>, using cache ('127.0.0.1', 9000).",
+                        extra=extra)
+    threads = [Thread(target=log, args=(logger,)) for logger in loggers]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (time.perf_counter() - start) / (messages * len(loggers))
+
+
+def main(messages, threads, sample):
+    os.chdir(tempfile.mkdtemp())
+    sys.stderr = open(os.devnull, "w")
+    from utils import logs
+    from utils.logs import get_logger, stop_logging, PER_URL
+    logs.settings["sample"] = sample
+
+    old = [reference_logger(f"old-{i}", "Worker") for i in range(threads)]
+    old_time = run(old, messages)
+
+    # cost in the logging thread alone, with no writer taking the GIL
+    unread = logging.getLogger("unread")
+    unread.propagate = False
+    unread.setLevel(logging.INFO)
+    unread.addHandler(logs._LogfileHandler(SimpleQueue(), "Worker"))
+    enqueue_time = run([unread] * threads, messages)
+
+    new = [get_logger(f"new-{i}", "Worker") for i in range(threads)]
+    new_time = run(new, messages)
+    stop_logging()
+    # starts the writer again
+    new = [get_logger(f"new-{i}", "Worker") for i in range(threads)]
+    sampled_time = run(new, messages, PER_URL)
+    stop_logging()
+
+    print(f"{threads} threads x {messages} messages", file=sys.__stdout__)
+    for label, seconds in (("synchronous", old_time),
+                           ("enqueue only", enqueue_time),
+                           ("queued", new_time),
+                           (f"queued, 1 in {sample}", sampled_time)):
+        print(f"{label:>20} {seconds * 1e6:>8.2f} us/message", file=sys.__stdout__)
+
+
+if __name__ == "__main__":
+    # as launch.py sets them
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    parser = ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--sample", type=int, default=10)
+    args = parser.parse_args()
+    main(args.messages, args.threads, args.sample)
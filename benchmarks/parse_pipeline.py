@@ -0,0 +1,95 @@
+'''Per-stage CPU cost of processing a fetched page: the previous pipeline
+(BeautifulSoup parsing the page twice, text extracted twice) against
+page.Page parsing once with lxml and with the stdlib tokenizer.
+
+    python -m benchmarks.parse_pipeline --pages 200
+'''
+import re
+import time
+from argparse import ArgumentParser
+
+from bs4 import BeautifulSoup
+
+from benchmarks.stub_cache_server import SyntheticSite
+from page import Page
+from simhash import compute_simhash
+
+
+def realistic(site, url):
+    '''wrap a synthetic page body in the kind of markup university sites have'''
+    body = site.page(url).decode("utf-8")
+    nav = "".join(f'<li class="menu-item"><a href="/section/{i}" rel="bookmark">Section {i}</a></li>'
+                  for i in range(40))
+    return (f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+            f'<script>var config = {{"a": 1}};</script><style>.x {{color: red}}</style>'
+            f'</head><body><header><nav><ul>{nav}</ul></nav></header>'
+            f'<main><div class="content"><article>{body}</article></div></main>'
+            f'<footer><p>&copy; UC Irvine</p></footer></body></html>').encode("utf-8")
+
+
+def old_pipeline(content, timings):
+    start = time.perf_counter()
+    soup = BeautifulSoup(content, 'html.parser')
+    soup.find("meta", attrs={"name": "robots"})
+    timings["parse"] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    text = soup.get_text(separator=' ', strip=True)
+    words = re.sub(r"[^a-z\s]", "", text).lower().split()
+    timings["text"] += time.perf_counter() - start
+    start = time.perf_counter()
+    compute_simhash(words)
+    timings["simhash"] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    text = soup.get_text(separator=" ", strip=True).lower()
+    words = [word for word in re.sub(r"[^a-z\s]", "", text).split() if len(word) > 2]
+    timings["text"] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    soup = BeautifulSoup(content, 'html.parser')
+    links = [a['href'] for a in soup.find_all('a', href=True)]
+    timings["links"] += time.perf_counter() - start
+    return len(links), len(words)
+
+
+def new_pipeline(content, timings, use_lxml):
+    start = time.perf_counter()
+    page = Page(content, use_lxml=use_lxml)
+    timings["parse"] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    compute_simhash(page.words)
+    timings["simhash"] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    words = [word for word in page.words if len(word) > 2]
+    timings["text"] += time.perf_counter() - start
+    return len(page.links), len(words)
+
+
+def main(pages):
+    site = SyntheticSite(hosts=4, pages=pages)
+    documents = [realistic(site, f"https://{site.hosts[i % 4]}/page/{i // 4}")
+                 for i in range(pages)]
+    runs = {
+        "bs4 x2": lambda content, timings: old_pipeline(content, timings),
+        "stdlib": lambda content, timings: new_pipeline(content, timings, False),
+        "lxml": lambda content, timings: new_pipeline(content, timings, True),
+    }
+    stages = ("parse", "text", "simhash", "links")
+    print(f"{'pipeline':>10} " + " ".join(f"{stage:>9}" for stage in stages)
+          + f" {'ms/page':>9}")
+    for name, run in runs.items():
+        timings = dict.fromkeys(stages, 0.0)
+        for content in documents:
+            run(content, timings)
+        per_page = {stage: total / pages * 1000 for stage, total in timings.items()}
+        print(f"{name:>10} " + " ".join(f"{per_page[stage]:>9.3f}" for stage in stages)
+              + f" {sum(per_page.values()):>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    main(parser.parse_args().pages)
@@ -0,0 +1,64 @@
+'''Pages per second of the AsyncCrawler parsing pages on its threads against
+parsing them on a pool of processes, against a local stub cache server that
+serves long pages without latency, so the crawl is bound by parsing.
+
+    python -m benchmarks.parse_processes --parsers 0,2,4,8
+'''
+import logging
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from multiprocessing import Process, Queue
+
+from benchmarks.stub_cache_server import StubCacheServer, SyntheticSite, make_config
+
+
+def crawl(cache_server, site, properties, results):
+    # separate process and directory so the shelves and the module level
+    # simhash index start empty for every run
+    os.chdir(tempfile.mkdtemp())
+    logging.disable(logging.CRITICAL)
+    from crawler import AsyncCrawler
+    config = make_config(cache_server, site.seed_urls(), **properties)
+    crawler = AsyncCrawler(config, True)
+    start = time.perf_counter()
+    crawler.start()
+    results.put(time.perf_counter() - start)
+
+
+def main(args):
+    site = SyntheticSite(args.hosts, args.pages, words=args.words)
+    server = StubCacheServer(site)
+    cache_server = server.start()
+
+    print(f"{os.cpu_count()} cpus")
+    print(f"{'parsers':>8} {'pages':>8} {'seconds':>8} {'pages/s':>8}")
+    for parsers in args.parsers:
+        properties = {
+            "politeness": 0.0,
+            "threadcount": args.threads,
+            "concurrency": args.concurrency,
+            "parsers": parsers}
+        server.requests = 0
+        results = Queue()
+        process = Process(
+            target=crawl, args=(cache_server, site, properties, results))
+        process.start()
+        elapsed = results.get()
+        process.join()
+        print(f"{parsers:>8} {server.requests:>8} {elapsed:>8.2f} "
+              f"{server.requests / elapsed:>8.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=16)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--words", type=int, default=4000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--parsers", default="0,2,4,8",
+                        type=lambda value: [int(n) for n in value.split(",")])
+    main(parser.parse_args())
@@ -0,0 +1,143 @@
+'''Full crawl of a stub site, then an incremental recrawl (launch.py
+--recrawl) after a share of its pages changed, and a second recrawl once
+only the changed pages are due again. Reports the pages downloaded and
+parsed and the time every crawl took, and checks the word counts of the
+pages counted against the current version of those pages.
+
+    python -m benchmarks.recrawl --hosts 4 --pages 200 --changed 0.1
+'''
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import Counter
+from multiprocessing import Process, Queue
+
+from parsing import count_words
+from page import Page
+from utils.history import PageHistory
+from benchmarks.stub_cache_server import StubCacheServer, SyntheticSite, WORDS, make_config
+
+
+class ChangingSite(SyntheticSite):
+    '''SyntheticSite whose pages in `changed` have new words at the end,
+    different on every edit. Remembers every url served.'''
+    def __init__(self, hosts, pages):
+        super().__init__(hosts, pages)
+        self.changed = set()
+        self.edits = 0
+        self.served = []
+
+    def change(self, share, seed):
+        self.edits += 1
+        self.changed = set(random.Random(seed).sample(
+            self.urls(), int(share * len(self.urls()))))
+
+    def page(self, url):
+        content = super().page(url)
+        if content is None or url not in self.changed:
+            return content
+        rng = random.Random(f"{url}-{self.edits}")
+        news = " ".join(rng.choice(WORDS) for _ in range(40))
+        return content.replace(b"</p>", f" {news}</p>".encode())
+
+    def payload(self, url):
+        self.served.append(url)
+        return super().payload(url)
+
+
+def crawl(directory, cache_server, seed_urls, properties, restart, recrawl, results):
+    os.chdir(directory)
+    logging.disable(logging.CRITICAL)
+    from crawler import Crawler
+    import analyze_links
+    import scraper
+    config = make_config(cache_server, seed_urls, **properties)
+    config.recrawl = recrawl
+    start = time.process_time()
+    crawler = Crawler(config, restart)
+    crawler.start()
+    # a Process exits without running atexit, the next crawl needs them saved
+    crawler.frontier.store.close()
+    scraper.page_history.close()
+    scraper.page_cache.close()
+    analyze_links.word_store.close()
+    results.put((dict(scraper.page_history.outcomes), time.process_time() - start))
+
+
+def words(directory):
+    db = sqlite3.connect(os.path.join(directory, "words.db"))
+    counts = dict(db.execute("SELECT word, count FROM words WHERE count != 0"))
+    db.close()
+    return counts
+
+
+def expected_words(directory, site):
+    '''Word counts of the current version of every page the crawl in
+    directory counted, which dedup order leaves different on every crawl.'''
+    history = PageHistory(os.path.join(directory, "pages.db"))
+    counts = Counter()
+    for url in site.urls():
+        previous = history.previous(url)
+        if previous is not None and previous[1]:
+            counts.update(count_words(Page(site.page(url)).words)[0])
+    history.close()
+    return dict(counts)
+
+
+def main(args):
+    site = ChangingSite(args.hosts, args.pages)
+    server = StubCacheServer(site, latency=args.latency)
+    cache_server = server.start()
+    properties = {
+        "politeness": args.politeness,
+        "robots": False,
+        "sitemaps": False,
+        "recrawlinterval": args.interval,
+        "threadcount": args.threads}
+    results = Queue()
+
+    def run(name, directory, restart, recrawl):
+        site.served = []
+        process = Process(target=crawl, args=(
+            directory, cache_server, site.seed_urls(), properties,
+            restart, recrawl, results))
+        start = time.monotonic()
+        process.start()
+        outcomes, cpu = results.get()
+        process.join()
+        seconds = time.monotonic() - start
+        parsed = outcomes.get("new", 0) + outcomes.get("changed", 0)
+        print(f"{name:>9} {len(site.served):>8} {parsed:>7} "
+              f"{outcomes.get('unchanged', 0):>10} {seconds:>8.2f} {cpu:>6.2f}")
+
+    incremental = tempfile.mkdtemp()
+    print(f"{'crawl':>9} {'fetched':>8} {'parsed':>7} {'unchanged':>10} "
+          f"{'seconds':>8} {'cpu':>6}")
+    run("full", incremental, True, False)
+    site.change(args.changed, 1)
+    time.sleep(args.interval)
+    run("recrawl", incremental, False, True)
+    same = words(incremental) == expected_words(incremental, site)
+    print(f"word counts match the changed pages: {same}")
+
+    # unchanged pages now wait twice the interval, changed ones half of it
+    site.change(args.changed, 1)
+    time.sleep(args.interval / 2)
+    run("recrawl", incremental, False, True)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--changed", type=float, default=0.1)
+    parser.add_argument("--interval", type=float, default=30.0)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--politeness", type=float, default=0.0)
+    parser.add_argument("--threads", type=int, default=4)
+    main(parser.parse_args())
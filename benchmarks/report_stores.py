@@ -0,0 +1,133 @@
+'''Time and peak memory of writing report.txt from the stores of a large
+synthetic crawl: by scanning cache.shelve into a dict and sorting every
+word count, and with report.py, from scratch and once more after a share
+of new pages was recorded. Checks that both write the same numbers.
+
+    python -m benchmarks.report_stores --pages 1000000 --words 200000 --new 0.01
+'''
+import os
+import random
+import resource
+import shelve
+import sqlite3
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import Counter
+from multiprocessing import Process, Queue
+
+from utils import get_urlhash
+from utils.history import PageHistory
+
+
+def rss():
+    '''Peak resident set of this process in bytes (Linux reports KB).'''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss << 10
+
+
+def pages(start, number, hosts, seed=0):
+    '''number (url, normalized hash) of pages over hosts subdomains, every
+    tenth one a repeat of an earlier page's hash on its host, like a
+    page recorded again.'''
+    rng = random.Random(seed + start)
+    for i in range(start, start + number):
+        twin = i if i % 10 or not i else rng.randrange(i)
+        url = f"https://host{twin % hosts}.ics.uci.edu/page/{i}"
+        yield url, get_urlhash(f"//page/{twin}")
+
+
+def fill(directory, start, number, hosts, words):
+    '''Record pages in the pages.db and cache.shelve of directory, and
+    words in its words.db the first time.'''
+    history = PageHistory(os.path.join(directory, "pages.db"))
+    history._open()
+    rows = list(pages(start, number, hosts))
+    with history.db:
+        history.db.executemany(
+            "INSERT INTO pages (url, visited, interval, due, urlhash, recorded) "
+            "VALUES (?, 0, 0, 0, ?, ?)",
+            ((url, bytes.fromhex(urlhash), start + i + 1)
+             for i, (url, urlhash) in enumerate(rows)))
+    history.close()
+    with shelve.open(os.path.join(directory, "cache.shelve")) as cache:
+        for url, urlhash in rows:
+            cache[urlhash] = (url, 0)
+    if start == 0:
+        rng = random.Random(1)
+        db = sqlite3.connect(os.path.join(directory, "words.db"))
+        db.execute("CREATE TABLE words (word TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+        db.execute("CREATE TABLE longest_page "
+                   "(id INTEGER PRIMARY KEY CHECK (id = 0), words INTEGER, url TEXT)")
+        db.executemany("INSERT INTO words VALUES (?, ?)",
+                       ((f"word{i}", int(rng.paretovariate(1.2))) for i in range(words)))
+        db.execute("INSERT INTO longest_page VALUES (0, 27209, ?)", (rows[0][0],))
+        db.commit()
+        db.close()
+
+
+def scan(directory, top, results):
+    '''The ad-hoc report: every entry of the shelf unpickled into a dict.'''
+    os.chdir(directory)
+    start = time.process_time()
+    with shelve.open("cache.shelve") as cache:
+        entries = dict(cache)
+    subdomains = Counter(url.split("/")[2] for url, _ in entries.values())
+    db = sqlite3.connect("words.db")
+    counts = db.execute("SELECT word, count FROM words").fetchall()
+    counts.sort(key=lambda item: (-item[1], item[0]))
+    db.close()
+    results.put(((len(entries), sorted(subdomains.items()), counts[:top]),
+                 time.process_time() - start, rss()))
+
+
+def stream(directory, top, results):
+    os.chdir(directory)
+    from report import Report
+    report = Report()
+    start = time.process_time()
+    report.update()
+    report.write("report.txt", top)
+    seconds = time.process_time() - start
+    found = (report.unique_pages(), report.subdomains(), report.words.top_words(top))
+    report.close()
+    results.put((found, seconds, rss()))
+
+
+def main(args):
+    directory = tempfile.mkdtemp()
+    results = Queue()
+
+    def run(name, target):
+        process = Process(target=target, args=(directory, args.top, results))
+        process.start()
+        found, seconds, peak = results.get()
+        process.join()
+        print(f"{name:>12} {seconds:>8.2f} {peak / 2 ** 20:>8.1f}")
+        return found
+
+    def record(start, number):
+        # in a process of its own, which the peaks measured do not inherit
+        process = Process(target=fill, args=(
+            directory, start, number, args.hosts, args.words))
+        process.start()
+        process.join()
+
+    record(0, args.pages)
+    print(f"{'report':>12} {'cpu':>8} {'peak MB':>8}")
+    scanned = run("shelve scan", scan)
+    streamed = run("report.py", stream)
+    print(f"same report: {scanned == streamed}")
+    record(args.pages, int(args.pages * args.new))
+    scanned = run("shelve scan", scan)
+    streamed = run("update", stream)
+    print(f"same report after new pages: {scanned == streamed}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=1000000)
+    parser.add_argument("--hosts", type=int, default=150)
+    parser.add_argument("--words", type=int, default=200000)
+    parser.add_argument("--new", type=float, default=0.01)
+    parser.add_argument("--top", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,82 @@
+'''Cost of turning a cache server payload into the decision to parse it or
+not, for html pages and large binary files with and without a
+Content-Type header: the eager Response and is_html that lowercased the
+content three times, against the lazy Response sniffing headers and the
+first bytes. Reports time and peak memory allocated per payload.
+
+    python -m benchmarks.response_handling --binary-mb 5
+'''
+import os
+import pickle
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+import cbor
+
+from benchmarks.stub_cache_server import SyntheticSite, make_payload
+from scraper import is_html
+from utils.response import Response
+
+
+def reference_is_html(content):
+    '''scraper.is_html before sniffing'''
+    if content.startswith(b'%PDF'):
+        return False
+    return b'<html' in content.lower() or b'<head' in content.lower() or b'<body' in content.lower()
+
+
+def reference(payload):
+    resp_dict = cbor.loads(payload)
+    raw = pickle.loads(resp_dict["response"])
+    return resp_dict["status"] == 200 and reference_is_html(raw.content)
+
+
+def sniffing(payload):
+    resp = Response(cbor.loads(payload))
+    return (resp.status == 200 and resp.raw_response is not None
+            and is_html(resp.body, resp.content_type))
+
+
+def measure(function, payload, repeat):
+    tracemalloc.start()
+    function(payload)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        verdict = function(payload)
+    return verdict, (time.perf_counter() - start) / repeat, peak
+
+
+def main(binary_mb, repeat):
+    site = SyntheticSite(words=4000)
+    html = site.page(site.seed_urls()[0])
+    blob = os.urandom(binary_mb << 20)
+    payloads = {
+        "html page": make_payload("https://a.ics.uci.edu/", 200, html),
+        "zip, typed": make_payload(
+            "https://a.ics.uci.edu/a.zip", 200, blob,
+            {"Content-Type": "application/zip"}),
+        "zip, untyped": make_payload(
+            "https://a.ics.uci.edu/a.zip", 200, blob, {}),
+        "pdf, untyped": make_payload(
+            "https://a.ics.uci.edu/a.pdf", 200, b"%PDF-1.4\n" + blob, {}),
+    }
+    print(f"{'payload':>14} {'size':>9} {'old ms':>8} {'old MB':>8} "
+          f"{'new ms':>8} {'new MB':>8}")
+    for name, payload in payloads.items():
+        old_verdict, old_time, old_peak = measure(reference, payload, repeat)
+        new_verdict, new_time, new_peak = measure(sniffing, payload, repeat)
+        assert old_verdict == new_verdict, f"verdicts differ on {name}"
+        print(f"{name:>14} {len(payload):>9} {old_time * 1e3:>8.2f} "
+              f"{old_peak / 2 ** 20:>8.1f} {new_time * 1e3:>8.2f} "
+              f"{new_peak / 2 ** 20:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--binary-mb", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.binary_mb, args.repeat)
@@ -0,0 +1,108 @@
+'''Crawl of a stub site whose hosts disallow part of their pages in
+robots.txt, list every page in a sitemap, and one of which asks for a
+Crawl-delay, with robots.txt and sitemaps ignored and honored. Reports
+the pages downloaded, how many of them robots.txt disallows, the
+robots.txt and sitemap downloads, the shortest gap between two downloads
+from the host with the Crawl-delay, and the shortest gap between two
+downloads from any host, robots.txt included, once every robots.txt
+expires after ROBOTSTTL seconds. Sitemaps are only read at the start.
+
+    python -m benchmarks.robots --hosts 8 --pages 50
+'''
+import logging
+import os
+import re
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+from multiprocessing import Process
+
+from benchmarks.stub_cache_server import StubCacheServer, SyntheticSite, make_payload, make_config
+
+# pages ending in 5 and pages 10 to 19, what ROBOTS disallows
+ROBOTS = "User-agent: *\nDisallow: /page/*5$\nDisallow: /page/1\nAllow: /page/1$\n"
+DISALLOWED = re.compile(r"/page/(?:\d*5|1\d)$")
+
+
+class RobotsSite(SyntheticSite):
+    '''SyntheticSite with a robots.txt and a sitemap.xml on every host,
+    remembering when each url was served.'''
+    def __init__(self, hosts, pages, crawl_delay):
+        super().__init__(hosts, pages)
+        self.crawl_delay = crawl_delay
+        self.served = []
+
+    def payload(self, url):
+        host, path = url.split("/", 3)[2:]
+        self.served.append((url, time.monotonic()))
+        headers = {"Content-Type": "text/plain"}
+        if path == "robots.txt":
+            robots = f"{ROBOTS}Sitemap: https://{host}/sitemap.xml\n"
+            if host == self.hosts[0]:
+                robots += f"Crawl-delay: {self.crawl_delay}\n"
+            return make_payload(url, 200, robots.encode(), headers)
+        if path == "sitemap.xml":
+            locs = "".join(f"<url><loc>https://{host}/page/{number}</loc></url>"
+                           for number in range(self.pages))
+            sitemap = ('<?xml version="1.0" encoding="UTF-8"?><urlset '
+                       f'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</urlset>')
+            return make_payload(url, 200, sitemap.encode(), {"Content-Type": "application/xml"})
+        return super().payload(url)
+
+
+def crawl(cache_server, seed_urls, properties):
+    os.chdir(tempfile.mkdtemp())
+    logging.disable(logging.CRITICAL)
+    from crawler import Crawler
+    config = make_config(cache_server, seed_urls, **properties)
+    Crawler(config, True).start()
+
+
+def main(args):
+    site = RobotsSite(args.hosts, args.pages, args.crawl_delay)
+    server = StubCacheServer(site, latency=args.latency)
+    cache_server = server.start()
+
+    print(f"{'robots':>7} {'pages':>6} {'disallowed':>10} {'robots+maps':>11} "
+          f"{'seconds':>8} {'min gap':>8} {'any gap':>8}")
+    for honored in (False, True):
+        site.served = []
+        process = Process(target=crawl, args=(cache_server, site.seed_urls(), {
+            "politeness": args.politeness,
+            "robots": honored,
+            "sitemaps": honored,
+            "robotsttl": args.robots_ttl,
+            "threadcount": args.threads}))
+        start = time.monotonic()
+        process.start()
+        process.join()
+        seconds = time.monotonic() - start
+
+        pages = [(url, at) for url, at in site.served if "/page/" in url]
+        disallowed = sum(1 for url, _ in pages if DISALLOWED.search(url))
+        delayed = [at for url, at in pages if url.split("/")[2] == site.hosts[0]]
+        gap = min((later - earlier for earlier, later in zip(delayed, delayed[1:])),
+                  default=float("nan"))
+        by_host = defaultdict(list)
+        for url, at in site.served:
+            if not url.endswith("/sitemap.xml"):
+                by_host[url.split("/")[2]].append(at)
+        any_gap = min((later - earlier for served in by_host.values()
+                       for earlier, later in zip(served, served[1:])), default=float("nan"))
+        print(f"{'honored' if honored else 'ignored':>7} {len(pages):>6} "
+              f"{disallowed:>10} {len(site.served) - len(pages):>11} "
+              f"{seconds:>8.2f} {gap:>8.3f} {any_gap:>8.3f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--politeness", type=float, default=0.05)
+    parser.add_argument("--crawl-delay", type=float, default=0.2)
+    parser.add_argument("--robots_ttl", type=float, default=1.0)
+    parser.add_argument("--threads", type=int, default=4)
+    main(parser.parse_args())
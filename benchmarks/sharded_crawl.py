@@ -0,0 +1,99 @@
+'''Pages per second of a crawl split over 1, 2, 4 ... local nodes, each a
+threaded Crawler with a ShardedFrontier in its own process and directory,
+against one stub cache server that adds a fixed latency to every download.
+Checks that no page is downloaded twice and reports the shortest gap
+between two downloads from the same domain, which must not be below
+POLITENESS.
+
+    python -m benchmarks.sharded_crawl --nodes 1,2,4 --threads 2
+'''
+import logging
+import os
+import secrets
+import socket
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import Counter, defaultdict
+from multiprocessing import Process
+
+from benchmarks.stub_cache_server import StubCacheServer, SyntheticSite, make_config
+
+
+class RecordingSite(SyntheticSite):
+    '''SyntheticSite that remembers when each url was served.'''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.served = []
+
+    def payload(self, url):
+        self.served.append((url, time.monotonic()))
+        return super().payload(url)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def node(cache_server, seed_urls, properties):
+    os.chdir(tempfile.mkdtemp())
+    logging.disable(logging.CRITICAL)
+    from crawler import Crawler, ShardedFrontier
+    config = make_config(cache_server, seed_urls, **properties)
+    Crawler(config, True, ShardedFrontier).start()
+
+
+def politeness_gap(served):
+    '''shortest time between two downloads from the same domain'''
+    times = defaultdict(list)
+    for url, served_at in served:
+        times[url.split("/")[2]].append(served_at)
+    gaps = [later - earlier for stamps in times.values()
+            for earlier, later in zip(stamps, stamps[1:])]
+    return min(gaps) if gaps else float("inf")
+
+
+def main(args):
+    site = RecordingSite(args.hosts, args.pages)
+    server = StubCacheServer(site, latency=args.latency)
+    cache_server = server.start()
+
+    print(f"{'nodes':>6} {'pages':>8} {'repeats':>8} {'seconds':>8} "
+          f"{'pages/s':>8} {'min gap':>8}")
+    for count in args.nodes:
+        site.served = []
+        nodes = ",".join(f"127.0.0.1:{free_port()}" for _ in range(count))
+        key = secrets.token_hex(16)
+        processes = [
+            Process(target=node, args=(cache_server, site.seed_urls(), {
+                "politeness": args.politeness,
+                "threadcount": args.threads,
+                "nodes": nodes,
+                "node": i,
+                "shardkey": key}))
+            for i in range(count)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+        pages = len(site.served)
+        repeats = pages - len(Counter(url for url, _ in site.served))
+        print(f"{count:>6} {pages:>8} {repeats:>8} {elapsed:>8.2f} "
+              f"{pages / elapsed:>8.1f} {politeness_gap(site.served):>8.3f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=32)
+    parser.add_argument("--pages", type=int, default=25)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--politeness", type=float, default=0.5)
+    parser.add_argument("--threads", type=int, default=2)
+    parser.add_argument("--nodes", default="1,2,4",
+                        type=lambda value: [int(n) for n in value.split(",")])
+    main(parser.parse_args())
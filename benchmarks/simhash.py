@@ -0,0 +1,99 @@
+'''Speed of compute_simhash against the per-bit loop it replaced, on pages
+of random words drawn from a zipf-like vocabulary. Fingerprints of both
+implementations are checked to be identical. Also times hashing the
+bigrams with md5 against other hashlib digests.
+
+    python -m benchmarks.simhash --pages 200 --words 5000
+'''
+import hashlib
+import random
+import time
+from argparse import ArgumentParser
+
+import simhash
+from simhash import compute_simhash, create_hash, shingles
+
+
+def reference(words):
+    '''compute_simhash before it was vectorized'''
+    tokens=[]
+    for i in range(len(words)-1):
+        token = words[i] + ' ' + words[i+1]
+        tokens.append(token)
+
+    vector = [0] * 64
+    for token in tokens:
+        token_hash = create_hash(token)
+        for i in range(64):
+            bit = (token_hash >> i) & 1
+            if bit:
+                vector[i] += 1
+            else:
+                vector[i] -= 1
+
+    simhash = 0
+    for i, v in enumerate(vector):
+        if v > 0:
+            simhash |= (1 << i)
+    return simhash
+
+
+def pages(count, length, vocabulary=20000, seed=0):
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    return [rng.choices(words, weights, k=rng.randint(0, length))
+            for _ in range(count)]
+
+
+def timed(function, corpus):
+    start = time.perf_counter()
+    fingerprints = [function(words) for words in corpus]
+    return fingerprints, time.perf_counter() - start
+
+
+def main(count, length):
+    corpus = pages(count, length)
+    total = sum(len(words) for words in corpus)
+    expected, reference_time = timed(reference, corpus)
+
+    fingerprints, vector_time = timed(compute_simhash, corpus)
+    assert fingerprints == expected, "compute_simhash disagrees with the loop"
+
+    # the same code path a crawler without numpy installed takes
+    np, simhash.np = simhash.np, None
+    try:
+        fallback, fallback_time = timed(compute_simhash, corpus)
+    finally:
+        simhash.np = np
+    assert fallback == expected, "fallback disagrees with the loop"
+
+    print(f"{count} pages, {total} words, fingerprints identical")
+    print(f"{'per-bit loop':>16} {reference_time / count * 1e3:>8.2f} ms/page")
+    if np is not None:
+        print(f"{'numpy':>16} {vector_time / count * 1e3:>8.2f} ms/page "
+              f"({reference_time / vector_time:.1f}x)")
+    print(f"{'without numpy':>16} {fallback_time / count * 1e3:>8.2f} ms/page "
+          f"({reference_time / fallback_time:.1f}x)")
+    for name, seconds in hashes(corpus):
+        print(f"{name:>16} {seconds * 1e3:>8.2f} ms/page hashing bigrams")
+
+
+def hashes(corpus):
+    '''seconds per page to hash the distinct bigrams of every page'''
+    tokens = [[token.encode() for token in shingles(words)] for words in corpus]
+    for name, new in (
+            ("md5", hashlib.md5), ("sha1", hashlib.sha1),
+            ("blake2b/8", lambda data: hashlib.blake2b(data, digest_size=8))):
+        start = time.perf_counter()
+        for page in tokens:
+            b''.join([new(token).digest() for token in page])
+        yield name, (time.perf_counter() - start) / len(corpus)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--words", type=int, default=5000)
+    args = parser.parse_args()
+    main(args.pages, args.words)
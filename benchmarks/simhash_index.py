@@ -0,0 +1,123 @@
+'''Lookup cost and memory of SimhashIndex as the number of stored pages
+grows, against the linear scan the scraper used to do. Also reports the
+share of near duplicates found at every distance, and checks the verdicts
+against the linear scan.
+
+    python -m benchmarks.simhash_index --sizes 10000,100000,1000000
+'''
+import random
+import resource
+import time
+from argparse import ArgumentParser
+from multiprocessing import Process, Queue
+
+from simhash import SimhashIndex, is_dupe, popcount
+
+
+class LinearScan(object):
+    '''Every stored simhash compared against every lookup.'''
+    def __init__(self, threshold=10):
+        self.max_distance = threshold - 1
+        self.stored = []
+
+    def add(self, simhash):
+        self.stored.append(simhash)
+
+    def find(self, simhash):
+        for candidate in self.stored:
+            if popcount(simhash ^ candidate) <= self.max_distance:
+                return candidate
+        return None
+
+
+def rss():
+    '''Peak resident set of this process in bytes (Linux reports KB).'''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss << 10
+
+
+def near(rng, simhash, flips):
+    for bit in rng.sample(range(64), flips):
+        simhash ^= 1 << bit
+    return simhash
+
+
+def measure(make_index, sizes, queries, results):
+    rng = random.Random(0)
+    before = rss()
+    index = make_index()
+    stored = []
+    for size in sizes:
+        while len(stored) < size:
+            simhash = rng.getrandbits(64)
+            stored.append(simhash)
+            index.add(simhash)
+        misses = [rng.getrandbits(64) for _ in range(queries)]
+        start = time.perf_counter()
+        for simhash in misses:
+            index.find(simhash)
+        miss_cost = (time.perf_counter() - start) / queries
+        found = []
+        start = time.perf_counter()
+        for distance in range(10):
+            probes = [near(rng, rng.choice(stored), distance)
+                      for _ in range(queries // 10)]
+            found.append(sum(index.find(simhash) is not None
+                             for simhash in probes) / len(probes))
+        hit_cost = (time.perf_counter() - start) / (queries // 10 * 10)
+        # bytes/url would count the stored list too, it is the same for both
+        results.put((size, miss_cost, hit_cost, rss() - before, found))
+    results.put(None)
+
+
+def main(args):
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = Queue()
+    indexes = (
+        ("linear", LinearScan),
+        ("index", lambda: SimhashIndex(blocks=args.blocks, key_blocks=args.key_blocks)))
+    print(f"{'index':>8} {'stored':>9} {'miss us':>8} {'hit us':>7} {'MB':>7}  "
+          "found at distance 0..9")
+    for name, make_index in indexes:
+        if name == "linear" and args.skip_linear:
+            continue
+        process = Process(target=measure, args=(make_index, sizes, args.queries, results))
+        process.start()
+        while True:
+            result = results.get()
+            if result is None:
+                break
+            size, miss_cost, hit_cost, grown, found = result
+            print(f"{name:>8} {size:>9} {miss_cost * 1e6:>8.1f} {hit_cost * 1e6:>7.1f} "
+                  f"{grown / 2 ** 20:>7.1f}  " + " ".join(f"{share:.2f}" for share in found))
+        process.join()
+
+    # verdicts against the linear scan the scraper used to do, for the
+    # distances every table layout guarantees
+    rng = random.Random(1)
+    sample = [rng.getrandbits(64) for _ in range(2000)]
+    check = SimhashIndex(blocks=args.blocks, key_blocks=args.key_blocks)
+    for simhash in sample:
+        check.add(simhash)
+    guaranteed = check.max_distance if args.blocks is None \
+        else min(args.blocks - args.key_blocks, check.max_distance)
+    for distance in range(guaranteed + 1):
+        for _ in range(200):
+            probe = near(rng, rng.choice(sample), distance)
+            match = check.find(probe)
+            assert match is not None and is_dupe(probe, match)
+    for _ in range(500):
+        probe = rng.getrandbits(64)
+        expected = any(is_dupe(probe, simhash) for simhash in sample)
+        assert (check.find(probe) is not None) <= expected
+    print(f"every near duplicate within {guaranteed} bits found, no false matches")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--sizes", type=str, default="10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=2000)
+    # default: threshold - 1 + key_blocks, the exact layout
+    parser.add_argument("--blocks", type=int, default=None)
+    parser.add_argument("--key_blocks", type=int, default=2)
+    parser.add_argument("--skip_linear", action="store_true", default=False)
+    main(parser.parse_args())
@@ -0,0 +1,184 @@
+'''Local stand-in for the spacetime cache server.
+
+Answers the same `GET /?q=<url>&u=<useragent>` requests as the real cache
+server with the same CBOR payload, so download, Response and the crawlers
+can be exercised without network access. Pages come from a deterministic
+synthetic site spread over several ics.uci.edu subdomains, or from a crawl
+recorded with RECORD in config.ini.
+
+    python -m benchmarks.stub_cache_server --port 9000
+    python -m benchmarks.stub_cache_server --port 9000 --replay crawl.archive
+'''
+import cbor
+import pickle
+import random
+import time
+from argparse import ArgumentParser
+from configparser import ConfigParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+from utils.archive import ResponseArchive
+from utils.config import Config
+
+WORDS = (
+    "research computer science student data learning software system "
+    "network security faculty graduate course project algorithm theory "
+    "machine model design program analysis information engineering lab "
+    "paper conference award seminar university department school class "
+    "language database distributed parallel vision graphics robot health").split()
+
+
+def make_payload(url, status, content, headers=None):
+    '''cbor encoded response dict as sent by the cache server'''
+    raw = requests.models.Response()
+    raw.url = url
+    raw.status_code = status
+    raw._content = content
+    raw.headers.update(headers or {"Content-Type": "text/html; charset=utf-8"})
+    return cbor.dumps({"url": url, "status": status, "response": pickle.dumps(raw)})
+
+
+class SyntheticSite(object):
+    '''Deterministic set of html pages linking to each other.'''
+    def __init__(self, hosts=8, pages=200, links=20, words=400, seed=0):
+        self.hosts = [f"host{i}.ics.uci.edu" for i in range(hosts)]
+        self.pages = pages
+        self.links = links
+        self.words = words
+        self.seed = seed
+
+    def seed_urls(self):
+        return [f"https://{host}/page/0" for host in self.hosts]
+
+    def urls(self):
+        return [f"https://{host}/page/{number}"
+                for host in self.hosts for number in range(self.pages)]
+
+    def page(self, url):
+        parsed = urlparse(url)
+        if parsed.netloc not in self.hosts:
+            return None
+        try:
+            number = int(parsed.path.rsplit("/", 1)[-1])
+        except ValueError:
+            return None
+        if not 0 <= number < self.pages:
+            return None
+        rng = random.Random(f"{self.seed}-{parsed.netloc}-{number}")
+        text = " ".join(rng.choice(WORDS) + rng.choice(WORDS)
+                        for _ in range(self.words))
+        anchors = "".join(
+            f'<a href="https://{rng.choice(self.hosts)}/page/{rng.randrange(self.pages)}">link</a>'
+            for _ in range(self.links))
+        return (f"<html><head><title>{parsed.netloc} {number}</title></head>"
+                f"<body><p>{text}</p>{anchors}</body></html>").encode("utf-8")
+
+    def payload(self, url):
+        content = self.page(url)
+        if content is None:
+            return make_payload(url, 404, b"")
+        return make_payload(url, 200, content)
+
+
+class ArchiveSite(object):
+    '''Replays the payloads of a ResponseArchive, 404 for any other url.'''
+    def __init__(self, archive, seeds=4):
+        self.archive = archive
+        self.seeds = seeds
+
+    def seed_urls(self):
+        # a crawl records its seeds first
+        return self.archive.urls()[:self.seeds]
+
+    def payload(self, url):
+        payload = self.archive.get(url)
+        if payload is None:
+            return make_payload(url, 404, b"")
+        return payload
+
+
+def write_archive(site, path):
+    '''Record every page of a SyntheticSite into a ResponseArchive.'''
+    archive = ResponseArchive(path)
+    for url in site.urls():
+        archive.record(url, site.payload(url))
+    archive.close()
+    return path
+
+
+class StubCacheServer(ThreadingHTTPServer):
+    '''Serves site.payload(url) for every request after `latency` seconds.'''
+    daemon_threads = True
+
+    def __init__(self, site, host="127.0.0.1", port=0, latency=0.0):
+        self.site = site
+        self.latency = latency
+        self.requests = 0
+        super().__init__((host, port), _Handler)
+
+    def start(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        url = query.get("q", [""])[0]
+        self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = self.server.site.payload(url)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/cbor")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# make_config properties that belong in the CRAWLER section
+CRAWLER_KEYS = ("adaptivedelay", "robots", "robotsttl", "sitemaps", "recrawlinterval")
+
+
+def make_config(cache_server, seed_urls, **properties):
+    '''Config for a local crawl against a stub cache server.'''
+    cparser = ConfigParser()
+    cparser.read_dict({
+        "IDENTIFICATION": {"USERAGENT": "IR benchmark"},
+        "CONNECTION": {"HOST": "127.0.0.1", "PORT": "0"},
+        "CRAWLER": {
+            "SEEDURL": ",".join(seed_urls),
+            "POLITENESS": str(properties.pop("politeness", 0.5)),
+            **{key.upper(): str(properties.pop(key))
+               for key in CRAWLER_KEYS if key in properties}},
+        "LOCAL PROPERTIES": dict(
+            {"SAVE": "frontier.db", "STORE": "sqlite", "THREADCOUNT": "4"},
+            **{key.upper(): str(value) for key, value in properties.items()}),
+    })
+    config = Config(cparser)
+    config.cache_server = cache_server
+    return config
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--hosts", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--replay", type=str, default=None)
+    args = parser.parse_args()
+    site = (ArchiveSite(ResponseArchive(args.replay, readonly=True)) if args.replay else
+            SyntheticSite(args.hosts, args.pages))
+    server = StubCacheServer(site, port=args.port, latency=args.latency)
+    print(f"Serving on {server.server_address}")
+    server.serve_forever()
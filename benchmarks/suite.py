@@ -0,0 +1,95 @@
+'''End to end benchmark of the crawler on a recorded crawl, with no cache
+server and no network: downloads are answered in process from a response
+archive (REPLAY in config.ini). Reports pages per second, time spent per
+stage, total CPU time and peak memory, optionally as JSON to compare runs.
+
+Record an archive by crawling with RECORD = crawl.archive in config.ini,
+or leave out --archive to replay a synthetic site.
+
+    python -m benchmarks.suite --archive crawl.archive --seeds 4
+    python -m benchmarks.suite --threads 4 --parsers 2 --json before.json
+'''
+import json
+import logging
+import os
+import resource
+import tempfile
+import time
+from argparse import ArgumentParser
+from multiprocessing import Process, Queue
+
+from benchmarks.stub_cache_server import SyntheticSite, ArchiveSite, write_archive, make_config
+from utils.archive import ResponseArchive
+
+
+def crawl(archive, seed_urls, properties, use_async, results):
+    # separate process and directory so every run starts from nothing and
+    # its CPU time and peak memory are its own
+    os.chdir(tempfile.mkdtemp())
+    logging.disable(logging.CRITICAL)
+    from crawler import Crawler, AsyncCrawler
+    from utils.telemetry import telemetry
+    config = make_config(None, seed_urls, replay=archive, **properties)
+    crawler = (AsyncCrawler if use_async else Crawler)(config, True)
+    cpu = time.process_time()
+    start = time.perf_counter()
+    crawler.start()
+    elapsed = time.perf_counter() - start
+    snapshot = telemetry.snapshot()
+    results.put({
+        "pages": snapshot["pages"],
+        "seconds": elapsed,
+        "pages_per_second": snapshot["pages"] / elapsed,
+        "cpu_seconds": time.process_time() - cpu,
+        # kilobytes on linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stages": {stage: {"count": stats["count"], "seconds": stats["sum"]}
+                   for stage, stats in snapshot["stages"].items()}})
+
+
+def main(args):
+    archive = args.archive
+    if archive is None:
+        site = SyntheticSite(args.hosts, args.pages)
+        archive = write_archive(
+            site, os.path.join(tempfile.mkdtemp(), "synthetic.archive"))
+        seed_urls = site.seed_urls()
+    else:
+        seed_urls = ArchiveSite(ResponseArchive(archive, readonly=True), args.seeds).seed_urls()
+
+    properties = {
+        "politeness": 0.0,
+        "threadcount": args.threads,
+        "parsers": args.parsers}
+    results = Queue()
+    process = Process(
+        target=crawl,
+        args=(archive, seed_urls, properties, args.use_async, results))
+    process.start()
+    report = results.get()
+    process.join()
+
+    print(f"{report['pages']} pages in {report['seconds']:.2f} s, "
+          f"{report['pages_per_second']:.1f} pages/s, "
+          f"{report['cpu_seconds']:.2f} s cpu, "
+          f"{report['peak_rss_mb']:.0f} MB peak")
+    print(f"{'stage':>14} {'count':>8} {'seconds':>8} {'ms each':>8}")
+    for stage, stats in sorted(report["stages"].items()):
+        each = stats["seconds"] / stats["count"] * 1e3 if stats["count"] else 0
+        print(f"{stage:>14} {stats['count']:>8} {stats['seconds']:>8.2f} {each:>8.3f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=1)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--archive", type=str, default=None)
+    parser.add_argument("--seeds", type=int, default=4)
+    parser.add_argument("--hosts", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--parsers", type=int, default=0)
+    parser.add_argument("--async", dest="use_async", action="store_true", default=False)
+    parser.add_argument("--json", type=str, default=None)
+    main(parser.parse_args())
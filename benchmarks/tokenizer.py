@@ -0,0 +1,92 @@
+'''Throughput in MB of page text per second of the tokenizer module against
+the code it replaced (a regex sub over the lowercased text, and stop words
+filtered word by word), for splitting words alone and for everything a
+page goes through: words, word counts and simhash bigrams. Pages are
+synthetic text with punctuation, digits and some non-ascii words mixed
+in. Checks that both give the same words, counts and bigrams.
+
+    python -m benchmarks.tokenizer --pages 500 --words 2000
+'''
+import random
+import re
+import time
+from argparse import ArgumentParser
+from collections import Counter
+
+import tokenizer
+from parsing import count_words, stop_words
+from benchmarks.stub_cache_server import WORDS
+from simhash import shingles
+
+
+def old_words(text):
+    return re.sub(r"[^a-z\s]", "", text.lower()).split()
+
+
+def old_count_words(words, limit=50):
+    words = [word for word in words if len(word) > 2]
+    num_words = len(words)
+    if num_words < limit:
+        return None, num_words
+    return Counter(word for word in words if word not in stop_words), num_words
+
+
+def old_shingles(words):
+    return Counter(map(' '.join, zip(words, words[1:])))
+
+
+def texts(count, length, non_ascii, seed=0):
+    rng = random.Random(seed)
+    vocabulary = ([word.capitalize() for word in WORDS] + WORDS + list(stop_words) +
+                  ["Don't", "e-mail", "CS121", "(2024)", "U.C.", "--", "&", "http://x.y/z"])
+    foreign = ["Universität", "café", "naïve", "Zürich", "東京", "résumé"]
+    pages = []
+    for _ in range(count):
+        words = rng.choices(vocabulary, k=length)
+        if rng.random() < non_ascii:
+            words += rng.choices(foreign, k=length // 50)
+        pages.append(" ".join(words))
+    return pages
+
+
+def timed(function, pages, repeat=3):
+    '''Results and the best time of repeat runs over pages.'''
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [function(text) for text in pages]
+        best = min(best, time.perf_counter() - start)
+    return results, best
+
+
+def old_page(text):
+    words = old_words(text)
+    return old_count_words(words), old_shingles(words)
+
+
+def new_page(text):
+    words = tokenizer.words(text)
+    return count_words(words), shingles(words)
+
+
+def main(args):
+    pages = texts(args.pages, args.words, args.non_ascii)
+    megabytes = sum(len(text.encode("utf-8")) for text in pages) / 2 ** 20
+    stages = {
+        "words": (old_words, tokenizer.words),
+        "page": (old_page, new_page),
+    }
+    print(f"{'stage':>6} {'old MB/s':>9} {'new MB/s':>9} {'speedup':>8} {'same':>5}")
+    for name, (old, new) in stages.items():
+        expected, old_time = timed(old, pages)
+        found, new_time = timed(new, pages)
+        print(f"{name:>6} {megabytes / old_time:>9.1f} {megabytes / new_time:>9.1f} "
+              f"{old_time / new_time:>8.1f} {str(found == expected):>5}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--words", type=int, default=2000)
+    parser.add_argument("--non_ascii", type=float, default=0.1)
+    main(parser.parse_args())
@@ -0,0 +1,94 @@
+'''Crawl of a stub site where every page links to a long chain of short
+revisions of itself (?do=revisions&rev=N), none of them a duplicate but
+none with enough words to count, with trap detection off (TRAPYIELD = 0)
+and on. Reports the pages downloaded, the revisions downloaded and the
+time the crawl took.
+
+    python -m benchmarks.trap_budget --hosts 4 --pages 50
+'''
+import logging
+import os
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+from multiprocessing import Process
+from urllib.parse import urlparse
+
+from benchmarks.stub_cache_server import StubCacheServer, SyntheticSite, WORDS, make_config
+
+
+class RevisionSite(SyntheticSite):
+    '''SyntheticSite whose pages link to a chain of revisions of
+    themselves, `revisions` long. A revision is a short diff, different on
+    every revision but under LOW_INFO_WORDS words. Remembers every url
+    served.'''
+    def __init__(self, hosts, pages, revisions):
+        super().__init__(hosts, pages)
+        self.revisions = revisions
+        self.served = []
+
+    def page(self, url):
+        parsed = urlparse(url)
+        if not parsed.query.startswith("do=revisions&rev="):
+            content = super().page(url)
+            if content is None:
+                return None
+            link = (f'<a href="https://{parsed.netloc}{parsed.path}'
+                    '?do=revisions&rev=1">revisions</a>')
+            return content.replace(b"</body>", link.encode() + b"</body>")
+        revision = int(parsed.query.rsplit("=", 1)[1])
+        rng = random.Random(url)
+        diff = " ".join(rng.choice(WORDS) for _ in range(20))
+        older = (f'<a href="https://{parsed.netloc}{parsed.path}'
+                 f'?do=revisions&rev={revision + 1}">older</a>'
+                 if revision < self.revisions else "")
+        return (f"<html><head><title>{parsed.path} revision {revision}</title>"
+                f"</head><body><p>{diff}</p>{older}</body></html>").encode()
+
+    def payload(self, url):
+        self.served.append(url)
+        return super().payload(url)
+
+
+def crawl(cache_server, seed_urls, properties):
+    os.chdir(tempfile.mkdtemp())
+    logging.disable(logging.CRITICAL)
+    from crawler import Crawler
+    config = make_config(cache_server, seed_urls, **properties)
+    Crawler(config, True).start()
+
+
+def main(args):
+    site = RevisionSite(args.hosts, args.pages, args.revisions)
+    server = StubCacheServer(site, latency=args.latency)
+    cache_server = server.start()
+
+    print(f"{'trapyield':>9} {'pages':>6} {'revisions':>9} {'seconds':>8}")
+    for trap_yield in (0.0, 0.1):
+        site.served = []
+        process = Process(target=crawl, args=(cache_server, site.seed_urls(), {
+            "politeness": args.politeness,
+            "robots": False,
+            "sitemaps": False,
+            "trapyield": trap_yield,
+            "threadcount": args.threads}))
+        start = time.monotonic()
+        process.start()
+        process.join()
+        seconds = time.monotonic() - start
+        revisions = sum(1 for url in site.served if "rev=" in url)
+        print(f"{trap_yield:>9} {len(site.served) - revisions:>6} "
+              f"{revisions:>9} {seconds:>8.2f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--revisions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--politeness", type=float, default=0.0)
+    parser.add_argument("--threads", type=int, default=4)
+    main(parser.parse_args())
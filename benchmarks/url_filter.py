@@ -0,0 +1,131 @@
+'''Speed of url_filter against the regex based is_valid it replaced, on a
+corpus of links like the ones extracted from ics.uci.edu pages. Verdicts
+of both implementations are checked to be identical.
+
+    python -m benchmarks.url_filter --links 200000
+'''
+import random
+import re
+import time
+from argparse import ArgumentParser
+from urllib.parse import urlparse
+
+from url_filter import check_url, filter_urls
+
+
+def reference(url):
+    '''the static part of scraper.is_valid before url_filter existed'''
+    banned_paths = ['calendar','pdf', 'pix']
+    parsed = urlparse(url)
+    if parsed.scheme not in set(["http", "https"]):
+        return False
+    valid = not re.match(
+        r".*\.(css|js|bmp|gif|jpe?g|ico"
+        + r"|png|tiff?|mid|mp2|mp3|mp4|mpg"
+        + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+        + r"|ps|eps|tex|ppt|pptx|ppsx|pps|doc|docx|xls|xlsx|names"
+        + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+        + r"|epub|dll|cnf|tgz|sha1|scm|rkt|"
+        + r"|thmx|mso|arff|rtf|jar|csv|ff"
+        + r"|ttf|otf|woff|woff2|eot|fon"
+        + r"|img|pkg|exe|msi|sql|db|mdb|log|sqlite"
+        + r"|cpp|cc|c|h|py|pix|bib|war|ini|o|a|lib|obj|ini|config"
+        + r"|raw|ods|key|odp|ods|numbers|bat|sh|bak|swp"
+        + r"|rm|smil|wmv|swf|wma|zip|rar|gz|z|xz|lz|tgz|tbz|apk|ipa)$", parsed.path.lower())
+    if not valid:
+        return False
+    valid_domain = bool(re.match(r"^(.*\.)?ics\.uci\.edu$"
+            + r"|^(.*\.)?cs\.uci\.edu$"
+            + r"|^(.*\.)?informatics\.uci\.edu$"
+            + r"|^(.*\.)?stat\.uci\.edu$", parsed.netloc) or
+            (re.match(r"^today\.uci\.edu/$", parsed.netloc) and
+                    re.match(r"^department/information_computer_sciences/.*$", parsed.path)))
+    if not valid_domain:
+        return False
+    paths = parsed.path.split('/')
+    for path in banned_paths:
+        if path in paths:
+            return False
+    counts = {}
+    for p in paths:
+        if p not in counts:
+            counts[p] = 0
+        counts[p] += 1
+        if counts[p] > 2:
+            return False
+    if re.search(r"\b\d{4}-\d{2}-\d{2}\b", parsed.query) is not None:
+        return False
+    if re.search(r"\b\d{4}-\d{2}\b", parsed.query) is not None:
+        return False
+    if re.search(r"\b\d{4}-\d{2}-\d{2}\b", parsed.path) is not None:
+        return False
+    if re.search(r"\b\d{4}-\d{2}\b", parsed.path) is not None:
+        return False
+    if "action=download" in parsed.query:
+        return False
+    return True
+
+
+HOSTS = ["www.ics.uci.edu", "ics.uci.edu", "www.cs.uci.edu", "cs.uci.edu",
+         "www.informatics.uci.edu", "www.stat.uci.edu", "wiki.ics.uci.edu",
+         "grape.ics.uci.edu", "vision.ics.uci.edu", "today.uci.edu",
+         "www.uci.edu", "github.com", "www.physics.uci.edu", "ics.uci.edu:8080",
+         "xics.uci.edu", "www.eecs.uci.edu"]
+SEGMENTS = ["people", "faculty", "research", "~eppstein", "courses", "pub",
+            "calendar", "events", "doku.php", "index.php", "news", "pix",
+            "page", "2", "pdf", "2019-05", "about", "admissions", "ugrad", ""]
+FILES = ["", "index.html", "paper.pdf", "slides.pptx", "data.csv", "main.c",
+         "photo.JPG", "style.css", "app.js", "notes.txt", "thesis.PS", "file.",
+         "archive.tar.gz", "readme", "report.html", "code.py"]
+QUERIES = ["", "", "", "id=projects:main", "do=edit", "rev=1590000000",
+           "action=download&file=x", "date=2020-01-15", "month=2018-07",
+           "page=3", "tribe-bar-date=2021-03", "ical=1", "p=12345",
+           "utm_source=twitter", "sort=asc&filter=all"]
+
+
+def corpus(size, seed=0):
+    rng = random.Random(seed)
+    links = []
+    for _ in range(size):
+        scheme = rng.choice(["https", "https", "http", "mailto", "ftp"])
+        path = "/".join(rng.choice(SEGMENTS) for _ in range(rng.randint(0, 5)))
+        url = f"{scheme}://{rng.choice(HOSTS)}/{path}/{rng.choice(FILES)}"
+        query = rng.choice(QUERIES)
+        if query:
+            url += "?" + query
+        if rng.random() < 0.1:
+            url += "#section"
+        links.append(url)
+    return links
+
+
+def main(size):
+    links = corpus(size)
+    start = time.perf_counter()
+    expected = [reference(url) for url in links]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    verdicts = [check_url(url) for url in links]
+    check_time = time.perf_counter() - start
+
+    # a page links to the same url many times, filter_urls checks it once
+    pages = [links[i:i + 100] * 2 for i in range(0, size, 100)]
+    start = time.perf_counter()
+    for page in pages:
+        filter_urls(page)
+    batch_time = time.perf_counter() - start
+
+    assert verdicts == expected, "url_filter disagrees with is_valid"
+    print(f"{size} links, {sum(expected)} valid, verdicts identical")
+    print(f"{'is_valid (regex)':>20} {reference_time / size * 1e6:>8.2f} us/link")
+    print(f"{'check_url':>20} {check_time / size * 1e6:>8.2f} us/link "
+          f"({reference_time / check_time:.1f}x)")
+    print(f"{'filter_urls':>20} {batch_time / (2 * size) * 1e6:>8.2f} us/link "
+          f"with every link repeated twice on its page")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--links", type=int, default=200000)
+    main(parser.parse_args().links)
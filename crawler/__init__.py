@@ -1,6 +1,10 @@
 from utils import get_logger
+from utils.telemetry import Reporter
 from crawler.frontier import Frontier
 from crawler.worker import Worker
+from crawler.async_crawler import AsyncCrawler
+from crawler.parsers import ParserPool
+from crawler.shard import ShardedFrontier
 
 class Crawler(object):
     def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker):
@@ -9,10 +13,19 @@ class Crawler(object):
         self.frontier = frontier_factory(config, restart)
         self.workers = list()
         self.worker_factory = worker_factory
+        self.parsers = None
+        self.reporter = Reporter(config)
 
     def start_async(self):
+        self.reporter.start()
+        # only passed to workers when there are parser processes, so a
+        # worker with the three argument __init__ still works without them
+        options = {}
+        if self.config.parsers > 0:
+            self.parsers = ParserPool(self.config.parsers)
+            options["parsers"] = self.parsers
         self.workers = [
-            self.worker_factory(worker_id, self.config, self.frontier)
+            self.worker_factory(worker_id, self.config, self.frontier, **options)
             for worker_id in range(self.config.threads_count)]
         for worker in self.workers:
             worker.start()
@@ -24,3 +37,6 @@ class Crawler(object):
     def join(self):
         for worker in self.workers:
             worker.join()
+        if self.parsers is not None:
+            self.parsers.shutdown()
+        self.reporter.stop()
@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import get_logger, PER_URL
+from utils.telemetry import telemetry, Reporter
+from utils.async_download import CacheClient
+from crawler.frontier import Frontier
+from crawler.parsers import ParserPool
+from crawler.rate import NO_RESPONSE
+import scraper
+
+# Longest time the dispatcher sleeps before asking the frontier again.
+POLL_INTERVAL = 0.05
+
+
+class AsyncCrawler(object):
+    '''Crawler that downloads with a single event loop instead of one
+    thread per download. Up to config.concurrency downloads share a pool of
+    keep-alive connections to the cache server; scraping and frontier
+    updates run on config.threads_count threads so they never block the
+    loop, and pages are parsed on config.parsers processes if set. A
+    download that fails or takes over config.download_timeout seconds
+    counts as no response. Politeness is left to the frontier's domain
+    schedule, exactly as in the threaded Crawler.'''
+    def __init__(self, config, restart, frontier_factory=Frontier):
+        self.config = config
+        self.logger = get_logger("CRAWLER")
+        self.frontier = frontier_factory(config, restart)
+        self.lock = self.frontier.lock
+
+    def start(self):
+        reporter = Reporter(self.config)
+        reporter.start()
+        try:
+            asyncio.run(self._crawl())
+        finally:
+            reporter.stop()
+
+    async def _crawl(self):
+        client = CacheClient(self.config, self.config.concurrency)
+        slots = asyncio.Semaphore(self.config.concurrency)
+        pending = set()
+        executor = ThreadPoolExecutor(self.config.threads_count)
+        parsers = ParserPool(self.config.parsers)
+        try:
+            while True:
+                await slots.acquire()
+                # may read the save file or download a robots.txt
+                tbd_url, wait = await asyncio.get_running_loop().run_in_executor(
+                    executor, self.frontier.poll_tbd_url)
+                if tbd_url is None:
+                    slots.release()
+                    if wait is None:
+                        break
+                    await asyncio.sleep(min(wait, POLL_INTERVAL) or POLL_INTERVAL)
+                    continue
+                task = asyncio.create_task(
+                    self._fetch(client, executor, parsers, tbd_url))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                task.add_done_callback(lambda task: slots.release())
+            await asyncio.gather(*pending)
+        finally:
+            executor.shutdown()
+            parsers.shutdown()
+            await client.close()
+        self.logger.info("Frontier is empty. Stopping Crawler.")
+
+    async def _fetch(self, client, executor, parsers, tbd_url):
+        loop = asyncio.get_running_loop()
+        status, latency = NO_RESPONSE, None
+        try:
+            start = time.perf_counter()
+            try:
+                with telemetry.timer("download"):
+                    resp = await asyncio.wait_for(
+                        client.download(tbd_url, self.logger),
+                        self.config.download_timeout)
+            except Exception as e:
+                # refused, truncated, malformed or timed out: no response
+                self.logger.error(f"Failed to download {tbd_url}: {e!r}")
+                return
+            status, latency = resp.status, time.perf_counter() - start
+            self.logger.info(
+                f"Downloaded {tbd_url}, status <{resp.status}>, "
+                f"using cache {self.config.cache_server}.", extra=PER_URL)
+            if await loop.run_in_executor(
+                    executor, scraper.unchanged, tbd_url, resp, self.config.recrawl):
+                # same as on the last crawl, its links are known
+                return
+            if parsers.executor is None:
+                await loop.run_in_executor(executor, self._process, tbd_url, resp)
+                return
+            parsed = None
+            try:
+                future = parsers.submit(tbd_url, resp)
+                if future is not None:
+                    with telemetry.timer("parse"):
+                        parsed = await asyncio.wrap_future(future)
+            finally:
+                await loop.run_in_executor(executor, self._record, tbd_url, parsed)
+        finally:
+            # also hands the domain back to the frontier's schedule
+            await loop.run_in_executor(
+                executor, self.frontier.mark_url_complete, tbd_url, status, latency)
+
+    def _process(self, tbd_url, resp):
+        scraped_urls = scraper.scraper(tbd_url, resp, self.lock)
+        self.frontier.add_urls(scraped_urls)
+
+    def _record(self, tbd_url, parsed):
+        scraped_urls = scraper.record_page(tbd_url, parsed, self.lock)
+        self.frontier.add_urls(scraped_urls)
@@ -1,118 +1,473 @@
 import os
-import shelve
 
-from threading import Thread, RLock
-from queue import Queue, Empty
+from threading import Lock, Condition
+from heapq import heappush, heappop
 
-from utils import get_logger, get_urlhash, normalize
-from scraper import is_valid
+from utils import get_logger, get_urlhash, normalize, delete_database
+from scraper import (
+    is_valid, normalized_hash, filter_urls, FILTER_VERSION, template_tracker,
+    page_history, flush_records)
+from crawler.store import STORES, ShelveStore
+from crawler.rate import RateController
+from crawler.priority import UrlHeap, url_priority
+from crawler.robots import RobotsCache
+from utils.history import PageHistory, UNCHANGED
+from utils.page_cache import PageCache
+from utils.seen import SeenSet
+from utils.telemetry import telemetry
 
 import time
 from urllib.parse import urlparse
 
+class DomainQueue(object):
+    '''The UrlHeap of one domain and the lock that guards it, so urls of
+    different domains are queued, linked and popped without waiting for
+    each other. Its saved urls are read back and written under the same
+    lock, never together with the frontier's condition.'''
+    __slots__ = ("heap", "lock")
+
+    def __init__(self):
+        self.heap = UrlHeap()
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.heap)
+
+
 class Frontier(object):
     def __init__(self, config, restart):
         self.logger = get_logger("FRONTIER")
         self.config = config
         self.to_be_downloaded = list()
-        self.active_domains = list()
         self.domain_list = {}
-        self.active_workers = {}
-        self.lock = RLock()
+        # held by the scraper while it checks and updates the page cache
+        # and the simhash index, never together with the locks below
+        self.lock = Lock()
+
+        # Politeness is tracked per domain: a domain sits in the schedule
+        # heap keyed on the earliest time it may be fetched again, and is
+        # taken out of the heap while a worker is downloading from it. The
+        # condition guards the schedule and the count of downloads in
+        # progress; the urls of a domain wait in its DomainQueue.
+        self.condition = Condition()
+        self.schedule = list()
+        self.scheduled_domains = set()
+        self.downloading_domains = set()
+        self.next_fetch = {}
+        self.in_progress = 0
+        self.rates = RateController(config.time_delay, config.adaptive_delay)
+        self.robots = RobotsCache(
+            config, self.logger, self._robots_fetched, self._robots_wait)
+        self.templates = template_tracker
+        self.templates.min_yield = config.trap_yield
+        self.history = page_history
+        self.history.interval = config.recrawl_interval
+
+        # Every domain queues its urls in a UrlHeap, best first. With a
+        # store that supports it, a heap keeps only the best
+        # config.queue_window urls and the rest wait in the save file:
+        # spilled maps such a domain to the best priority left there, and
+        # the best saved urls are read back once the heap has nothing as
+        # good. On resume every pending domain starts out spilled. The
+        # entry of a domain is guarded by the lock of its DomainQueue.
+        self.spilled = {}
+        self.downloaded = {}
 
-        if not os.path.exists(self.config.save_file) and not restart:
+        store_class = STORES[self.config.store]
+        if store_class is not ShelveStore and ShelveStore.found(self.config.save_file):
+            # saved before STORE defaulted to sqlite
+            if restart:
+                ShelveStore.delete(self.config.save_file)
+            else:
+                self.logger.warning(
+                    f"{self.config.save_file} was saved with STORE = shelve, "
+                    f"resuming it with the shelve store.")
+                store_class = ShelveStore
+        if not store_class.exists(self.config.save_file) and not restart:
             # Save file does not exist, but request to load save.
             self.logger.info(
                 f"Did not find save file {self.config.save_file}, "
                 f"starting from seed.")
-        elif os.path.exists(self.config.save_file) and restart:
+        elif store_class.exists(self.config.save_file) and restart:
             # Save file does exists, but request to start from seed.
             self.logger.info(
                 f"Found save file {self.config.save_file}, deleting it.")
-            os.remove(self.config.save_file)
+            store_class.delete(self.config.save_file)
 
-        if restart and os.path.exists('cache.shelve'):
+        if restart and PageCache.exists('cache.shelve'):
             self.logger.info("Deleted cache file")
-            os.remove('cache.shelve')
+            PageCache.delete('cache.shelve')
+
+        if restart and os.path.exists('seen.db'):
+            self.logger.info("Deleted seen urls")
+            SeenSet.delete('seen.db')
+
+        if restart and os.path.exists('simhash.index'):
+            self.logger.info("Deleted simhash index")
+            os.remove('simhash.index')
 
-        if restart and os.path.exists('words.shelve'):
+        if restart and os.path.exists('words.db'):
             self.logger.info("Deleted words")
-            os.remove('words.shelve')
+            os.remove('words.db')
+
+        if restart and os.path.exists('pages.db'):
+            self.logger.info("Deleted page history")
+            self.history.close()
+            PageHistory.delete('pages.db')
+
+        if restart and os.path.exists('report.db'):
+            self.logger.info("Deleted report counts")
+            delete_database('report.db')
+
+        self.seen = SeenSet.from_config(self.config, 'seen.db', deferred=True)
+
+        telemetry.gauge("queued_urls", self._queued_urls)
+        telemetry.gauge("scheduled_domains", lambda: len(self.scheduled_domains))
+        telemetry.gauge("downloads_in_progress", lambda: self.in_progress)
+        telemetry.gauge("parked_domains", self.rates.parked)
+        telemetry.gauge("robots_disallowed", lambda: self.robots.disallowed)
+        telemetry.gauge("budgeted_templates", self.templates.budgeted)
+        telemetry.gauge("template_skipped", self.templates.skipped)
+        telemetry.gauge("unchanged_pages", lambda: self.history.outcomes[UNCHANGED])
 
         # Load existing save file, or create one if it does not exist.
-        self.save = shelve.open(self.config.save_file)
+        self.store = store_class.from_config(self.config)
+        # a crash must not leave a page saved as downloaded without its words
+        self.store.before_commit = flush_records
+        # nor a url seen that is not in the save file
+        self.store.after_commit = self.seen.flush
         if restart:
-            for url in self.config.seed_urls:
-                self.add_url(url)
+            self._add_seeds()
         else:
             # Set the frontier state with contents of save file.
             self._parse_save_file()
-            if not self.save:
-                for url in self.config.seed_urls:
-                    self.add_url(url)
+            if not len(self.store):
+                self._add_seeds()
+            elif self.config.recrawl:
+                self._add_due()
+
+    def _add_seeds(self):
+        for url in self.config.seed_urls:
+            self.add_url(url)
+        if not self.config.sitemaps:
+            return
+        # the sitemaps of every seed domain this frontier crawls, at once
+        for url in filter_urls(self.config.seed_urls):
+            if self._owns(urlparse(url).netloc):
+                self.add_urls(self.robots.sitemap_urls(url))
+
+    def _add_due(self):
+        ''' Queue again every downloaded page that is due for a visit
+        (see utils.history), for an incremental recrawl. '''
+        due = 0
+        for url in self.history.due():
+            domain = urlparse(url).netloc
+            if not self._owns(domain) or not self.robots.allowed(url):
+                continue
+            priority = url_priority(url)
+            with telemetry.timer("store"):
+                self.store.mark_pending(get_urlhash(url), url, domain, priority)
+            self._enqueue(url, priority)
+            due += 1
+        self.logger.info(f"Recrawling {due} pages due for a visit.")
+
+    def _owns(self, domain):
+        ''' Whether urls of domain are queued by this frontier. '''
+        return True
+
+    def _robots_fetched(self, domain):
+        ''' Count a robots.txt or sitemap download against the politeness
+        delay of its domain, or its Crawl-delay if longer. '''
+        delay = max(self.config.time_delay,
+                    self.robots.crawl_delay(f"https://{domain}/") or 0)
+        with self.condition:
+            self.next_fetch[domain] = max(
+                self.next_fetch.get(domain, 0), time.monotonic() + delay)
+
+    def _robots_wait(self, domain):
+        ''' Block until domain may be fetched again, for the sitemap
+        downloads made while seeding. '''
+        with self.condition:
+            wait = self.next_fetch.get(domain, 0) - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+    def _queued_urls(self):
+        return sum(len(queue) for queue in list(self.domain_list.values()))
+
+    def _queue(self, domain):
+        queue = self.domain_list.get(domain)
+        if queue is None:
+            queue = self.domain_list.setdefault(domain, DomainQueue())
+        return queue
 
     def _parse_save_file(self):
         ''' This function can be overridden for alternate saving techniques. '''
-        total_count = len(self.save)
+        total_count = len(self.store)
+        if self.store.lazy_resume:
+            # Only schedule the domains, their urls are read on demand.
+            with self.condition:
+                for domain in self.store.pending_domains():
+                    self.spilled[domain] = float("-inf")
+                    self._schedule(domain)
+            self.logger.info(
+                f"Found urls to be downloaded on {len(self.spilled)} "
+                f"domains from {total_count} total urls discovered.")
+            return
         tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and is_valid(url, self.lock, ignore_cache=True):
-                parsed_url = urlparse(url)
-                domain = parsed_url.netloc
-                if domain in self.domain_list.keys():
-                    self.domain_list[domain].append(url)
-                else:
-                    self.domain_list[domain] = list()
-                    self.domain_list[domain].append(url)
-                    self.active_domains.append(domain)
-
+        for url in self.store.pending():
+            if is_valid(url):
+                self._enqueue(url, url_priority(url))
                 tbd_count += 1
         self.logger.info(
             f"Found {tbd_count} urls to be downloaded from {total_count} "
             f"total urls discovered.")
 
-    def get_domain(self):
-        try:
-            return self.active_domains.pop()
-        except IndexError:
-            return None
+    def _refill(self, domain, queue):
+        ''' Merge the best saved urls of a spilled domain into its heap,
+        re-checking only the ones saved under an older version of is_valid.
+        Returns False once the domain has nothing left.
+        Must be called with the domain's lock held. '''
+        window = self.config.queue_window
+        while domain in self.spilled:
+            rows = self.store.pending_best(domain, window)
+            if len(rows) < window:
+                # everything left fits in memory
+                del self.spilled[domain]
+            elif rows[-1][2] is not None:
+                self.spilled[domain] = rows[-1][2]
+            urls = []
+            for url, version, priority in rows:
+                if version == FILTER_VERSION or is_valid(url):
+                    urls.append((url, url_priority(url) if priority is None else priority))
+                else:
+                    # rejected for good, never read back again
+                    self.store.mark_complete(get_urlhash(url), url, domain)
+            for url, priority in urls:
+                queue.heap.push(url, priority)
+            self._trim(domain, queue.heap)
+            if queue:
+                break
+        return bool(queue)
 
-    def not_running(self):
-        for key in self.active_workers.keys():
-            #self.logger.info(f"{key} {self.active_workers[key]}")
-            if self.active_workers[key]:
-                return False
-        return True
+    def _trim(self, domain, heap):
+        ''' Keep the heap of a domain within the window, remembering the
+        best priority of the urls left in the save file.
+        Must be called with the domain's lock held. '''
+        dropped = heap.trim(self.config.queue_window)
+        if dropped is not None:
+            self.spilled[domain] = min(self.spilled.get(domain, dropped), dropped)
+
+    def _enqueue(self, url, priority):
+        domain = urlparse(url).netloc
+        queue = self._queue(domain)
+        with queue.lock:
+            queue.heap.push(url, priority)
+            if self.store.lazy_resume and len(queue) >= 2 * self.config.queue_window:
+                self._trim(domain, queue.heap)
+        # A domain on the schedule or downloading is looked at again
+        # after this push, when it is taken or completed, so only an idle
+        # domain needs the condition.
+        if domain in self.scheduled_domains or domain in self.downloading_domains:
+            return
+        with self.condition:
+            self._schedule(domain)
+
+    def _schedule(self, domain):
+        ''' Put a domain with pending urls back on the schedule.
+        Must be called with self.condition held. '''
+        if domain in self.scheduled_domains or domain in self.downloading_domains:
+            return
+        if not self.domain_list.get(domain) and domain not in self.spilled:
+            return
+        heappush(self.schedule, (self.next_fetch.get(domain, 0), domain))
+        self.scheduled_domains.add(domain)
+        self.condition.notify()
+
+    def _take_ready(self):
+        ''' Take the first domain that is due off the schedule and count it
+        as downloading, so no other worker takes it and the crawl is not
+        over while its urls are looked at. Otherwise return the seconds
+        until the next domain is due, or None as the wait when no domain is
+        scheduled at all.
+        Must be called with self.condition held. '''
+        if not self.schedule:
+            return None, None
+        ready_at, domain = self.schedule[0]
+        wait = ready_at - time.monotonic()
+        if wait > 0:
+            return None, wait
+        heappop(self.schedule)
+        self.scheduled_domains.discard(domain)
+        self.in_progress += 1
+        self.downloading_domains.add(domain)
+        return domain, 0
 
-    def get_tbd_url(self, domain):
-        try:
-            return self.domain_list[domain].pop()
-        except IndexError:
+    def _checkout(self, domain):
+        ''' A url to download of a domain taken by _take_ready, or None
+        once it is given back for having none left, or for its robots.txt
+        being downloaded instead: that is the domain's download for this
+        turn, and its urls are checked against it from the next one.
+        Called without self.condition, so the save file is only read and
+        written under the domain's lock. '''
+        if self.robots.stale(domain):
+            self.robots.refresh(domain)
+            self._release(domain)
+            return None
+        retry = self.robots.unreachable_until(domain)
+        if retry is not None:
+            # fully disallowed, its urls wait for robots.txt to be retried
+            self._release(domain, retry)
             return None
+        url = self._pop_allowed(domain)
+        if url is None:
+            self._release(domain)
+        return url
+
+    def _release(self, domain, not_before=0):
+        ''' Give back a domain taken by _take_ready without downloading
+        from it, not to be taken again before monotonic time not_before.
+        Urls queued meanwhile put it back on the schedule. '''
+        with self.condition:
+            self.in_progress -= 1
+            self.downloading_domains.discard(domain)
+            self.next_fetch[domain] = max(self.next_fetch.get(domain, 0), not_before)
+            self._schedule(domain)
+            if self.in_progress == 0:
+                self.condition.notify_all()
+
+    def _pop_allowed(self, domain):
+        ''' Best queued url of domain allowed by its robots.txt whose
+        template is within budget. The others are recorded as done without
+        being downloaded. '''
+        queue = self._queue(domain)
+        with queue.lock:
+            if domain in self.spilled:
+                best = queue.heap.peek()
+                if best is None or best > self.spilled[domain]:
+                    # better urls wait in the save file
+                    self._refill(domain, queue)
+            while True:
+                url = queue.heap.pop()
+                if url is None:
+                    if domain in self.spilled and self._refill(domain, queue):
+                        continue
+                    return None
+                if self.robots.allowed(url) and self.templates.allowed(url):
+                    return url
+                self.store.mark_complete(get_urlhash(url), url, domain)
+
+    def _finished(self):
+        ''' Whether the crawl is over once nothing is scheduled: no download
+        in progress could discover more urls.
+        Must be called with self.condition held. '''
+        return self.in_progress == 0
+
+    def get_tbd_url(self):
+        ''' Block until some domain is allowed to be fetched and return one
+        of its urls. Returns None once nothing is queued and no download is
+        in progress that could discover more urls. '''
+        while True:
+            with self.condition:
+                while True:
+                    domain, wait = self._take_ready()
+                    if domain:
+                        break
+                    if wait is not None:
+                        self.condition.wait(wait)
+                    elif self._finished():
+                        self.condition.notify_all()
+                        return None
+                    else:
+                        self.condition.wait()
+            url = self._checkout(domain)
+            if url:
+                return url
+
+    def poll_tbd_url(self):
+        ''' Non-blocking get_tbd_url. Returns (url, 0) if a domain is due,
+        (None, seconds) when the caller should check back later and
+        (None, None) once the crawl is over. '''
+        while True:
+            with self.condition:
+                domain, wait = self._take_ready()
+                if not domain:
+                    if wait is not None:
+                        return None, wait
+                    if self._finished():
+                        return None, None
+                    # nothing queued until the downloads in progress finish
+                    return None, 0
+            url = self._checkout(domain)
+            if url:
+                return url, 0
 
     def add_url(self, url):
-        if not is_valid(url, self.lock):
+        self.add_urls([url])
+
+    def add_urls(self, urls):
+        ''' Add every valid url scraped from one page. '''
+        with telemetry.timer("add_urls"):
+            for url in filter_urls(urls):
+                self._accept(url)
+
+    def _accept(self, url):
+        ''' Add a url that passed filter_urls, unless its robots.txt, if
+        already downloaded, disallows it or its template is out of budget
+        (see traps). A url seen before only counts as one more link to it. '''
+        if not self.robots.allowed(url) or not self.templates.allowed(url):
             return
+        urlhash = normalized_hash(urlparse(url))
+        if self.seen.add(urlhash):
+            self._add(url)
+            # written to seen.db with the store's next commit, not before
+            self.seen.release(urlhash)
+        else:
+            self._linked(url)
+
+    def _add(self, url):
         url = normalize(url)
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            self.save[urlhash] = (url, False)
-            self.save.sync()
-            parsed_url = urlparse(url)
-            domain = parsed_url.netloc
-            if domain in self.domain_list.keys():
-                self.domain_list[domain].append(url)
-            else:
-                self.domain_list[domain] = list()
-                self.domain_list[domain].append(url)
-                self.active_domains.append(domain)
+        domain = urlparse(url).netloc
+        priority = url_priority(url, self.downloaded.get(domain, 0))
+        with telemetry.timer("store"):
+            added = self.store.add(urlhash, url, domain, FILTER_VERSION, priority)
+        if added:
+            self._enqueue(url, priority)
+
+    def _linked(self, url):
+        ''' Move a queued url up for one more link to it. Urls that only
+        wait in the save file keep the priority they were saved with. '''
+        url = normalize(url)
+        queue = self.domain_list.get(urlparse(url).netloc)
+        if queue is not None:
+            with queue.lock:
+                queue.heap.linked(url)
 
-    def mark_url_complete(self, url):
+    def mark_url_complete(self, url, status=None, latency=None):
+        ''' Record url as downloaded. status and latency (seconds) of the
+        download, when given, adapt the delay before its domain is
+        fetched again (see crawler.rate). '''
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
+        domain = urlparse(url).netloc
+        telemetry.fetched(domain)
+        with telemetry.timer("store"):
+            seen = self.store.mark_complete(urlhash, url, domain)
+        if not seen:
             # This should not happen.
             self.logger.error(
                 f"Completed url {url}, but have not seen it before.")
 
-        self.save[urlhash] = (url, True)
-        self.save.sync()
+        # The domain may be fetched again once its delay has passed since
+        # this download finished, never sooner than the politeness delay
+        # or its Crawl-delay.
+        crawl_delay = self.robots.crawl_delay(url)
+        with self.condition:
+            self.in_progress -= 1
+            self.downloading_domains.discard(domain)
+            self.downloaded[domain] = self.downloaded.get(domain, 0) + 1
+            self.next_fetch[domain] = self.rates.completed(
+                domain, status, latency, floor=crawl_delay)
+            self._schedule(domain)
+            if self.in_progress == 0:
+                self.condition.notify_all()
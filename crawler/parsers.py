@@ -0,0 +1,45 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import parsing
+import scraper
+from utils.telemetry import telemetry
+
+
+class ParserPool(object):
+    '''Processes that run parsing.parse_page, so parsing, simhash and word
+    counting are not held back by the GIL of the crawling process. Only the
+    page bytes go to a parser and only (simhash, word counts, number of
+    words, links) come back; deduplication and every write stay in the
+    crawling process, parsers never import scraper. With 0 processes pages
+    are parsed in the calling thread, as before.'''
+    def __init__(self, processes=0):
+        self.processes = processes
+        self.executor = None
+        if processes > 0:
+            # spawn, since forking a process that runs threads may copy
+            # locks that are held at that moment
+            self.executor = ProcessPoolExecutor(
+                processes, mp_context=get_context("spawn"))
+
+    def submit(self, url, resp):
+        ''' concurrent.futures.Future of parsing.parse_page for a download,
+        or None if the page is not worth sending to a parser. '''
+        if resp.status != 200 or resp.raw_response is None:
+            return None
+        if not parsing.is_html(resp.body, resp.content_type):
+            return None # not worth copying to a parser
+        return self.executor.submit(
+            parsing.parse_page, url, resp.status, resp.raw_response.url,
+            resp.raw_response.content, resp.content_type)
+
+    def parse(self, url, resp):
+        with telemetry.timer("parse"):
+            if self.executor is None:
+                return scraper.parse_response(url, resp)
+            future = self.submit(url, resp)
+            return future.result() if future is not None else None
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
@@ -0,0 +1,335 @@
+import zlib
+
+from array import array
+from math import log2
+
+from url_filter import split_url, trap_score
+
+# Weights of the parts of a url's priority, lower priorities are fetched
+# first: one per path segment, per query parameter, per point of
+# url_filter.trap_score, per doubling of the links found to the url, and
+# per HOST_BUDGET urls already downloaded from its domain when it was found.
+DEPTH_WEIGHT = 1.0
+QUERY_WEIGHT = 0.5
+TRAP_WEIGHT = 3.0
+INLINK_WEIGHT = 1.0
+BUDGET_WEIGHT = 1.0
+HOST_BUDGET = 1000
+
+# UrlHeap keeps priorities in fixed point, as multiples of 1 / PRIORITY_SCALE
+# from -PRIORITY_BIAS up, in the 32 bits of a heap key above the url's slot.
+PRIORITY_SCALE = 1 << 16
+PRIORITY_BIAS = 1 << 10
+MAX_LEVEL = (1 << 32) - 1
+SLOT_MASK = (1 << 32) - 1
+# The bits of a url's hash kept to tell urls apart without reading them.
+TAG_SHIFT = 48
+# urls per compressed block of a UrlHeap
+URLS_PER_BLOCK = 64
+# Links counted per url, more only keep its place.
+MAX_LINKS = 0xffff
+
+
+def url_priority(url, downloaded=0):
+    ''' Priority of a newly found url of a domain `downloaded` urls were
+    downloaded from so far. '''
+    _, _, path, query = split_url(url)
+    depth = sum(1 for segment in path.split('/') if segment)
+    params = sum(1 for param in query.split('&') if param)
+    priority = (DEPTH_WEIGHT * depth + QUERY_WEIGHT * params
+                + TRAP_WEIGHT * trap_score(path, query)
+                + BUDGET_WEIGHT * downloaded / HOST_BUDGET)
+    # in UrlHeap's fixed point, so the priorities saved with urls compare
+    # exactly with the ones of queued urls
+    return round(priority * PRIORITY_SCALE) / PRIORITY_SCALE
+
+
+class UrlHeap(object):
+    '''Queued urls of one domain, lowest priority first and first found
+    first among equals.
+
+    Holds millions of urls without a Python object per url. The scheme and
+    netloc of a url are interned once per heap, the rest of it is stored
+    after the two byte id of its prefix in blocks of URLS_PER_BLOCK urls,
+    zlib compressed once full. Everything else lives in arrays indexed on
+    the url's slot, the order it was pushed in: where it ends in its block,
+    16 bits of its hash, its priority as pushed (fixed point, see _level)
+    and its links, 0 once it left the heap. The heap itself is an array of
+    64 bit keys, priority above slot. An open addressing table of slots
+    indexes the urls on their hash, so a url linked to again moves up
+    without a scan. Moved urls leave their old key in the heap, skipped
+    when popped, and the blocks are rewritten once most of their urls are
+    gone.'''
+    __slots__ = ("prefixes", "prefix_ids", "blocks", "tail", "cached",
+                 "ends", "tags", "levels", "links", "heap", "table", "live")
+
+    def __init__(self):
+        self.prefixes = []
+        self.prefix_ids = {}
+        self.live = 0
+        self._reset()
+        self.table = array("I", bytes(4 * 8))
+
+    def _reset(self):
+        self.blocks = []
+        self.tail = bytearray()
+        self.cached = (None, None)
+        self.ends = array("I")
+        self.tags = array("H")
+        self.levels = array("I")
+        self.links = array("H")
+        self.heap = array("Q")
+
+    def __len__(self):
+        return self.live
+
+    def _key(self, slot):
+        ''' Heap key of a slot with its links so far. '''
+        level = self.levels[slot] - _bonus(self.links[slot])
+        return max(level, 0) << 32 | slot
+
+    def _block(self, index):
+        ''' Content of block index, the last one read is kept. '''
+        if index == len(self.blocks):
+            return self.tail
+        cached_index, block = self.cached
+        if cached_index != index:
+            block = zlib.decompress(self.blocks[index])
+            self.cached = (index, block)
+        return block
+
+    def _data(self, slot):
+        ''' Prefix id and utf-8 of the rest of the url in slot. '''
+        start = self.ends[slot - 1] if slot % URLS_PER_BLOCK else 0
+        return bytes(self._block(slot // URLS_PER_BLOCK)[start:self.ends[slot]])
+
+    def _url(self, slot):
+        data = self._data(slot)
+        return self.prefixes[int.from_bytes(data[:2], "big")] + data[2:].decode("utf-8")
+
+    def _encode(self, url, add=False):
+        ''' Data of url as stored, None if its prefix was never seen and
+        add is False. '''
+        prefix, rest = _split(url)
+        prefix_id = self.prefix_ids.get(prefix)
+        if prefix_id is None:
+            if not add:
+                return None
+            prefix_id = self.prefix_ids[prefix] = len(self.prefixes)
+            self.prefixes.append(prefix)
+        return prefix_id.to_bytes(2, "big") + rest.encode("utf-8")
+
+    def _find(self, data, digest):
+        ''' (slot of a queued url, -1 if there is none, and its index in
+        the table). Slots that left the heap are skipped like tombstones. '''
+        table = self.table
+        mask = len(table) - 1
+        tag = digest >> TAG_SHIFT
+        index = digest & mask
+        while True:
+            entry = table[index]
+            if not entry:
+                return -1, index
+            slot = entry - 1
+            if (self.tags[slot] == tag and self.links[slot]
+                    and self._data(slot) == data):
+                return slot, index
+            index = (index + 1) & mask
+
+    def _append(self, data, tag, level, links):
+        ''' Store a url in the next slot, without indexing it. '''
+        self.tail += data
+        self.ends.append(len(self.tail))
+        if len(self.ends) % URLS_PER_BLOCK == 0:
+            self.blocks.append(zlib.compress(self.tail))
+            self.tail = bytearray()
+        self.tags.append(tag)
+        self.levels.append(level)
+        self.links.append(links)
+
+    def push(self, url, priority, links=1):
+        data = self._encode(url, add=True)
+        digest = _digest(data)
+        found, index = self._find(data, digest)
+        if found >= 0:
+            return
+        slot = len(self.links)
+        self.table[index] = slot + 1
+        links = min(links, MAX_LINKS)
+        self._append(data, digest >> TAG_SHIFT,
+                     min(_level(priority) + _bonus(links), MAX_LEVEL), links)
+        _push(self.heap, self._key(slot))
+        self.live += 1
+        if 4 * len(self.links) > 3 * len(self.table):
+            self._index(2 * len(self.table))
+
+    def pop(self):
+        heap = self.heap
+        while heap:
+            key = _pop(heap)
+            slot = key & SLOT_MASK
+            if self.links[slot] and self._key(slot) == key:
+                url = self._url(slot)
+                self.links[slot] = 0
+                self.live -= 1
+                if len(self.links) > 2 * self.live + 1024:
+                    self._compact()
+                return url
+        return None
+
+    def linked(self, url):
+        ''' Count one more link to a queued url. Returns False if url is
+        not queued here. '''
+        data = self._encode(url)
+        if data is None:
+            return False
+        slot, _ = self._find(data, _digest(data))
+        if slot < 0:
+            return False
+        if self.links[slot] < MAX_LINKS:
+            self.links[slot] += 1
+            _push(self.heap, self._key(slot))
+            if len(self.heap) > 2 * self.live + 64:
+                self.heap = array("Q", sorted(self._keys()))
+        return True
+
+    def _keys(self):
+        ''' Current key of every queued url. '''
+        key = self._key
+        return [key(slot) for slot, links in enumerate(self.links) if links]
+
+    def peek(self):
+        ''' Priority of the url pop would return, None if there is none. '''
+        heap = self.heap
+        while heap:
+            key = heap[0]
+            slot = key & SLOT_MASK
+            if self.links[slot] and self._key(slot) == key:
+                return _priority(key)
+            _pop(heap)
+        return None
+
+    def trim(self, size):
+        ''' Keep only the best size urls. Returns the best priority of the
+        ones dropped, None if none were. '''
+        if self.live <= size:
+            return None
+        ranked = sorted(self._keys())
+        for key in ranked[size:]:
+            self.links[key & SLOT_MASK] = 0
+        self.live = size
+        self._compact()
+        return _priority(ranked[size])
+
+    def _queued(self):
+        ''' (slot, data) of every queued url, one block read at a time. '''
+        return _stored(self.blocks, self.tail, self.ends, self.links)
+
+    def _index(self, size):
+        ''' Rebuild the table with size entries. '''
+        table = self.table = array("I", bytes(4 * size))
+        mask = size - 1
+        for slot, data in self._queued():
+            index = _digest(bytes(data)) & mask
+            while table[index]:
+                index = (index + 1) & mask
+            table[index] = slot + 1
+
+    def _compact(self):
+        ''' Move the queued urls into new slots, in order, and rebuild
+        the heap and the table. '''
+        queued = self._queued()
+        tags, levels, links = self.tags, self.levels, self.links
+        self._reset()
+        for slot, data in queued:
+            self._append(data, tags[slot], levels[slot], links[slot])
+        # a sorted array is a heap
+        self.heap = array("Q", sorted(self._keys()))
+        size = 8
+        while size < 2 * self.live:
+            size <<= 1
+        self._index(size)
+
+
+def _stored(blocks, tail, ends, links):
+    block = (None, None)
+    for slot, count in enumerate(links):
+        if count:
+            index, offset = divmod(slot, URLS_PER_BLOCK)
+            if index != block[0]:
+                block = (index, zlib.decompress(blocks[index])
+                         if index < len(blocks) else tail)
+            start = ends[slot - 1] if offset else 0
+            yield slot, block[1][start:ends[slot]]
+
+
+def _split(url):
+    ''' url as (scheme://netloc, the rest). '''
+    begin = url.find("://")
+    begin = begin + 3 if begin >= 0 else 0
+    end = len(url)
+    for mark in "/?#":
+        found = url.find(mark, begin, end)
+        if found >= 0:
+            end = found
+    return url[:end], url[end:]
+
+
+def _digest(data):
+    return hash(data) & ((1 << 64) - 1)
+
+
+def _level(priority):
+    ''' priority in fixed point: multiples of 1 / PRIORITY_SCALE, from
+    -PRIORITY_BIAS up. '''
+    level = round((priority + PRIORITY_BIAS) * PRIORITY_SCALE)
+    return min(max(level, 0), MAX_LEVEL)
+
+
+def _priority(key):
+    return (key >> 32) / PRIORITY_SCALE - PRIORITY_BIAS
+
+
+def _bonus(links):
+    ''' How far up links links move a url, in levels. '''
+    return round(INLINK_WEIGHT * log2(links) * PRIORITY_SCALE) if links > 1 else 0
+
+
+def _push(heap, key):
+    ''' heapq.heappush for an array. '''
+    heap.append(key)
+    pos = len(heap) - 1
+    while pos:
+        parent = (pos - 1) >> 1
+        if heap[parent] <= key:
+            break
+        heap[pos] = heap[parent]
+        pos = parent
+    heap[pos] = key
+
+
+def _pop(heap):
+    ''' heapq.heappop for an array: the hole left by the top goes down to
+    a leaf along the smaller children and the last key bubbles up from
+    there. '''
+    last = heap.pop()
+    if not heap:
+        return last
+    top = heap[0]
+    end = len(heap)
+    pos = 0
+    child = 1
+    while child < end:
+        if child + 1 < end and heap[child + 1] < heap[child]:
+            child += 1
+        heap[pos] = heap[child]
+        pos = child
+        child = 2 * pos + 1
+    while pos:
+        parent = (pos - 1) >> 1
+        if heap[parent] <= last:
+            break
+        heap[pos] = heap[parent]
+        pos = parent
+    heap[pos] = last
+    return top
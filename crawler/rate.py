@@ -0,0 +1,93 @@
+import time
+
+# Status passed for a download that got no response at all.
+NO_RESPONSE = 0
+
+# A host's delay is at least this many times its average response time.
+LATENCY_FACTOR = 2.0
+# Weight of the latest response time in the average.
+LATENCY_WEIGHT = 0.2
+# Seconds taken off a host's delay after every good download.
+DECREASE_STEP = 0.25
+# Longest delay between two downloads of a host that still answers.
+MAX_DELAY = 30.0
+# Failures in a row after which a host is parked, for PARK_SECONDS doubled
+# for every failure after that, up to MAX_PARK_SECONDS.
+PARK_AFTER = 5
+PARK_SECONDS = 30.0
+MAX_PARK_SECONDS = 1800.0
+
+
+def failed(status):
+    '''whether a download outcome counts against its host: no response,
+    a server error, or one of the cache server's 6xx errors (it could not
+    reach the host)'''
+    return status == NO_RESPONSE or status >= 500
+
+
+class HostState(object):
+    __slots__ = ("delay", "latency", "failures", "parked_until")
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.latency = None
+        self.failures = 0
+        self.parked_until = 0.0
+
+
+class RateController(object):
+    '''Per-host delay between downloads, adapted AIMD style: every good
+    download takes DECREASE_STEP off the delay, every failure doubles it.
+    The delay never drops below POLITENESS or the host's Crawl-delay, nor
+    below LATENCY_FACTOR times the host's average response time, so slow
+    hosts are given more room. After PARK_AFTER failures in a row a host is
+    parked, with the park doubling on every further failure, until a
+    download succeeds.'''
+    def __init__(self, floor, adaptive=True):
+        self.floor = floor
+        self.adaptive = adaptive
+        self.hosts = {}
+
+    def completed(self, host, status=None, latency=None, now=None, floor=None):
+        ''' Record a finished download of host and return when host may be
+        fetched next. status None means the outcome is not known. floor
+        raises the smallest delay of this host, for its Crawl-delay. '''
+        if now is None:
+            now = time.monotonic()
+        floor = self.floor if floor is None else max(self.floor, floor)
+        if not self.adaptive or status is None:
+            return now + floor
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = HostState(floor)
+
+        if latency is not None:
+            state.latency = latency if state.latency is None else (
+                LATENCY_WEIGHT * latency + (1 - LATENCY_WEIGHT) * state.latency)
+
+        if failed(status):
+            state.failures += 1
+            state.delay = min(max(MAX_DELAY, floor), max(floor, state.delay * 2))
+            if state.failures >= PARK_AFTER:
+                park = min(MAX_PARK_SECONDS,
+                           PARK_SECONDS * 2 ** (state.failures - PARK_AFTER))
+                state.parked_until = now + park
+                return state.parked_until
+        else:
+            state.failures = 0
+            state.parked_until = 0.0
+            state.delay = max(floor, state.delay - DECREASE_STEP)
+        if state.latency is not None:
+            state.delay = min(max(MAX_DELAY, floor),
+                              max(state.delay, LATENCY_FACTOR * state.latency))
+        return now + state.delay
+
+    def parked(self, now=None):
+        ''' Number of hosts parked right now. '''
+        if now is None:
+            now = time.monotonic()
+        return sum(1 for state in self.hosts.values() if state.parked_until > now)
+
+    def delays(self):
+        ''' {host: current delay in seconds} '''
+        return {host: state.delay for host, state in self.hosts.items()}
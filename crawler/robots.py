@@ -0,0 +1,320 @@
+import gzip
+import re
+import time
+
+from html import unescape
+from threading import Lock
+from urllib.parse import urlparse
+
+from utils.download import download
+from utils.telemetry import telemetry
+from crawler.rate import NO_RESPONSE
+from url_filter import valid_domain
+
+# Seconds before a robots.txt that could not be downloaded (no response, a
+# server error or a cache server error) is asked for again. Until then the
+# host is fully disallowed (RFC 9309) and its urls wait in their queue.
+# After ROBOTS_RETRIES such failures in a row its urls are dropped.
+RETRY_SECONDS = 600.0
+ROBOTS_RETRIES = 3
+# Longest Crawl-delay honored, in seconds.
+MAX_CRAWL_DELAY = 60.0
+# Sitemap files read when seeding from one host, sitemap indexes included,
+# and urls taken from them.
+MAX_SITEMAPS = 50
+MAX_SITEMAP_URLS = 50000
+
+# Bytes at the start of a sitemap that tell an index from a url set.
+SNIFF_INDEX = 1024
+
+SITEMAP_LOC = re.compile(rb"<loc>\s*(.*?)\s*</loc>", re.IGNORECASE | re.DOTALL)
+SITEMAP_INDEX = re.compile(rb"<sitemapindex[\s>]", re.IGNORECASE)
+# A product token ends at the version or the comments after it (RFC 9309).
+PRODUCT_END = re.compile(r"[/\s]")
+
+
+def product_token(user_agent):
+    ''' Lowercased product token of a user agent string or of the value of
+    a User-agent line: "IR F19 ..." -> "ir", "Googlebot/2.1" -> "googlebot". '''
+    return PRODUCT_END.split(user_agent.strip(), 1)[0].lower()
+
+
+class Rule(object):
+    '''One Allow or Disallow line. Patterns without wildcards are matched
+    as plain prefixes, the others are compiled to a regex once.'''
+    __slots__ = ("allow", "length", "prefix", "regex")
+
+    def __init__(self, pattern, allow):
+        self.allow = allow
+        self.length = len(pattern)
+        if "*" in pattern or pattern.endswith("$"):
+            self.prefix = None
+            anchored = pattern.endswith("$")
+            parts = (pattern[:-1] if anchored else pattern).split("*")
+            self.regex = re.compile(
+                ".*".join(re.escape(part) for part in parts)
+                + ("\\Z" if anchored else ""), re.DOTALL)
+        else:
+            self.prefix = pattern
+            self.regex = None
+
+    def matches(self, path):
+        if self.regex is None:
+            return path.startswith(self.prefix)
+        return self.regex.match(path) is not None
+
+
+class RobotsPolicy(object):
+    '''The part of a robots.txt that applies to our user agent: its rules
+    ordered so that the first match is the longest one, Allow winning
+    ties, its Crawl-delay and every Sitemap it lists. An unreachable policy
+    disallows everything until it expires, for a robots.txt that could not
+    be downloaded.'''
+    def __init__(self, rules=(), crawl_delay=None, sitemaps=(), expires=0.0,
+                 unreachable=False):
+        self.rules = sorted(rules, key=lambda rule: (-rule.length, not rule.allow))
+        self.crawl_delay = crawl_delay
+        self.sitemaps = list(sitemaps)
+        self.expires = expires
+        self.unreachable = unreachable
+
+    @classmethod
+    def disallow_all(cls, expires=0.0, unreachable=False):
+        return cls([Rule("/", False)], expires=expires, unreachable=unreachable)
+
+    @classmethod
+    def parse(cls, text, user_agent, expires=0.0):
+        ''' Policy of robots.txt text for user_agent: the groups naming its
+        product token, compared case-insensitively, if there are any, else
+        the * groups. '''
+        agent = product_token(user_agent)
+        groups = list()  # [agent tokens, rules, crawl delay]
+        sitemaps = list()
+        in_agents = False
+        for line in text.splitlines():
+            key, _, value = line.split("#", 1)[0].partition(":")
+            key, value = key.strip().lower(), value.strip()
+            if key == "user-agent":
+                if not in_agents:
+                    groups.append([[], [], None])
+                    in_agents = True
+                groups[-1][0].append("*" if value == "*" else product_token(value))
+                continue
+            if key == "sitemap":
+                sitemaps.append(value)
+                continue
+            in_agents = False
+            if not groups:
+                continue
+            if key in ("allow", "disallow") and value:
+                groups[-1][1].append(Rule(value, key == "allow"))
+            elif key == "crawl-delay":
+                try:
+                    groups[-1][2] = float(value)
+                except ValueError:
+                    pass
+
+        matching = [group for group in groups
+                    if agent in group[0]]
+        if not matching:
+            matching = [group for group in groups if "*" in group[0]]
+        rules = [rule for group in matching for rule in group[1]]
+        delays = [group[2] for group in matching if group[2] is not None]
+        crawl_delay = min(max(delays), MAX_CRAWL_DELAY) if delays else None
+        return cls(rules, crawl_delay, sitemaps, expires)
+
+    def allowed(self, path):
+        ''' path is the path and query of a url. '''
+        for rule in self.rules:
+            if rule.matches(path):
+                return rule.allow
+        return True
+
+
+class RobotsCache(object):
+    '''robots.txt policy of every host, downloaded through the cache server
+    by `refresh` when the frontier takes the host off its schedule, before
+    any of its pages, and again once config.robots_ttl seconds have passed.
+    Until it is downloaded every url of the host is allowed, so its urls are
+    checked again when they are taken. A host whose robots.txt is missing
+    (4xx) may be crawled entirely. One whose robots.txt could not be
+    downloaded is fully disallowed until it is retried, RETRY_SECONDS later:
+    its urls stay queued, see unreachable_until. `fetched(host)` is called after every
+    download made here, so the frontier can count it against the host's
+    politeness delay, and `wait(host)` before each download of
+    sitemap_urls, which runs outside the frontier's schedule, so it only
+    returns once that delay has passed.'''
+    def __init__(self, config, logger=None, fetched=None, wait=None):
+        self.config = config
+        self.logger = logger
+        self.enabled = config.robots
+        self.ttl = config.robots_ttl
+        self.fetched = fetched
+        self.wait = wait
+        self.lock = Lock()
+        self.policies = {}
+        self.host_locks = {}
+        # scheme of the first url of every host, for its robots.txt
+        self.schemes = {}
+        self.disallowed = 0
+        # robots.txt downloads failed in a row, by host
+        self.failures = {}
+
+    def policy(self, url):
+        ''' RobotsPolicy of the host of url, downloaded if not known or
+        expired. '''
+        parsed = urlparse(url)
+        host = parsed.netloc
+        policy = self.policies.get(host)
+        if policy is not None and policy.expires > time.monotonic():
+            return policy
+        with self.lock:
+            host_lock = self.host_locks.setdefault(host, Lock())
+        # one download per host, other threads wait for its result
+        with host_lock:
+            policy = self.policies.get(host)
+            if policy is None or policy.expires <= time.monotonic():
+                policy = self._download(parsed.scheme, host)
+                self.policies[host] = policy
+        return policy
+
+    def stale(self, host):
+        ''' Whether robots.txt of host is to be downloaded before its pages. '''
+        if not self.enabled:
+            return False
+        policy = self.policies.get(host)
+        return policy is None or policy.expires <= time.monotonic()
+
+    def refresh(self, host):
+        ''' Download robots.txt of host if it is stale. '''
+        if self.stale(host):
+            self.policy(f"{self.schemes.get(host, 'https')}://{host}/")
+
+    def unreachable_until(self, host):
+        ''' monotonic time at which robots.txt of host is asked for again if
+        it could not be downloaded, else None. '''
+        if not self.enabled:
+            return None
+        policy = self.policies.get(host)
+        if policy is None or not policy.unreachable:
+            return None
+        return policy.expires
+
+    def allowed(self, url):
+        ''' Whether the policy of the host of url allows it, as last
+        downloaded. Never downloads it. Urls of a host whose robots.txt
+        could not be downloaded are let through to wait in their queue. '''
+        if not self.enabled:
+            return True
+        parsed = urlparse(url)
+        policy = self.policies.get(parsed.netloc)
+        if policy is None:
+            self.schemes.setdefault(parsed.netloc, parsed.scheme)
+            return True
+        if policy.unreachable:
+            return True
+        path = parsed.path or "/"
+        if parsed.query:
+            path = f"{path}?{parsed.query}"
+        if policy.allowed(path):
+            return True
+        with self.lock:
+            self.disallowed += 1
+        return False
+
+    def crawl_delay(self, url):
+        ''' Crawl-delay of the host of url in seconds, None if it has none
+        or its robots.txt was not downloaded yet. '''
+        if not self.enabled:
+            return None
+        policy = self.policies.get(urlparse(url).netloc)
+        return None if policy is None else policy.crawl_delay
+
+    def sitemap_urls(self, url):
+        ''' Urls listed in the sitemaps of the host of url: the ones its
+        robots.txt names, else /sitemap.xml. Sitemap indexes are followed,
+        up to MAX_SITEMAPS files and MAX_SITEMAP_URLS urls. Every download
+        waits for the politeness delay of its host. '''
+        parsed = urlparse(url)
+        pending = list()
+        if self.enabled:
+            self._wait(parsed.netloc)
+            policy = self.policy(url)
+            if policy.unreachable:
+                return []
+            pending = list(reversed(policy.sitemaps))
+        if not pending:
+            pending = [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"]
+        urls = list()
+        visited = set()
+        while pending and len(visited) < MAX_SITEMAPS and len(urls) < MAX_SITEMAP_URLS:
+            sitemap = pending.pop()
+            sitemap_parsed = urlparse(sitemap)
+            if sitemap in visited or not valid_domain(
+                    sitemap_parsed.netloc, sitemap_parsed.path):
+                continue
+            visited.add(sitemap)
+            self._wait(sitemap_parsed.netloc)
+            status, content = self._get(sitemap)
+            if not content:
+                continue
+            if content[:2] == b"\x1f\x8b":
+                try:
+                    content = gzip.decompress(content)
+                except (OSError, EOFError):
+                    continue
+            locs = [unescape(loc.decode("utf-8", "replace"))
+                    for loc in SITEMAP_LOC.findall(content)]
+            if SITEMAP_INDEX.search(content[:SNIFF_INDEX]):
+                pending.extend(reversed(locs))
+            else:
+                urls.extend(locs[:MAX_SITEMAP_URLS - len(urls)])
+        if self.logger:
+            self.logger.info(
+                f"Found {len(urls)} urls in {len(visited)} sitemaps of {parsed.netloc}.")
+        return urls
+
+    def _wait(self, host):
+        if self.wait is not None:
+            self.wait(host)
+
+    def _get(self, url):
+        ''' (status, content) of url, content None unless the status is
+        200 and status NO_RESPONSE if nothing came back. '''
+        host = urlparse(url).netloc
+        try:
+            with telemetry.timer("robots"):
+                resp = download(url, self.config, self.logger)
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Failed to download {url}: {e}")
+            return NO_RESPONSE, None
+        finally:
+            if self.fetched is not None:
+                self.fetched(host)
+        if resp.status != 200 or resp.raw_response is None:
+            return resp.status, None
+        return resp.status, resp.raw_response.content or b""
+
+    def _download(self, scheme, host):
+        now = time.monotonic()
+        status, content = self._get(f"{scheme}://{host}/robots.txt")
+        if content is not None or 400 <= status < 500:
+            self.failures.pop(host, None)
+        if content is not None:
+            return RobotsPolicy.parse(
+                content.decode("utf-8", "replace"), self.config.user_agent,
+                now + self.ttl)
+        if 400 <= status < 500:
+            # no robots.txt, every url is allowed
+            return RobotsPolicy(expires=now + self.ttl)
+        failures = self.failures[host] = self.failures.get(host, 0) + 1
+        if failures > ROBOTS_RETRIES:
+            if self.logger:
+                self.logger.error(
+                    f"robots.txt of {host} failed {failures} times, "
+                    f"disallowing the host.")
+            return RobotsPolicy.disallow_all(now + self.ttl)
+        return RobotsPolicy.disallow_all(
+            now + min(self.ttl, RETRY_SECONDS), unreachable=True)
+
@@ -0,0 +1,285 @@
+import atexit
+import json
+import os
+import time
+
+from bisect import bisect
+from hashlib import md5
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from threading import Thread, Lock
+from urllib.parse import urlparse
+
+from utils import get_logger
+from crawler.frontier import Frontier
+from scraper import is_unseen, normalized_hash
+from utils.seen import SeenSet
+
+# Links for another node are sent once this many are waiting for it, or
+# every FORWARD_INTERVAL seconds. A batch that could not be sent goes back
+# to its outbox and is sent again after RETRY_INTERVAL seconds.
+FORWARD_BATCH = 500
+FORWARD_INTERVAL = 0.5
+RETRY_INTERVAL = 5.0
+# Seconds between two rounds of the first node asking every node whether
+# it is idle, and how long to keep trying to reach a node that is down.
+STATUS_INTERVAL = 1.0
+CONNECT_TIMEOUT = 60.0
+# Seconds to wait for a node to answer a status request.
+REPLY_TIMEOUT = 10.0
+
+
+def _point(key):
+    return int.from_bytes(md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing(object):
+    '''Consistent hashing of domains onto nodes: every node is put on a
+    ring at `replicas` pseudo-random points and a domain belongs to the
+    node at the first point after its own hash.'''
+    def __init__(self, nodes, replicas=100):
+        points = sorted(
+            (_point(f"{node}#{i}"), index)
+            for index, node in enumerate(nodes) for i in range(replicas))
+        self.points = [point for point, _ in points]
+        self.owners = [index for _, index in points]
+
+    def owner(self, domain):
+        return self.owners[bisect(self.points, _point(domain)) % len(self.points)]
+
+
+class ShardedFrontier(Frontier):
+    '''Frontier of one node of a crawl split over the nodes in config.nodes.
+
+    Each node only queues, deduplicates and downloads the domains the hash
+    ring gives it, so a domain is only ever fetched by one node and
+    POLITENESS holds across the whole crawl. Its save file, seen set,
+    simhash index and words are those of that shard. Links to domains of
+    other nodes are forwarded to them in batches, each url only once: it
+    is recorded in forwarded.db once its batch was sent. The crawl ends
+    once the first node sees every node idle with every batch sent also
+    received, twice in a row.'''
+    def __init__(self, config, restart):
+        self.node_id = config.node
+        self.ring = HashRing([f"{host}:{port}" for host, port in config.nodes])
+        self.stopped = False
+        self.node = ShardNode(self, config)
+        if restart and os.path.exists('forwarded.db'):
+            SeenSet.delete('forwarded.db')
+        self.forwarded = SeenSet.from_config(config, 'forwarded.db', deferred=True)
+        super().__init__(config, restart)
+        self.node.start()
+
+    def _owns(self, domain):
+        return self.ring.owner(domain) == self.node_id
+
+    def _accept(self, url):
+        owner = self.ring.owner(urlparse(url).netloc)
+        if owner == self.node_id:
+            super()._accept(url)
+        elif is_unseen(url, self.forwarded):
+            self.node.forward(owner, url)
+
+    def receive(self, urls):
+        ''' Add urls forwarded by another node. '''
+        for url in urls:
+            super()._accept(url)
+
+    def delivered(self, urls):
+        ''' Record urls as forwarded for good, once another node got them. '''
+        for url in urls:
+            self.forwarded.release(normalized_hash(urlparse(url)))
+        self.forwarded.flush()
+
+    def idle(self):
+        with self.condition:
+            return not self.schedule and self.in_progress == 0
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def _finished(self):
+        # other nodes may still forward urls until the crawl is stopped
+        return self.stopped
+
+
+class ShardNode(object):
+    '''Connections of a ShardedFrontier to the other nodes. Messages are
+    JSON lists over multiprocessing.connection, never pickles, and every
+    connection is authenticated with config.shard_key: ["urls", [url]],
+    ["status"] answered with [idle, batches sent, batches received], and
+    ["stop"].'''
+    def __init__(self, frontier, config):
+        self.logger = get_logger(f"SHARD-{config.node}", "SHARD")
+        self.frontier = frontier
+        self.node_id = config.node
+        self.addresses = config.nodes
+        assert config.shard_key, "Set SHARDKEY in config.ini or CRAWLER_SHARD_KEY for a distributed crawl"
+        self.authkey = config.shard_key.encode()
+        self.peers = [node for node in range(len(self.addresses))
+                      if node != self.node_id]
+        self.lock = Lock()
+        self.outboxes = {peer: list() for peer in self.peers}
+        # monotonic time before which a peer whose last send failed is
+        # not sent to again
+        self.retry_at = {peer: 0.0 for peer in self.peers}
+        self.sent = 0
+        self.received = 0
+        self.connections = {}
+        self.connection_locks = {peer: Lock() for peer in self.peers}
+
+    def start(self):
+        listener = Listener(self.addresses[self.node_id], authkey=self.authkey)
+        Thread(target=self._listen, args=(listener,), daemon=True).start()
+        Thread(target=self._flush_loop, daemon=True).start()
+        if self.node_id == 0:
+            Thread(target=self._coordinate, daemon=True).start()
+        # a node that exits early still hands over what it has
+        atexit.register(self.flush)
+
+    def forward(self, peer, url):
+        with self.lock:
+            self.outboxes[peer].append(url)
+            if (len(self.outboxes[peer]) < FORWARD_BATCH or
+                    time.monotonic() < self.retry_at[peer]):
+                return
+            batch = self._take(peer)
+        self._send_batch(peer, batch)
+
+    def flush(self):
+        ''' Send every outbox that is not empty, but to a peer whose last
+        send failed only once RETRY_INTERVAL has passed. '''
+        for peer in self.peers:
+            with self.lock:
+                if not self.outboxes[peer] or time.monotonic() < self.retry_at[peer]:
+                    continue
+                batch = self._take(peer)
+            self._send_batch(peer, batch)
+
+    def _take(self, peer):
+        ''' Empty the outbox of peer, counting it as sent in the same step
+        so an idle check never misses it. Must be called with self.lock held. '''
+        batch, self.outboxes[peer] = self.outboxes[peer], list()
+        self.sent += 1
+        return batch
+
+    def status(self):
+        idle = self.frontier.idle()
+        with self.lock:
+            idle = idle and not any(self.outboxes.values())
+            return idle, self.sent, self.received
+
+    def _connect(self, peer):
+        if peer not in self.connections:
+            deadline = time.monotonic() + CONNECT_TIMEOUT
+            while True:
+                try:
+                    self.connections[peer] = Client(
+                        self.addresses[peer], authkey=self.authkey)
+                    break
+                except ConnectionRefusedError:
+                    # the node has not started listening yet
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.5)
+        return self.connections[peer]
+
+    def _send(self, peer, message, reply=False):
+        ''' Send message to peer, and return its reply if asked to. A
+        connection that fails or whose reply does not come within
+        REPLY_TIMEOUT is dropped, to be opened again by the next message. '''
+        with self.connection_locks[peer]:
+            connection = self._connect(peer)
+            try:
+                connection.send_bytes(json.dumps(message).encode())
+                if not reply:
+                    return None
+                if not connection.poll(REPLY_TIMEOUT):
+                    raise TimeoutError(f"No reply from node {peer} in {REPLY_TIMEOUT}s")
+                return json.loads(connection.recv_bytes())
+            except (OSError, EOFError, ValueError):
+                del self.connections[peer]
+                connection.close()
+                raise
+
+    def _listen(self, listener):
+        while True:
+            try:
+                connection = listener.accept()
+            except (AuthenticationError, OSError) as e:
+                self.logger.error(f"Refused a connection: {e}")
+                continue
+            Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        while True:
+            try:
+                message = json.loads(connection.recv_bytes())
+            except (EOFError, OSError):
+                return
+            except ValueError as e:
+                self.logger.error(f"Dropped a connection sending a bad message: {e}")
+                connection.close()
+                return
+            if message[0] == "urls":
+                self.frontier.receive(message[1])
+                with self.lock:
+                    self.received += 1
+            elif message[0] == "status":
+                connection.send_bytes(json.dumps(self.status()).encode())
+            elif message[0] == "stop":
+                self.frontier.stop()
+
+    def _flush_loop(self):
+        while not self.frontier.stopped:
+            time.sleep(FORWARD_INTERVAL)
+            self.flush()
+
+    def _send_batch(self, peer, batch):
+        try:
+            self._send(peer, ["urls", batch])
+        except (OSError, EOFError, ValueError) as e:
+            self.logger.error(
+                f"Failed to send {len(batch)} urls to node {peer}, "
+                f"retrying in {RETRY_INTERVAL}s: {e}")
+            with self.lock:
+                # not sent after all, until it is taken again
+                self.sent -= 1
+                self.outboxes[peer][:0] = batch
+                self.retry_at[peer] = time.monotonic() + RETRY_INTERVAL
+            return
+        with self.lock:
+            self.retry_at[peer] = 0.0
+        self.frontier.delivered(batch)
+
+    def _coordinate(self):
+        ''' Stop every node once all of them are idle and no batch is in
+        flight, with no message sent in between two rounds. '''
+        previous = None
+        while True:
+            time.sleep(STATUS_INTERVAL)
+            try:
+                statuses = [self.status()] + [
+                    self._send(peer, ["status"], reply=True)
+                    for peer in self.peers]
+            except (OSError, EOFError, ValueError) as e:
+                self.logger.error(f"Failed to reach a node: {e}")
+                previous = None
+                continue
+            sent = sum(status[1] for status in statuses)
+            received = sum(status[2] for status in statuses)
+            if not all(status[0] for status in statuses) or sent != received:
+                previous = None
+                continue
+            if previous == (sent, received):
+                break
+            previous = (sent, received)
+        self.logger.info("Every node is idle. Stopping the crawl.")
+        for peer in self.peers:
+            try:
+                self._send(peer, ["stop"])
+            except (OSError, EOFError, ValueError) as e:
+                self.logger.error(f"Failed to stop node {peer}: {e}")
+        self.frontier.stop()
@@ -0,0 +1,273 @@
+import dbm
+import os
+import shelve
+import sqlite3
+import atexit
+import time
+
+from threading import RLock
+
+
+class FrontierStore(object):
+    ''' Persistent record of every url the frontier has seen, keyed on
+    utils.get_urlhash, and whether it has been downloaded. The frontier
+    only talks to its store through these methods, so alternate backends
+    can be registered in STORES and picked with STORE in config.ini. '''
+    # Whether pending_domains and pending_best are supported, so the
+    # frontier can resume without reading every pending url up front and
+    # keep only the best urls of a domain in memory.
+    lazy_resume = False
+    # Called before a page is saved as downloaded for good, so whatever
+    # was recorded for it is written first.
+    before_commit = None
+    # Called once every write so far is durable, with the store's lock
+    # held, so what must not outlive a crash without them is written then.
+    after_commit = None
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.save_file)
+
+    @staticmethod
+    def files(path):
+        ''' Every file a store at path may have created. '''
+        return [path]
+
+    @classmethod
+    def exists(cls, path):
+        return any(os.path.exists(name) for name in cls.files(path))
+
+    @classmethod
+    def delete(cls, path):
+        for name in cls.files(path):
+            if os.path.exists(name):
+                os.remove(name)
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def add(self, urlhash, url, domain, version=None, priority=None):
+        ''' Record a new pending url that passed version `version` of
+        scraper.is_valid, with its crawler.priority. Returns False if it
+        was seen before. '''
+        raise NotImplementedError
+
+    def mark_complete(self, urlhash, url, domain):
+        ''' Record url as downloaded. Returns False if it was never added. '''
+        raise NotImplementedError
+
+    def mark_pending(self, urlhash, url, domain, priority=None):
+        ''' Record a downloaded url as to be downloaded again. '''
+        raise NotImplementedError
+
+    def pending(self):
+        ''' Iterate over the urls that still have to be downloaded. '''
+        raise NotImplementedError
+
+    def pending_domains(self):
+        ''' Iterate over the domains that have urls to be downloaded. '''
+        raise NotImplementedError
+
+    def pending_best(self, domain, limit):
+        ''' Up to limit [(url, version, priority)] of urls of domain still
+        to be downloaded, lowest priority first. '''
+        raise NotImplementedError
+
+    def flush(self):
+        ''' Make every write so far durable. '''
+
+    def close(self):
+        self.flush()
+
+
+class ShelveStore(FrontierStore):
+    ''' The original save file: a shelf of urlhash -> (url, completed),
+    synced to disk after every write. '''
+    def __init__(self, path):
+        super().__init__(path)
+        self.lock = RLock()
+        self.save = shelve.open(path)
+
+    @staticmethod
+    def files(path):
+        # the dbm module picked by shelve decides on the extensions
+        return [path] + [path + ext for ext in (".db", ".dat", ".dir", ".bak")]
+
+    @staticmethod
+    def found(path):
+        ''' Whether path is a shelf, and not the save file of another store. '''
+        return bool(dbm.whichdb(path))
+
+    def __len__(self):
+        with self.lock:
+            return len(self.save)
+
+    def add(self, urlhash, url, domain, version=None, priority=None):
+        with self.lock:
+            if urlhash in self.save:
+                return False
+            self.save[urlhash] = (url, False)
+            self.save.sync()
+            if self.after_commit is not None:
+                self.after_commit()
+            return True
+
+    def mark_complete(self, urlhash, url, domain):
+        with self.lock:
+            if self.before_commit is not None:
+                self.before_commit()
+            seen = urlhash in self.save
+            self.save[urlhash] = (url, True)
+            self.save.sync()
+            return seen
+
+    def mark_pending(self, urlhash, url, domain, priority=None):
+        with self.lock:
+            self.save[urlhash] = (url, False)
+            self.save.sync()
+
+    def pending(self):
+        with self.lock:
+            entries = list(self.save.values())
+        for url, completed in entries:
+            if not completed:
+                yield url
+
+    def close(self):
+        with self.lock:
+            self.save.close()
+
+
+class SQLiteStore(FrontierStore):
+    ''' Save file in a sqlite database in WAL mode.
+
+    Writes go into an open transaction that is committed once it holds
+    `commit_size` writes or is `commit_seconds` old, instead of syncing
+    after every url. Commits keep the order of the writes, so a crash
+    loses at most the last window, never the links of a page whose
+    completion was saved, and before_commit runs first, so neither its
+    words. '''
+    lazy_resume = True
+
+    def __init__(self, path, commit_size=1000, commit_seconds=1.0):
+        super().__init__(path)
+        self.commit_size = commit_size
+        self.commit_seconds = commit_seconds
+        self.lock = RLock()
+        self.uncommitted = 0
+        self.last_commit = time.monotonic()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS urls ("
+                "urlhash TEXT PRIMARY KEY, url TEXT NOT NULL, "
+                "domain TEXT NOT NULL, completed INTEGER NOT NULL DEFAULT 0, "
+                "valid_version INTEGER, priority REAL)")
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS urls_completed_domain "
+                "ON urls (completed, domain)")
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS urls_domain ON urls (domain)")
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS urls_completed_domain_priority "
+                "ON urls (completed, domain, priority)")
+        atexit.register(self.close)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.save_file, config.commit_size, config.commit_seconds)
+
+    @staticmethod
+    def files(path):
+        return [path, path + "-wal", path + "-shm"]
+
+    def _wrote(self):
+        self.uncommitted += 1
+        if (self.uncommitted >= self.commit_size or
+                time.monotonic() - self.last_commit >= self.commit_seconds):
+            self._commit()
+
+    def _commit(self):
+        if self.before_commit is not None:
+            self.before_commit()
+        self.db.commit()
+        if self.after_commit is not None:
+            self.after_commit()
+        self.uncommitted = 0
+        self.last_commit = time.monotonic()
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def add(self, urlhash, url, domain, version=None, priority=None):
+        with self.lock:
+            added = self.db.execute(
+                "INSERT OR IGNORE INTO urls "
+                "(urlhash, url, domain, valid_version, priority) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (urlhash, url, domain, version, priority)).rowcount == 1
+            if added:
+                self._wrote()
+            return added
+
+    def mark_complete(self, urlhash, url, domain):
+        with self.lock:
+            seen = self.db.execute(
+                "UPDATE urls SET completed = 1 WHERE urlhash = ?",
+                (urlhash,)).rowcount == 1
+            if not seen:
+                self.db.execute(
+                    "INSERT INTO urls (urlhash, url, domain, completed) "
+                    "VALUES (?, ?, ?, 1)", (urlhash, url, domain))
+            self._wrote()
+            return seen
+
+    def mark_pending(self, urlhash, url, domain, priority=None):
+        with self.lock:
+            self.db.execute(
+                "UPDATE urls SET completed = 0, priority = ? WHERE urlhash = ?",
+                (priority, urlhash))
+            self._wrote()
+
+    def pending(self):
+        with self.lock:
+            urls = [url for url, in self.db.execute(
+                "SELECT url FROM urls WHERE completed = 0")]
+        yield from urls
+
+    def pending_domains(self):
+        with self.lock:
+            return [domain for domain, in self.db.execute(
+                "SELECT DISTINCT domain FROM urls WHERE completed = 0")]
+
+    def pending_best(self, domain, limit):
+        # urls saved before priorities existed have none and come first
+        with self.lock:
+            return self.db.execute(
+                "SELECT url, valid_version, priority FROM urls "
+                "WHERE completed = 0 AND domain = ? "
+                "ORDER BY priority LIMIT ?", (domain, limit)).fetchall()
+
+    def flush(self):
+        with self.lock:
+            if self.db is not None:
+                self._commit()
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self._commit()
+                self.db.close()
+                self.db = None
+
+
+STORES = {
+    "shelve": ShelveStore,
+    "sqlite": SQLiteStore,
+}
@@ -2,25 +2,24 @@ from threading import Thread, Event
 
 from inspect import getsource
 from utils.download import download
-from utils import get_logger
+from utils import get_logger, PER_URL
+from utils.telemetry import telemetry
+from crawler.rate import NO_RESPONSE
 import scraper
 import time
 
-from urllib.parse import urlparse
-
 pause_event = Event()
 pause_event.set()
 
 
 class Worker(Thread):
-    def __init__(self, worker_id, config, frontier):
+    def __init__(self, worker_id, config, frontier, parsers=None):
         self.id = worker_id
         self.logger = get_logger(f"Worker-{worker_id}", "Worker")
         self.config = config
         self.frontier = frontier
         self.lock = frontier.lock
-        self.current_domain = self.frontier.get_domain()
-        self.frontier.active_workers[self.id] = True
+        self.parsers = parsers
         # basic check for requests in scraper
         assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
         assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
@@ -28,30 +27,32 @@ class Worker(Thread):
         
     def run(self):
         while True:
-            if self.current_domain == None:
-                self.current_domain = self.frontier.get_domain()
-                if self.current_domain == None:
-                    self.frontier.active_workers[self.id] = False
-                    if self.frontier.not_running():
-                        self.logger.info(f"Ending Thread")
-                        return
-                    time.sleep(6)
-                    continue
-
-            tbd_url = self.frontier.get_tbd_url(self.current_domain)
+            tbd_url = self.frontier.get_tbd_url()
             if not tbd_url:
-                self.logger.info("Domain is empty. Switching Domains.")
-                del self.frontier.domain_list[domain]
-                self.current_domain = None
-                continue
-            parsed_url = urlparse(tbd_url)
-            domain = parsed_url.netloc
-            resp = download(tbd_url, self.config, self.logger)
-            self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-            scraped_urls = scraper.scraper(tbd_url, resp, self.lock)
-            for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
-            self.frontier.mark_url_complete(tbd_url)
-            time.sleep(self.config.time_delay)
+                self.logger.info("Frontier is empty. Stopping Crawler.")
+                break
+            status, latency = NO_RESPONSE, None
+            try:
+                start = time.perf_counter()
+                with telemetry.timer("download"):
+                    resp = download(tbd_url, self.config, self.logger)
+                status, latency = resp.status, time.perf_counter() - start
+                self.logger.info(
+                    f"Downloaded {tbd_url}, status <{resp.status}>, "
+                    f"using cache {self.config.cache_server}.", extra=PER_URL)
+                if scraper.unchanged(tbd_url, resp, self.config.recrawl):
+                    # same as on the last crawl, its links are known
+                    scraped_urls = []
+                elif self.parsers is None:
+                    scraped_urls = scraper.scraper(tbd_url, resp, self.lock)
+                else:
+                    scraped_urls = scraper.record_page(
+                        tbd_url, self.parsers.parse(tbd_url, resp), self.lock)
+                self.frontier.add_urls(scraped_urls)
+            except Exception as e:
+                # one bad page or a dropped connection must not end the
+                # thread, the url counts as crawled and the loop goes on
+                self.logger.error(f"Failed to crawl {tbd_url}: {e!r}")
+            finally:
+                # also hands the domain back to the frontier's schedule
+                self.frontier.mark_url_complete(tbd_url, status, latency)
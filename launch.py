@@ -1,23 +1,49 @@
+import logging
+
 from configparser import ConfigParser
 from argparse import ArgumentParser
 
 from utils.server_registration import get_cache_server
 from utils.config import Config
-from crawler import Crawler
+from utils import configure_logging
 
 
-def main(config_file, restart):
+def main(config_file, restart, use_async=False, node=None, recrawl=False):
+    # not at the top: parser processes run this module's top level when
+    # they start, and must not import scraper and its stores
+    from crawler import Crawler, AsyncCrawler, Frontier, ShardedFrontier
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
-    config.cache_server = get_cache_server(config, restart)
-    crawler = Crawler(config, restart)
+    configure_logging(config)
+    if node is not None:
+        config.node = node
+    config.recrawl = recrawl
+    if config.replay_file:
+        # downloads are answered from the archive, no cache server needed
+        config.cache_server = None
+    else:
+        config.cache_server = get_cache_server(config, restart)
+    frontier_factory = ShardedFrontier if config.nodes else Frontier
+    if use_async:
+        crawler = AsyncCrawler(config, restart, frontier_factory)
+    else:
+        crawler = Crawler(config, restart, frontier_factory)
     crawler.start()
 
 
 if __name__ == "__main__":
+    # Nothing in utils.logs.FORMAT needs the thread or process of a record,
+    # so records skip collecting them (see "Optimization" in the logging docs).
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
     parser = ArgumentParser()
-    parser.add_argument("--restart", action="store_true", default=False)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--restart", action="store_true", default=False)
+    mode.add_argument("--recrawl", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--async", dest="use_async", action="store_true", default=False)
+    parser.add_argument("--node", type=int, default=None)
     args = parser.parse_args()
-    main(args.config_file, args.restart)
+    main(args.config_file, args.restart, args.use_async, args.node, args.recrawl)
@@ -0,0 +1,113 @@
+from html.parser import HTMLParser
+
+from bs4.dammit import UnicodeDammit
+
+import tokenizer
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# get_text in BeautifulSoup does not return the contents of these tags
+HIDDEN_TAGS = {'script', 'style', 'template'}
+
+
+class Page(object):
+    '''Everything the scraper needs from one html document, collected in a
+    single parse: the visible text, the lowercase word stream used by both
+    simhash and word counting, the <a href> links and the robots meta tag.'''
+    def __init__(self, content, use_lxml=True):
+        builder = _PageBuilder()
+        if use_lxml and etree is not None:
+            try:
+                parser = etree.HTMLParser(target=builder)
+                parser.feed(content)
+                parser.close()
+            except (etree.LxmlError, ValueError):
+                builder = _parse_stdlib(content)
+        else:
+            builder = _parse_stdlib(content)
+
+        self.text = ' '.join(builder.strings)
+        self.links = builder.links
+        self.robots = builder.robots
+        self.words = tokenizer.words(self.text)
+
+
+class _PageBuilder(object):
+    '''lxml parser target, also driven by _StdlibParser'''
+    def __init__(self):
+        self.strings = []
+        self.links = []
+        self.robots = None
+        self.hidden = 0
+        self.pending = []
+
+    def _flush(self):
+        if self.pending:
+            string = ''.join(self.pending).strip()
+            if string and not self.hidden:
+                self.strings.append(string)
+            self.pending = []
+
+    def start(self, tag, attrs):
+        self._flush()
+        if tag in HIDDEN_TAGS:
+            self.hidden += 1
+        elif tag == 'a':
+            href = attrs.get('href')
+            if href is not None:
+                self.links.append((href, (attrs.get('rel') or '').split()))
+        elif tag == 'meta' and self.robots is None and attrs.get('name') == 'robots':
+            self.robots = attrs.get('content') or ''
+
+    def end(self, tag):
+        self._flush()
+        if tag in HIDDEN_TAGS and self.hidden:
+            self.hidden -= 1
+
+    def data(self, data):
+        self.pending.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        return self
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, builder):
+        super().__init__(convert_charrefs=True)
+        self.builder = builder
+
+    def handle_starttag(self, tag, attrs):
+        self.builder.start(tag, {key: value or '' for key, value in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.builder.end(tag)
+
+    def handle_endtag(self, tag):
+        self.builder.end(tag)
+
+    def handle_data(self, data):
+        self.builder.data(data)
+
+    def handle_comment(self, data):
+        self.builder.comment(data)
+
+
+def _parse_stdlib(content):
+    if isinstance(content, bytes):
+        try:
+            content = content.decode('utf-8')
+        except UnicodeDecodeError:
+            content = UnicodeDammit(content, is_html=True).unicode_markup or ''
+    builder = _PageBuilder()
+    parser = _StdlibParser(builder)
+    parser.feed(content)
+    parser.close()
+    return builder.close()
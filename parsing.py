@@ -0,0 +1,97 @@
+'''What the scraper computes from the content of a page alone: whether it
+is html, its links, simhash and word counts. Nothing here opens a file or
+keeps state between pages, so parser processes (crawler.parsers) import
+this module rather than scraper, whose module level stores belong to the
+crawling process.'''
+import re
+from urllib.parse import urlparse, urljoin, urldefrag
+
+import tokenizer
+from page import Page
+from simhash import compute_simhash
+
+stop_words = {
+    "a", "about", "above", "after", "again", "against", "all", "am", "an", "and", "any", "are", "arent", "as", "at",
+    "be", "because", "been", "before", "being", "below", "between", "both", "but", "by", "cant", "cannot", "could",
+    "couldnt", "did", "didnt", "do", "does", "doesnt", "doing", "dont", "down", "during", "each", "few", "for",
+    "from", "further", "had", "hadnt", "has", "hasnt", "have", "havent", "having", "he", "hed", "hell", "hes",
+    "her", "here", "heres", "hers", "herself", "him", "himself", "his", "how", "hows", "i", "id", "ill", "im",
+    "ive", "if", "in", "into", "is", "isnt", "it", "its", "itself", "lets", "me", "more", "most", "mustnt",
+    "my", "myself", "no", "nor", "not", "of", "off", "on", "once", "only", "or", "other", "ought", "our", "ours",
+    "ourselves", "out", "over", "own", "same", "shant", "she", "shed", "shell", "shes", "should", "shouldnt",
+    "so", "some", "such", "than", "that", "thats", "the", "their", "theirs", "them", "themselves", "then", "there",
+    "theres", "these", "they", "theyd", "theyll", "theyre", "theyve", "this", "those", "through", "to", "too",
+    "under", "until", "up", "very", "was", "wasnt", "we", "wed", "well", "were", "weve", "were", "werent",
+    "what", "whats", "when", "whens", "where", "wheres", "which", "while", "who", "whos", "whom", "why", "whys",
+    "with", "wont", "would", "wouldnt", "you", "youd", "youll", "youre", "youve", "your", "yours", "yourself",
+    "yourselves"
+}
+
+# media types that are never html, checked before looking at the content
+BINARY_TYPES = {'image', 'audio', 'video', 'font'}
+HTML_TAG = re.compile(rb"<(?:html|head|body)", re.IGNORECASE)
+# bytes looked at to tell binary content from text
+SNIFF_BYTES = 1024
+
+def is_html(content, content_type=''):
+    '''return true if string contains html'''
+    major, _, minor = content_type.partition('/')
+    if major in BINARY_TYPES or (
+            major == 'application' and 'html' not in minor and 'xml' not in minor):
+        return False
+    head = bytes(content[:SNIFF_BYTES])
+    #valid pdf should always start with %pdf, html has no NUL bytes
+    if head.startswith(b'%PDF') or b'\0' in head:
+        return False
+    # one pass over the content, without lowercasing a copy of it
+    return HTML_TAG.search(content) is not None
+
+def count_words(words, limit = 50):
+    '''(Counter of the words that are not stop words, number of words) of a
+    page, counting words longer than two letters. The Counter is None for
+    pages with fewer than limit words.'''
+    counts, num_words = tokenizer.count(words, min_length=3, stop_words=stop_words)
+    if num_words < limit:
+        return None, num_words
+    return counts, num_words
+
+def is_absolute(url):
+    '''return true if url is absolute and false if it is relative'''
+    parsed = urlparse(url)
+    return parsed.scheme and parsed.netloc
+
+def ignore(link, rel):
+    '''return true if link should be ignored'''
+    fragment = re.match(r"^#",link) # fragments
+    js = re.match(r"^javascript:",link) # js links
+    tel = re.match(r"^tel:",link) # tel links
+    nofollow = 'nofollow' in rel # nofollow links
+    return fragment or nofollow or js or tel
+
+def page_links(url, final_url, page):
+    '''links of page resolved against final_url, the url it was served from'''
+    links = []
+    for link, rel in page.links:
+        if not ignore(link, rel):
+            if not is_absolute(link):
+                link = urldefrag(urljoin(final_url, link))[0]
+            if link != url:
+                links.append(link)
+    return links
+
+def parse_page(url, status, final_url, content, content_type=''):
+    '''The CPU bound part of scraper. Returns None if the page is to be
+    ignored, else (simhash, word counts, number of words, links).'''
+    if status != 200 or not is_html(content, content_type):
+        return None # ignore if broken link, bad request, or not html
+    # parse once, every stage below works off the same page
+    page = Page(content)
+    nofollow = False
+    if page.robots is not None:
+        nofollow = ('nofollow' in page.robots)
+        if 'noindex' in page.robots: # noindex: ignore
+            return None
+
+    counts, num_words = count_words(page.words)
+    links = [] if nofollow else page_links(url, final_url, page)
+    return compute_simhash(page.words), counts, num_words, links
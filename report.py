@@ -0,0 +1,128 @@
+'''Writes report.txt from the stores of a crawl: the number of unique pages
+(by normalized hash), the longest page, the most common words and the pages
+of every subdomain.
+
+Pages are read from pages.db in the order they were recorded, a batch at a
+time, and only the ones recorded since the last run: what was counted is
+kept in report.db. Words come from words.db. Runs next to a live crawl, and
+with --every writes the report again every that many seconds.
+
+    python report.py --output report.txt --top 50 --every 60
+'''
+import os
+import sqlite3
+import time
+from argparse import ArgumentParser
+from collections import Counter
+
+import analyze_links as al
+from url_filter import split_url
+from utils import delete_database
+from utils.history import PageHistory
+
+RULE = "=" * 100
+
+
+class Report(object):
+    '''Unique pages and pages per subdomain of the crawl, kept in a sqlite
+    database with the sequence number of the last page counted. The hashes
+    already counted are in an index on disk, memory only holds one batch.'''
+    def __init__(self, path="report.db", history=None, words=None, batch=10000):
+        self.path = path
+        self.history = history or PageHistory("pages.db")
+        self.words = words or al.word_store
+        self.batch = batch
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS pages (hash BLOB PRIMARY KEY) WITHOUT ROWID")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS subdomains "
+                "(netloc TEXT PRIMARY KEY, pages INTEGER NOT NULL)")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS cursor "
+                "(id INTEGER PRIMARY KEY CHECK (id = 0), recorded INTEGER NOT NULL)")
+            self.db.execute("INSERT OR IGNORE INTO cursor VALUES (0, 0)")
+
+    @staticmethod
+    def delete(path="report.db"):
+        delete_database(path)
+
+    def update(self):
+        '''Count the pages recorded since the last update. Returns how many
+        were read.'''
+        after, = self.db.execute("SELECT recorded FROM cursor").fetchone()
+        rows = []
+        read = 0
+        for row in self.history.recorded(after, self.batch):
+            rows.append(row)
+            if len(rows) == self.batch:
+                read += self._count(rows)
+                rows = []
+        return read + self._count(rows)
+
+    def _count(self, rows):
+        if not rows:
+            return 0
+        subdomains = Counter()
+        with self.db:
+            for _, url, urlhash in rows:
+                # a page recorded again, on a recrawl, is counted once
+                if self.db.execute(
+                        "INSERT OR IGNORE INTO pages VALUES (?)", (urlhash,)).rowcount:
+                    subdomains[split_url(url)[1].lower()] += 1
+            self.db.executemany(
+                "INSERT INTO subdomains (netloc, pages) VALUES (?, ?) "
+                "ON CONFLICT (netloc) DO UPDATE SET pages = pages + excluded.pages",
+                subdomains.items())
+            self.db.execute("UPDATE cursor SET recorded = ?", (rows[-1][0],))
+        return len(rows)
+
+    def unique_pages(self):
+        return self.db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def subdomains(self):
+        '''[(netloc, pages)] in the order of the netlocs'''
+        return self.db.execute(
+            "SELECT netloc, pages FROM subdomains ORDER BY netloc").fetchall()
+
+    def write(self, path="report.txt", top=50):
+        '''Write the report to path, replacing it only once it is complete.'''
+        num_words, url = self.words.longest_page()
+        top_words = self.words.top_words(top)
+        subdomains = self.subdomains()
+        lines = [f"1. {self.unique_pages()} Unique Pages Crawled", RULE,
+                 f"2. Longest Page: {url} with {num_words} words", RULE,
+                 f"3. {top} Most Common Words", "-" * 23]
+        lines += [f"{word} ({count})" for word, count in top_words]
+        lines += [RULE, f"4. {len(subdomains)} subdomains founds", "-" * 25]
+        lines += [f"{netloc}, {pages}" for netloc, pages in subdomains]
+        lines.append(RULE)
+        partial = path + ".partial"
+        with open(partial, "w") as out:
+            out.write("\n".join(lines) + "\n")
+        os.replace(partial, path)
+
+    def close(self):
+        self.db.close()
+
+
+def main(output, top, every):
+    report = Report()
+    while True:
+        report.update()
+        report.write(output, top)
+        if not every:
+            break
+        time.sleep(every)
+    report.close()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--output", type=str, default="report.txt")
+    parser.add_argument("--top", type=int, default=50)
+    parser.add_argument("--every", type=float, default=0)
+    args = parser.parse_args()
+    main(args.output, args.top, args.every)
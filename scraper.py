@@ -1,19 +1,26 @@
 import re
-from urllib.parse import urlparse, urlunparse, parse_qs, urlencode, urljoin, urldefrag
-from bs4 import BeautifulSoup
-import shelve
+from collections import Counter
+from hashlib import blake2b
+from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
 import analyze_links as al
-from utils import get_logger, get_urlhash
-from simhash import compute_simhash, is_dupe
+from utils import get_logger, get_urlhash, PER_URL
+from simhash import SimhashIndex
+from page import Page
+from parsing import is_html, page_links, parse_page
+from url_filter import check_url, filter_urls, FILTER_VERSION
+from traps import TemplateTracker, LOW_INFO_WORDS
+from utils.history import PageHistory, UNCHANGED
+from utils.page_cache import PageCache
+from utils.telemetry import telemetry
 
 logger = get_logger("Crawler", "CRAWLER")
-
-def is_html(content):
-    '''return true if string contains html'''
-    #valid pdf should always start with %pdf
-    if content.startswith(b'%PDF'):
-        return False
-    return b'<html' in content.lower() or b'<head' in content.lower() or b'<body' in content.lower()
+simhash_index = SimhashIndex("simhash.index")
+# what every url template yields, the frontier skips urls of templates out of budget
+template_tracker = TemplateTracker()
+# headers, digest, simhash and words of every page, for recrawls
+page_history = PageHistory("pages.db")
+# normalized hash -> (url, simhash) of every page recorded, open for the whole crawl
+page_cache = PageCache("cache.shelve")
 
 def normalized_hash(parsed_url):
 
@@ -47,49 +54,88 @@ def normalized_hash(parsed_url):
     url = urlunparse(('',netloc,path,'',query,''))
     return get_urlhash(url)
 
-def is_absolute(url):
-    '''return true if url is absolute and false if it is relative'''
-    parsed = urlparse(url)
-    return parsed.scheme and parsed.netloc
-
-def ignore(link_elem):
-    '''return true if link should be ignored'''
-    link = link_elem['href']
-    fragment = re.match(r"^#",link) # fragments
-    js = re.match(r"^javascript:",link) # js links
-    tel = re.match(r"^tel:",link) # tel links
-    nofollow = link_elem.has_attr('rel') and 'nofollow' in link_elem['rel'] # nofollow links
-    return fragment or nofollow or js or tel
+def unchanged(url, resp, recrawl=False):
+    '''record a download in page_history, return true on a recrawl if the
+    page is the same as on the last visit and was recorded then, so it
+    need not be parsed again'''
+    if resp.status != 200 or resp.raw_response is None:
+        return False
+    headers = resp.raw_response.headers
+    with telemetry.timer("history"):
+        outcome = page_history.visit(
+            url, headers.get("ETag"), headers.get("Last-Modified"),
+            blake2b(resp.body, digest_size=16).digest())
+        # a crawl that is resumed, not a recrawl, may download again a page
+        # it never got to record, whose links would be lost
+        return (recrawl and outcome == UNCHANGED and
+                page_history.previous(url) is not None)
 
 def scraper(url, resp, lock):
-    nofollow = False
-    if resp.status != 200 or not is_html(resp.raw_response.content):
-        return [] # ignore if broken link, bad request, or not html
-    soup = BeautifulSoup(resp.raw_response.content, 'html.parser')
-    if (robot_tag := soup.find("meta", attrs={"name": "robots"})):
-        content = robot_tag.get('content')
-        nofollow = ('nofollow' in content)
-        if 'noindex' in content: # noindex: ignore
-            return []
-
-    logger.info(url)
+    with telemetry.timer("parse"):
+        parsed = parse_response(url, resp)
+    return record_page(url, parsed, lock)
+
+def parse_response(url, resp):
+    if resp.status != 200 or resp.raw_response is None:
+        return None # ignore if broken link or bad request
+    return parse_page(url, resp.status, resp.raw_response.url,
+                      resp.raw_response.content, resp.content_type)
+
+def record_page(url, parsed, lock):
+    '''Record a page parsed by parse_page unless it was crawled before or
+    is a near duplicate, and return the links to follow. A page that
+    changed since an earlier crawl replaces its last version.'''
+    if parsed is None:
+        template_tracker.observe(url, False)
+        return []
+    simhash, counts, num_words, links = parsed
+
+    logger.info(url, extra=PER_URL)
+    previous = page_history.previous(url)
     # cache unique urls visited
     urlhash = normalized_hash(urlparse(url))
-    simhash = compute_simhash(soup)
-    with lock:
-        with shelve.open("cache.shelve") as cache:
-            for u in cache:
-                if cache[u][1] is not None and (urlhash == u  or is_dupe(simhash, cache[u][1])):
-                    return [] # ignore near duplicates
-            cache[urlhash] = (url, simhash)
-
-    al.getWords(soup, lock, url)
+    # lock: the frontier's dedup lock, so the cache and the simhash index
+    # are checked and updated as one step
+    with telemetry.locked(lock, "dedup"):
+        if previous is None:
+            if page_cache.recorded(urlhash):
+                template_tracker.observe(url, False)
+                return [] # ignore pages already crawled
+            if simhash_index.add_if_unique(simhash) is not None:
+                template_tracker.observe(url, False)
+                return [] # ignore near duplicates
+        else:
+            # changed since the last crawl, its old version is no duplicate
+            match = simhash_index.find(simhash)
+            if match is None:
+                simhash_index.add(simhash)
+            elif match == previous[0]:
+                # still close to the version indexed, keep that one
+                simhash = match
+            else:
+                # now a near duplicate, only its old words are taken out
+                counts, num_words, links = None, 0, []
+        page_cache.put(urlhash, url, simhash)
+    template_tracker.observe(url, num_words >= LOW_INFO_WORDS)
+    page_history.record(url, simhash, counts, urlhash)
+
+    if previous is not None:
+        # only the difference to the old version
+        delta = Counter(counts or {})
+        delta.subtract(previous[1])
+        counts = delta
+    if counts is not None:
+        with telemetry.timer("words"):
+            al.word_store.add_page(url, counts, num_words)
+    return links
 
-    if nofollow:
-        return []
-    return extract_next_links(url, resp)
+def flush_records():
+    '''write the words and page history of every page recorded so far, so
+    the frontier never saves a page as downloaded before them'''
+    page_history.flush()
+    al.word_store.flush()
 
-def extract_next_links(url, resp):
+def extract_next_links(url, resp, page=None):
     # Implementation required.
     # url: the URL that was used to get the page
     # resp.url: the actual url of the page
@@ -99,97 +145,28 @@ def extract_next_links(url, resp):
     #         resp.raw_response.url: the url, again
     #         resp.raw_response.content: the content of the page!
     # Return a list with the hyperlinks (as strings) scrapped from resp.raw_response.content
-    links = []
-    soup = BeautifulSoup(resp.raw_response.content,'html.parser') 
-
-    for link_elem in soup.find_all('a',href=True):
-        link = link_elem['href']
-        if not ignore(link_elem):
-            if not is_absolute(link):
-                link = urldefrag(urljoin(resp.raw_response.url, link))[0]
-            if link != url:
-                links.append(link)
-    return links
+    if page is None:
+        page = Page(resp.raw_response.content)
+    return page_links(url, resp.raw_response.url, page)
 
-def is_valid(url, lock, ignore_cache=False):
+def is_valid(url, seen=None):
     # Decide whether to crawl this url or not. 
     # If you decide to crawl it, return True; otherwise return False.
-    # There are already some conditions that return False.
-    
-    #ignore calendars traps, login pages, 
-    banned_paths = ['calendar','pdf', 'pix']
+    # The static rules (extensions, domains, traps) live in url_filter.
+    # Without a seen set, urls crawled before are not rejected.
 
     try:
-        parsed = urlparse(url)
-        if parsed.scheme not in set(["http", "https"]):
-            return False
-
-        valid = not re.match(
-            r".*\.(css|js|bmp|gif|jpe?g|ico"
-            + r"|png|tiff?|mid|mp2|mp3|mp4|mpg"
-            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-            + r"|ps|eps|tex|ppt|pptx|ppsx|pps|doc|docx|xls|xlsx|names"
-            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
-            + r"|epub|dll|cnf|tgz|sha1|scm|rkt|"
-            + r"|thmx|mso|arff|rtf|jar|csv|ff"
-            + r"|ttf|otf|woff|woff2|eot|fon"
-            + r"|img|pkg|exe|msi|sql|db|mdb|log|sqlite"
-            + r"|cpp|cc|c|h|py|pix|bib|war|ini|o|a|lib|obj|ini|config"
-            + r"|raw|ods|key|odp|ods|numbers|bat|sh|bak|swp"
-            + r"|rm|smil|wmv|swf|wma|zip|rar|gz|z|xz|lz|tgz|tbz|apk|ipa)$", parsed.path.lower())
-        if not valid:
-            return False
-
-        valid_domain = bool(re.match(r"^(.*\.)?ics\.uci\.edu$"
-                + r"|^(.*\.)?cs\.uci\.edu$"
-                + r"|^(.*\.)?informatics\.uci\.edu$"
-                + r"|^(.*\.)?stat\.uci\.edu$", parsed.netloc) or
-                (re.match(r"^today\.uci\.edu/$", parsed.netloc) and 
-                        re.match(r"^department/information_computer_sciences/.*$", parsed.path)))
-        if not valid_domain:
-            return False
-
-        paths = parsed.path.split('/')
-
-        for path in banned_paths:
-            if path in paths:
-                return False
-
-        counts = {}
-        for p in paths:
-            if p not in counts:
-                counts[p] = 0
-            counts[p] += 1
-            if counts[p] > 2:
-                return False # invalid if any path is repeated more than twice to avoid repetitive path traps
-
-
-        # check for xxxx-xx-xx and xxxx-xx in queries to avoid calendar traps
-        if re.search(r"\b\d{4}-\d{2}-\d{2}\b", parsed.query) is not None:
+        if not check_url(url):
             return False
-        if re.search(r"\b\d{4}-\d{2}\b", parsed.query) is not None:
-            return False
-        if re.search(r"\b\d{4}-\d{2}-\d{2}\b", parsed.path) is not None:
-            return False
-        if re.search(r"\b\d{4}-\d{2}\b", parsed.path) is not None:
-            return False
-
-        # ignore download links
-        if "action=download" in parsed.query:
-            return False
-        
-        if ignore_cache:
+        if seen is None:
             return True
-        # cache unique urls visited
-        urlhash = normalized_hash(urlparse(url))
-        with lock:
-            with shelve.open("cache.shelve") as cache:
-                if urlhash in cache:
-                    return False
-                cache[urlhash] = (url, None)
-        
-        return True
+        return is_unseen(url, seen)
 
     except TypeError:
-        print ("TypeError for ", parsed)
+        print ("TypeError for ", url)
         raise
+
+def is_unseen(url, seen):
+    '''return true the first time a url is seen after normalization'''
+    # cache unique urls visited
+    return seen.add(normalized_hash(urlparse(url)))
@@ -1,5 +1,16 @@
 import hashlib
-import re
+import os
+from array import array
+from collections import Counter
+from itertools import combinations
+from threading import Lock
+
+import tokenizer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 def is_dupe(simhash1, simhash2, threshold=10):
     return hamming_distance(simhash1, simhash2) < threshold
@@ -7,26 +18,45 @@ def is_dupe(simhash1, simhash2, threshold=10):
 def create_hash(token):
     return int(hashlib.md5(token.encode()).hexdigest(), 16) & ((1 << 64) - 1)
 
-def compute_simhash(soup):
-    text = soup.get_text(separator=' ', strip=True)
-    english_text = re.sub(r"[^a-z\s]", "", text)
-    words = english_text.lower().split()
-    tokens=[]
-    for i in range(len(words)-1):
-        token = words[i] + ' ' + words[i+1]  
-        tokens.append(token)
+def shingles(words):
+    '''word bigrams of a page, weighted by how often they occur'''
+    return Counter(tokenizer.shingles(words))
+
+def compute_simhash(words):
+    '''simhash over the word bigrams of a page (see page.Page.words)'''
+    return weighted_simhash(shingles(words))
 
+def weighted_simhash(weights):
+    '''simhash of a {shingle: weight} mapping. Every bit of a shingle's
+    hash adds its weight to the matching column when set and subtracts it
+    otherwise; the fingerprint has the bits whose column ends up positive.
+    A shingle counted n times has weight n, the same as adding it n times.'''
+    if not weights:
+        return 0
+    if np is None:
+        return _weighted_simhash(weights)
+    # for bigrams this short the cost is the call into hashlib, not the
+    # hash: blake2b and sha1 take as long as md5 (benchmarks/simhash.py)
+    md5 = hashlib.md5
+    digests = b''.join([md5(token).digest() for token in map(str.encode, weights)])
+    # create_hash keeps the last 8 bytes of the digest, big endian. Reversed
+    # they unpack into a matrix with hash bit i in column i.
+    low = np.frombuffer(digests, dtype=np.uint8).reshape(-1, 16)[:, :7:-1]
+    bits = np.unpackbits(low, axis=1, bitorder='little')
+    counts = np.fromiter(weights.values(), dtype=np.int64, count=len(weights))
+    vector = 2 * (counts @ bits) - counts.sum()
+    return int.from_bytes(np.packbits(vector > 0, bitorder='little').tobytes(), 'little')
+
+def _weighted_simhash(weights):
     vector = [0] * 64
-    
-    for token in tokens:
-        token_hash = create_hash(token)  # Get 64-bit hash
+    for token, weight in weights.items():
+        token_hash = create_hash(token)
         for i in range(64):
-            bit = (token_hash >> i) & 1
-            if bit:
-                vector[i] += 1  # Weighted by frequency
+            if (token_hash >> i) & 1:
+                vector[i] += weight
             else:
-                vector[i] -= 1
-    
+                vector[i] -= weight
+
     simhash = 0
     for i, v in enumerate(vector):
         if v > 0:
@@ -35,4 +65,131 @@ def compute_simhash(soup):
 
 def hamming_distance(hash1, hash2):
     x = hash1 ^ hash2
-    return bin(x).count('1')  # Count differing bits
\ No newline at end of file
+    return popcount(x)  # Count differing bits
+
+def _popcount(x):
+    return bin(x).count('1')
+
+# int.bit_count is only available from python 3.10
+popcount = getattr(int, 'bit_count', _popcount)
+
+
+class SimhashIndex(object):
+    '''Near-duplicate lookup over stored simhashes (Manku et al., WWW '07).
+
+    The fingerprint is cut into `blocks` contiguous bit ranges and one table
+    is kept per combination of `key_blocks` of them: a dict from the bits
+    of those ranges to the fingerprints that have them. A lookup only
+    compares against the fingerprints in one bucket of every table. Two
+    fingerprints that differ in at most `blocks - key_blocks` bits agree
+    on the key of some table, so they are always found. By default blocks
+    is threshold - 1 + key_blocks, which makes the lookup exact: every
+    stored fingerprint within the threshold is found. Fewer blocks give
+    fewer tables with wider keys but a lossy lookup, where fingerprints
+    that differ in more than blocks - key_blocks bits are only found when
+    their differences leave some key intact.
+
+    A bucket holds about stored / 2 ** key bits fingerprints, so the cost
+    of a lookup still grows with the index: with the default 55 tables
+    of 10 to 12 key bits a miss at 1M pages compares against some 20k
+    fingerprints instead of 1M.
+
+    Fingerprints are appended to `path` as they are added and reloaded on
+    first use, so the index survives a crawler restart.
+    '''
+    def __init__(self, path=None, threshold=10, bits=64, blocks=None, key_blocks=2):
+        # is_dupe is a strict comparison against threshold
+        self.max_distance = threshold - 1
+        if blocks is None:
+            blocks = self.max_distance + key_blocks
+        self.path = path
+        assert 0 < key_blocks < blocks <= bits, "Need more blocks than key blocks"
+
+        block_masks = []
+        start = 0
+        for i in range(blocks):
+            width = bits // blocks + (1 if i < bits % blocks else 0)
+            block_masks.append(((1 << width) - 1) << start)
+            start += width
+        self.masks = []
+        for combo in combinations(block_masks, key_blocks):
+            mask = 0
+            for block_mask in combo:
+                mask |= block_mask
+            self.masks.append(mask)
+
+        self.lock = Lock()
+        self._reset()
+        self._loaded = False
+        self._file = None
+
+    def _reset(self):
+        self.tables = [dict() for _ in self.masks]
+        self.count = 0
+
+    def __len__(self):
+        with self.lock:
+            self._load()
+            return self.count
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.path is None:
+            return
+        if os.path.exists(self.path):
+            stored = array('Q')
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            # drop a partially written trailing record
+            stored.frombytes(data[:len(data) - len(data) % stored.itemsize])
+            for simhash in stored:
+                self._insert(simhash)
+        self._file = open(self.path, 'ab')
+
+    def _insert(self, simhash):
+        for mask, table in zip(self.masks, self.tables):
+            table.setdefault(simhash & mask, []).append(simhash)
+        self.count += 1
+
+    def _find(self, simhash):
+        for mask, table in zip(self.masks, self.tables):
+            for stored in table.get(simhash & mask, ()):
+                if popcount(simhash ^ stored) <= self.max_distance:
+                    return stored
+        return None
+
+    def find(self, simhash):
+        '''return a stored simhash within the threshold, or None'''
+        with self.lock:
+            self._load()
+            return self._find(simhash)
+
+    def add(self, simhash):
+        with self.lock:
+            self._load()
+            self._add(simhash)
+
+    def _add(self, simhash):
+        self._insert(simhash)
+        if self._file is not None:
+            self._file.write(array('Q', [simhash]).tobytes())
+            self._file.flush()
+
+    def add_if_unique(self, simhash):
+        '''store simhash unless it is a near duplicate; return the match if one exists'''
+        with self.lock:
+            self._load()
+            match = self._find(simhash)
+            if match is None:
+                self._add(simhash)
+            return match
+
+    def close(self):
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._loaded = False
+            self._reset()
@@ -0,0 +1,13 @@
+import logging
+
+import pytest
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    '''Runs the test in tmp_path, where the crawler writes its files, with
+    logging off.'''
+    monkeypatch.chdir(tmp_path)
+    logging.disable(logging.CRITICAL)
+    yield tmp_path
+    logging.disable(logging.NOTSET)
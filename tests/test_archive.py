@@ -0,0 +1,36 @@
+import os
+
+from utils.archive import ResponseArchive
+
+LONG_URL = "https://a.ics.uci.edu/" + "x" * 70000
+
+
+def test_urls_longer_than_64_kib_are_recorded(tmp_path):
+    path = str(tmp_path / "crawl.archive")
+    archive = ResponseArchive(path)
+    archive.record(LONG_URL, b"payload")
+    archive.record("https://b.ics.uci.edu/", b"other")
+    archive.close()
+    archive = ResponseArchive(path)
+    assert archive.get(LONG_URL) == b"payload"
+    assert archive.get("https://b.ics.uci.edu/") == b"other"
+    archive.close()
+
+
+
+def test_replaying_leaves_a_cut_short_archive_as_it_is(tmp_path):
+    path = str(tmp_path / "crawl.archive")
+    archive = ResponseArchive(path)
+    archive.record("https://a.ics.uci.edu/", b"payload")
+    archive.close()
+    with open(path, "ab") as f:
+        f.write(b"\0\0") # a record cut short by a crash
+    size = os.path.getsize(path)
+    archive = ResponseArchive(path, readonly=True)
+    assert archive.get("https://a.ics.uci.edu/") == b"payload"
+    archive.close()
+    assert os.path.getsize(path) == size
+    # recording drops it before appending
+    archive = ResponseArchive(path)
+    assert os.path.getsize(path) == size - 2
+    archive.close()
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from benchmarks.stub_cache_server import make_config
+
+
+def serve(reply):
+    ''' Port of a cache server on a thread that answers every request with
+    reply(writer). '''
+    port = []
+
+    async def handle(reader, writer):
+        await reader.readline()
+        await reply(writer)
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port.append(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(main(),), daemon=True).start()
+    while not port:
+        time.sleep(0.01)
+    return port[0]
+
+
+async def truncated(writer):
+    writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\nabc")
+    await writer.drain()
+
+
+async def malformed(writer):
+    writer.write(b"garbage\r\n\r\n")
+    await writer.drain()
+
+
+async def silent(writer):
+    await asyncio.sleep(30)
+
+
+@pytest.mark.parametrize("reply", [truncated, malformed, silent])
+def test_failed_downloads_end_the_crawl(workdir, reply):
+    from crawler import AsyncCrawler
+    config = make_config(
+        ("127.0.0.1", serve(reply)),
+        ["https://a.ics.uci.edu/", "https://b.ics.uci.edu/"],
+        politeness=0, robots=False, sitemaps=False, downloadtimeout=0.5)
+    crawler = AsyncCrawler(config, True)
+    start = time.monotonic()
+    crawler.start()
+    assert time.monotonic() - start < 10
+    assert crawler.frontier.in_progress == 0
+    assert not crawler.frontier.downloading_domains
+
+
+async def unframed(writer):
+    # no Content-Length and not chunked: the body ends with the connection
+    writer.write(b"HTTP/1.0 200 OK\r\n\r\n")
+    for _ in range(300):
+        writer.write(b"x" * 1000)
+        await writer.drain()
+
+
+@pytest.mark.parametrize("max_body,expected", [(1 << 20, 300000), (100000, None)])
+def test_body_is_read_until_the_connection_closes(max_body, expected):
+    from utils.async_download import CacheClient
+    config = make_config(("127.0.0.1", serve(unframed)), [])
+    client = CacheClient(config)
+    client.max_body = max_body
+
+    async def get():
+        try:
+            return await client._get([("q", "https://a.ics.uci.edu/")])
+        finally:
+            await client.close()
+
+    status, body, size = asyncio.run(get())
+    assert status == 200
+    if expected is None:
+        assert body is None and size > max_body
+    else:
+        assert body == b"x" * expected and size == expected
@@ -0,0 +1,215 @@
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.stub_cache_server import make_config
+
+
+def config(seed_urls=("https://a.ics.uci.edu/",), **properties):
+    '''make_config without a cache server, robots.txt, sitemaps or adaptive
+    delays unless a test asks for them.'''
+    properties = dict(
+        dict(robots=False, sitemaps=False, adaptivedelay=False), **properties)
+    return make_config(None, list(seed_urls), **properties)
+
+
+@pytest.fixture
+def frontiers(workdir):
+    '''Frontier(config, restart) factory that closes every frontier it made
+    when the test ends.'''
+    from crawler import Frontier
+    made = []
+
+    def make(config, restart=True):
+        frontier = Frontier(config, restart)
+        made.append(frontier)
+        return frontier
+
+    yield make
+    for frontier in made:
+        frontier.store.close()
+        frontier.seen.close()
+
+
+@pytest.fixture
+def frontier(frontiers):
+    return frontiers(config(politeness=0.5))
+
+
+@pytest.fixture
+def word_store(workdir, monkeypatch):
+    import analyze_links
+    word_store = analyze_links.WordStore(str(workdir / "words.db"))
+    monkeypatch.setattr(analyze_links, "word_store", word_store)
+    yield word_store
+    word_store.close()
+
+
+def test_domain_is_not_handed_out_twice_at_once(frontier):
+    assert frontier.get_tbd_url() == "https://a.ics.uci.edu"
+    # a link to its own domain found while it is being downloaded
+    frontier.add_urls(["https://a.ics.uci.edu/people"])
+    assert frontier.poll_tbd_url() == (None, 0)
+    frontier.mark_url_complete("https://a.ics.uci.edu")
+    url, wait = frontier.poll_tbd_url()
+    assert url is None and 0 < wait <= 0.5
+
+
+def test_crawl_is_over_once_nothing_is_queued_or_downloading(frontier):
+    url = frontier.get_tbd_url()
+    frontier.mark_url_complete(url)
+    assert frontier.get_tbd_url() is None
+
+
+def test_robots_txt_is_downloaded_in_its_domains_turn(frontiers, monkeypatch):
+    import crawler.robots
+    downloaded = []
+
+    def download(url, config, logger):
+        downloaded.append(url)
+        return SimpleNamespace(status=200, raw_response=SimpleNamespace(
+            content=b"User-agent: *\nDisallow: /people\n"))
+
+    monkeypatch.setattr(crawler.robots, "download", download)
+    frontier = frontiers(config(politeness=0.5, robots=True))
+    # queued without waiting for robots.txt
+    assert downloaded == []
+    url, wait = frontier.poll_tbd_url()
+    assert downloaded == ["https://a.ics.uci.edu/robots.txt"]
+    # the next download from the domain waits for politeness
+    assert url is None and 0 < wait <= 0.5
+    frontier.add_urls(["https://a.ics.uci.edu/people"])
+    assert frontier.get_tbd_url() == "https://a.ics.uci.edu"
+    frontier.mark_url_complete("https://a.ics.uci.edu")
+    assert frontier.get_tbd_url() is None
+
+
+def test_host_is_disallowed_while_its_robots_txt_fails(frontiers, monkeypatch):
+    import time
+    import crawler.robots
+    downloaded = []
+
+    def download(url, config, logger):
+        downloaded.append(url)
+        return SimpleNamespace(status=503, raw_response=None)
+
+    monkeypatch.setattr(crawler.robots, "download", download)
+    monkeypatch.setattr(crawler.robots, "RETRY_SECONDS", 0.3)
+    monkeypatch.setattr(crawler.robots, "ROBOTS_RETRIES", 1)
+    frontier = frontiers(config(politeness=0.05, robots=True))
+    assert frontier.poll_tbd_url()[0] is None
+    time.sleep(0.06)
+    # nothing is downloaded until robots.txt is retried, and urls wait
+    url, wait = frontier.poll_tbd_url()
+    assert url is None and 0.2 < wait <= 0.3
+    frontier.add_urls(["https://a.ics.uci.edu/people"])
+    assert frontier._queued_urls() == 2
+    time.sleep(wait)
+    # the retry fails too, and the host's urls are given up on
+    assert frontier.poll_tbd_url()[0] is None
+    assert downloaded == ["https://a.ics.uci.edu/robots.txt"] * 2
+    time.sleep(0.06)
+    assert frontier.get_tbd_url() is None
+    assert frontier._queued_urls() == 0
+
+
+def test_sitemaps_are_downloaded_at_the_politeness_delay(frontiers, monkeypatch):
+    import time
+    import crawler.robots
+    downloaded = []
+
+    def download(url, config, logger):
+        downloaded.append(time.monotonic())
+        if url.endswith("robots.txt"):
+            content = b"".join(
+                b"Sitemap: https://a.ics.uci.edu/sitemap%d.xml\n" % i for i in range(3))
+        else:
+            content = b"<urlset><url><loc>%s</loc></url></urlset>" % url.encode()
+        return SimpleNamespace(
+            status=200, raw_response=SimpleNamespace(content=content))
+
+    monkeypatch.setattr(crawler.robots, "download", download)
+    frontiers(config(politeness=0.2, robots=True, sitemaps=True))
+    # robots.txt, then every sitemap
+    assert len(downloaded) == 4
+    gaps = [after - before for before, after in zip(downloaded, downloaded[1:])]
+    assert min(gaps) >= 0.2
+
+
+def test_shelve_save_file_is_resumed_with_the_shelve_store(frontiers):
+    from crawler.store import ShelveStore
+
+    def frontier(store, restart):
+        return frontiers(config(save="frontier.shelve", store=store), restart)
+
+    old = frontier("shelve", True)
+    old.store.close()
+    resumed = frontier("sqlite", False)
+    assert isinstance(resumed.store, ShelveStore)
+    assert resumed.get_tbd_url() == "https://a.ics.uci.edu"
+    resumed.store.close()
+    restarted = frontier("sqlite", True)
+    assert not isinstance(restarted.store, ShelveStore)
+
+
+def test_words_are_written_before_the_page_is_saved_as_downloaded(
+        frontiers, word_store, workdir):
+    import sqlite3
+    from collections import Counter
+    frontier = frontiers(config(commitsize=1))
+    url = frontier.get_tbd_url()
+    word_store.add_page(url, Counter(informatics=3), 60)
+    frontier.mark_url_complete(url)
+    # what a crash right after the commit would leave on disk
+    saved = sqlite3.connect(str(workdir / "words.db"))
+    assert saved.execute("SELECT word, count FROM words").fetchall() == [("informatics", 3)]
+    saved.close()
+
+
+def test_urls_are_seen_on_disk_only_once_the_store_commits_them(frontiers, workdir):
+    import sqlite3
+    frontier = frontiers(config(commitsize=100000, commitinterval=3600))
+    frontier.add_urls([f"https://a.ics.uci.edu/page{i}" for i in range(1500)])
+    # what a crash before the store commits would leave on disk
+    seen = sqlite3.connect(str(workdir / "seen.db"))
+    assert seen.execute("SELECT COUNT(*) FROM seen").fetchone()[0] == 0
+    frontier.store.flush()
+    assert seen.execute("SELECT COUNT(*) FROM seen").fetchone()[0] == 1501
+    seen.close()
+
+
+def test_worker_with_the_documented_interface_runs_without_parsers(frontiers):
+    from threading import Thread
+    from crawler import Crawler
+
+    class Worker(Thread):
+        def __init__(self, worker_id, config, frontier):
+            self.frontier = frontier
+            super().__init__(daemon=True)
+
+        def run(self):
+            url = self.frontier.get_tbd_url()
+            while url is not None:
+                self.frontier.mark_url_complete(url)
+                url = self.frontier.get_tbd_url()
+
+    crawler = Crawler(
+        config(politeness=0, parsers=0), True, frontier_factory=frontiers,
+        worker_factory=Worker)
+    crawler.start()
+    assert crawler.frontier.get_tbd_url() is None
+
+
+def test_worker_keeps_crawling_after_a_download_fails(frontiers, monkeypatch):
+    import crawler.worker
+    from crawler import Crawler
+
+    def download(url, config, logger):
+        raise ConnectionError(f"cache server dropped {url}")
+
+    monkeypatch.setattr(crawler.worker, "download", download)
+    crawler = Crawler(
+        config(["https://a.ics.uci.edu/", "https://b.ics.uci.edu/"], politeness=0,
+               threadcount=1), True, frontier_factory=frontiers)
+    crawler.start()
+    assert crawler.frontier.get_tbd_url() is None
@@ -0,0 +1,109 @@
+import heapq
+import random
+
+import pytest
+
+from crawler.priority import UrlHeap, MAX_LEVEL, MAX_LINKS, _bonus, _level, _priority
+
+
+class ReferenceHeap(object):
+    '''What UrlHeap should do, on heapq and a dict: lowest level first, with
+    the bonus of every link, first pushed first among equals.'''
+    def __init__(self):
+        self.heap = []
+        self.entries = {}  # url -> [level as pushed, links, order]
+        self.order = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _key(self, url):
+        level, links, order = self.entries[url]
+        return max(level - _bonus(links), 0), order
+
+    def push(self, url, priority, links=1):
+        if url in self.entries:
+            return
+        links = min(links, MAX_LINKS)
+        self.entries[url] = [min(_level(priority) + _bonus(links), MAX_LEVEL), links, self.order]
+        self.order += 1
+        heapq.heappush(self.heap, (self._key(url), url))
+
+    def linked(self, url):
+        if url not in self.entries:
+            return False
+        if self.entries[url][1] < MAX_LINKS:
+            self.entries[url][1] += 1
+            heapq.heappush(self.heap, (self._key(url), url))
+        return True
+
+    def pop(self):
+        while self.heap:
+            key, url = heapq.heappop(self.heap)
+            if url in self.entries and self._key(url) == key:
+                del self.entries[url]
+                return url
+        return None
+
+    def peek(self):
+        if not self.entries:
+            return None
+        return _priority(min(self._key(url) for url in self.entries)[0] << 32)
+
+    def trim(self, size):
+        if len(self.entries) <= size:
+            return None
+        ranked = sorted(self.entries, key=self._key)
+        best_dropped = self._key(ranked[size])[0]
+        for url in ranked[size:]:
+            del self.entries[url]
+        return _priority(best_dropped << 32)
+
+
+URLS = ([f"https://www.ics.uci.edu/page/{i}" for i in range(300)] +
+        [f"http://www.ics.uci.edu/a/{i}?q={i}" for i in range(100)] +
+        [f"https://www.ics.uci.edu/café/{i}/東京" for i in range(50)])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_pop_order_matches_heapq(seed):
+    rng = random.Random(seed)
+    heap, reference = UrlHeap(), ReferenceHeap()
+    for _ in range(20000):
+        op = rng.random()
+        url = rng.choice(URLS)
+        if op < 0.45:
+            priority = rng.randint(-4, 40) / 4
+            links = rng.choice((1, 1, 1, 3))
+            heap.push(url, priority, links)
+            reference.push(url, priority, links)
+        elif op < 0.6:
+            assert heap.linked(url) == reference.linked(url)
+        elif op < 0.99:
+            assert heap.peek() == reference.peek()
+            assert heap.pop() == reference.pop()
+        else:
+            size = rng.randint(0, 200)
+            assert heap.trim(size) == reference.trim(size)
+        assert len(heap) == len(reference)
+    while len(reference):
+        assert heap.pop() == reference.pop()
+    assert heap.pop() is None
+
+
+def test_urls_come_back_as_pushed():
+    urls = ["https://www.ics.uci.edu/~eppstein/pix/Zürich/東京.html",
+            "https://www.ics.uci.edu/wiki?title=Café&action=édit",
+            "http://www.ics.uci.edu",
+            "https://www.ics.uci.edu/" + "x" * 5000,
+            "mailto:somebody@uci.edu"]
+    heap = UrlHeap()
+    # enough urls to fill and compress several blocks
+    for i in range(1000):
+        heap.push(urls[i % len(urls)] + f"#{i}", 1.0)
+    popped = [heap.pop() for _ in range(1000)]
+    assert popped == [urls[i % len(urls)] + f"#{i}" for i in range(1000)]
+    for url in urls:
+        heap.push(url, 0)
+        assert heap.linked(url)
+        assert heap.pop() == url
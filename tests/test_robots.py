@@ -0,0 +1,71 @@
+import pytest
+
+from crawler.robots import RobotsPolicy, product_token
+
+AGENT = "IR F19 41461920,68669166"
+
+ROBOTS = """\
+User-agent: *
+Disallow: /
+
+User-agent: irbot
+User-agent: IR/1.0
+Disallow: /private
+Allow: /private/public
+Disallow: /*.pdf$
+Crawl-delay: 2
+
+User-agent: otherbot
+Disallow: /other
+"""
+
+
+def test_product_token():
+    assert product_token(AGENT) == "ir"
+    assert product_token("Googlebot/2.1 (+http://www.google.com/bot.html)") == "googlebot"
+
+
+def test_group_of_our_product_token_wins_over_star():
+    policy = RobotsPolicy.parse(ROBOTS, AGENT)
+    assert policy.allowed("/")
+    assert policy.allowed("/other")
+    assert not policy.allowed("/private/page")
+    assert policy.crawl_delay == 2
+
+
+@pytest.mark.parametrize("line", ["User-agent: IR", "User-agent: ir", "User-agent: Ir/2.0"])
+def test_agent_is_matched_case_insensitively(line):
+    policy = RobotsPolicy.parse(f"{line}\nDisallow: /a\n", AGENT)
+    assert not policy.allowed("/a")
+
+
+@pytest.mark.parametrize("line", ["User-agent: irbot", "User-agent: f19", "User-agent: i"])
+def test_other_agents_are_not_substring_matches(line):
+    policy = RobotsPolicy.parse(f"{line}\nDisallow: /a\n\nUser-agent: *\nDisallow: /b\n", AGENT)
+    assert policy.allowed("/a")
+    assert not policy.allowed("/b")
+
+
+def test_star_group_without_our_group():
+    policy = RobotsPolicy.parse("User-agent: otherbot\nDisallow: /\n\nUser-agent: *\nDisallow: /x\n", AGENT)
+    assert policy.allowed("/")
+    assert not policy.allowed("/x/y")
+
+
+@pytest.mark.parametrize("path, allowed", [
+    ("/private", False),
+    ("/private/public", True),
+    ("/private/public/page", True),
+    ("/private/other", False),
+    ("/paper.pdf", False),
+    ("/paper.pdf?download=1", True),
+    ("/public", True),
+])
+def test_longest_match_wins(path, allowed):
+    policy = RobotsPolicy.parse(ROBOTS, AGENT)
+    assert policy.allowed(path) == allowed
+
+
+def test_allow_wins_a_tie():
+    policy = RobotsPolicy.parse("User-agent: *\nDisallow: /page\nAllow: /page\n", AGENT)
+    assert policy.allowed("/page")
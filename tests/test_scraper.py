@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+
+import pytest
+
+import scraper
+from utils.history import PageHistory
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    history = PageHistory(str(tmp_path / "pages.db"))
+    monkeypatch.setattr(scraper, "page_history", history)
+    yield history
+    history.close()
+
+
+def response(body):
+    return SimpleNamespace(status=200, body=body, raw_response=SimpleNamespace(headers={}))
+
+
+def test_only_a_recrawl_skips_unchanged_pages(history):
+    url = "https://a.ics.uci.edu/page"
+    assert not scraper.unchanged(url, response(b"<html>a</html>"))
+    # downloaded again by a resumed crawl before it was recorded
+    assert not scraper.unchanged(url, response(b"<html>a</html>"))
+    assert not scraper.unchanged(url, response(b"<html>a</html>"), recrawl=True)
+    history.record(url, 1, None, "00" * 32)
+    assert not scraper.unchanged(url, response(b"<html>a</html>"))
+    assert scraper.unchanged(url, response(b"<html>a</html>"), recrawl=True)
+    assert not scraper.unchanged(url, response(b"<html>b</html>"), recrawl=True)
@@ -0,0 +1,65 @@
+import random
+
+from utils.bloom import ScalableBloomFilter
+from utils.seen import SeenSet
+
+
+def keys(rng, count):
+    return [(rng.getrandbits(64), rng.getrandbits(64)) for _ in range(count)]
+
+
+def false_positive_rate(bloom, rng, probes=50000):
+    return sum(key in bloom for key in keys(rng, probes)) / probes
+
+
+def test_false_positive_rate_holds_after_growing():
+    rng = random.Random(0)
+    bloom = ScalableBloomFilter(capacity=1000, error_rate=0.01)
+    added = keys(rng, 30000)
+    for key in added:
+        bloom.add(key)
+    assert len(bloom.filters) >= 5
+    assert all(key in bloom for key in added)
+    # the series of filters sums to 0.01, the rest is sampling error
+    assert false_positive_rate(bloom, rng) <= 0.0125
+
+
+def test_memory_cap_trades_false_positives_for_memory():
+    rng = random.Random(1)
+    bloom = ScalableBloomFilter(capacity=1000, error_rate=0.01, max_bytes=4096)
+    added = keys(rng, 30000)
+    for key in added:
+        bloom.add(key)
+    assert bloom.nbytes <= 4096
+    assert all(key in bloom for key in added)
+    assert false_positive_rate(bloom, rng) > 0.01
+
+
+def test_seen_set_is_exact_behind_a_loose_filter(tmp_path):
+    rng = random.Random(2)
+    path = str(tmp_path / "seen.db")
+    hashes = [f"{rng.getrandbits(256):064x}" for _ in range(5000)]
+    # a filter this small answers "probably seen" for most new hashes
+    seen = SeenSet(path, capacity=100, error_rate=0.5, max_bytes=256, batch_size=100)
+    assert all(seen.add(urlhash) for urlhash in hashes[:2500])
+    assert not any(seen.add(urlhash) for urlhash in hashes[:2500])
+    seen.close()
+    # reloaded from the saved filter and the database
+    seen = SeenSet(path, capacity=100, error_rate=0.5, max_bytes=256, batch_size=100)
+    assert all(urlhash in seen for urlhash in hashes[:2500])
+    assert not any(urlhash in seen for urlhash in hashes[2500:])
+    assert all(seen.add(urlhash) for urlhash in hashes[2500:])
+    seen.close()
+
+
+def test_deferred_set_writes_released_hashes_on_close(tmp_path):
+    path = str(tmp_path / "seen.db")
+    released, held = f"{1:064x}", f"{2:064x}"
+    seen = SeenSet(path, batch_size=100, deferred=True)
+    assert seen.add(released) and seen.add(held)
+    seen.release(released)
+    seen.close()
+    seen = SeenSet(path, batch_size=100, deferred=True)
+    assert released in seen
+    assert held not in seen
+    seen.close()
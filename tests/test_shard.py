@@ -0,0 +1,90 @@
+import socket
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from crawler import shard
+from crawler.shard import HashRing, ShardNode
+
+
+def test_adding_a_node_only_moves_domains_to_it():
+    domains = [f"host{i}.ics.uci.edu" for i in range(5000)]
+    nodes = [f"10.0.0.{i}:9000" for i in range(4)]
+    before = HashRing(nodes)
+    after = HashRing(nodes + ["10.0.0.4:9000"])
+    moved = 0
+    for domain in domains:
+        if after.owner(domain) != before.owner(domain):
+            assert after.owner(domain) == 4
+            moved += 1
+    # about a fifth of the domains, each node giving up its share
+    assert 0.1 < moved / len(domains) < 0.3
+
+
+def free_address():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()
+
+
+@pytest.fixture
+def nodes(tmp_path):
+    '''Two ShardNodes listening on local ports, without frontiers behind
+    them: the second one never answers a status request.'''
+    addresses = [free_address(), free_address()]
+    config = SimpleNamespace(node=0, nodes=addresses, shard_key="secret")
+    frontier = SimpleNamespace(
+        stopped=True, idle=lambda: True, receive=lambda urls: None,
+        delivered=lambda urls: None)
+    first = ShardNode(frontier, config)
+    second = ShardNode(frontier, SimpleNamespace(**dict(vars(config), node=1)))
+    second.status = lambda: threading.Event().wait()
+    second.start()
+    return first, second
+
+
+def test_unanswered_status_drops_the_connection(nodes, monkeypatch):
+    monkeypatch.setattr(shard, "REPLY_TIMEOUT", 0.2)
+    first, _ = nodes
+    with pytest.raises(TimeoutError):
+        first._send(1, ["status"], reply=True)
+    assert 1 not in first.connections
+    # the next message opens a new connection
+    first._send(1, ["urls", ["https://a.ics.uci.edu/"]])
+    assert 1 in first.connections
+
+
+def test_node_with_another_key_is_refused(nodes):
+    first, _ = nodes
+    first.authkey = b"guess"
+    with pytest.raises(shard.AuthenticationError):
+        first._send(1, ["stop"])
+    assert 1 not in first.connections
+
+
+def test_urls_for_a_node_that_is_down_are_sent_once_it_is_up(monkeypatch):
+    monkeypatch.setattr(shard, "CONNECT_TIMEOUT", 0.1)
+    monkeypatch.setattr(shard, "RETRY_INTERVAL", 0.2)
+    monkeypatch.setattr(shard, "FORWARD_BATCH", 1)
+    addresses = [free_address(), free_address()]
+    config = SimpleNamespace(node=0, nodes=addresses, shard_key="secret")
+    delivered, received = [], []
+    arrived = threading.Event()
+    first = ShardNode(SimpleNamespace(delivered=delivered.extend), config)
+    first.logger.disabled = True
+    first.forward(1, "https://a.ics.uci.edu/")
+    # the second node is not listening yet: nothing counts as forwarded
+    assert delivered == [] and first.sent == 0
+    assert first.outboxes[1] == ["https://a.ics.uci.edu/"]
+    second = ShardNode(
+        SimpleNamespace(stopped=True, receive=lambda urls: (received.extend(urls), arrived.set())),
+        SimpleNamespace(**dict(vars(config), node=1)))
+    second.start()
+    first.flush()
+    # still waiting for RETRY_INTERVAL
+    assert delivered == []
+    threading.Event().wait(0.25)
+    first.flush()
+    assert delivered == ["https://a.ics.uci.edu/"] and first.sent == 1
+    assert arrived.wait(5) and received == ["https://a.ics.uci.edu/"]
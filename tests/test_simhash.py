@@ -0,0 +1,34 @@
+import random
+
+from simhash import SimhashIndex, is_dupe
+
+
+def near(rng, simhash, flips):
+    for bit in rng.sample(range(64), flips):
+        simhash ^= 1 << bit
+    return simhash
+
+
+def test_index_finds_every_near_duplicate_within_the_threshold():
+    rng = random.Random(0)
+    stored = [rng.getrandbits(64) for _ in range(2000)]
+    index = SimhashIndex(threshold=10)
+    for simhash in stored:
+        index.add(simhash)
+    for distance in range(10):
+        for _ in range(200):
+            probe = near(rng, rng.choice(stored), distance)
+            match = index.find(probe)
+            assert match is not None and is_dupe(probe, match)
+
+
+def test_index_only_matches_what_a_linear_scan_matches():
+    rng = random.Random(1)
+    stored = [rng.getrandbits(64) for _ in range(2000)]
+    index = SimhashIndex(threshold=10)
+    for simhash in stored:
+        index.add(simhash)
+    for _ in range(500):
+        probe = near(rng, rng.choice(stored), rng.randrange(10, 20))
+        expected = any(is_dupe(probe, simhash) for simhash in stored)
+        assert (index.find(probe) is not None) == expected
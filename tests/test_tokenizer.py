@@ -0,0 +1,27 @@
+from collections import Counter
+
+import tokenizer
+from parsing import count_words, stop_words
+
+
+def test_words():
+    assert tokenizer.words("Don't e-mail CS121, café!") == ["dont", "email", "cs", "caf"]
+
+
+def test_count_words_counts_words_longer_than_two_letters():
+    words = tokenizer.words("the informatics of an ics page " * 20)
+    counts, num_words = count_words(words)
+    # "of" and "an" are too short, "the" is a stop word but a word
+    assert num_words == 80
+    assert counts == Counter(informatics=20, ics=20, page=20)
+    assert not stop_words & counts.keys()
+
+
+def test_count_words_skips_short_pages():
+    assert count_words(tokenizer.words("one short page " * 16)) == (None, 48)
+
+
+def test_tokens_drops_short_words_and_stop_words():
+    text = "The informatics of an ICS page"
+    assert list(tokenizer.tokens(text, min_length=3, stop_words=stop_words)) == \
+        ["informatics", "ics", "page"]
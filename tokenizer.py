@@ -0,0 +1,51 @@
+'''The words of a page as every analysis stage sees them, so simhash dedup
+and the word statistics always agree on what a word is: the text is
+lowercased, every character other than a-z or whitespace is dropped and
+what is left is split on whitespace ("Don't" -> "dont", "e-mail" ->
+"email", "cs121" -> "cs").
+
+Ascii text, almost every page, goes through bytes.lower and a
+bytes.translate delete table, each one pass in C. Other text goes through
+str.lower and one compiled regex.'''
+import re
+from collections import Counter
+
+# characters taken out of non-ascii text, after lowercasing
+NOT_LETTERS = re.compile(r"[^a-z\s]")
+# the same for ascii text: every byte but a-z and whitespace
+ASCII_DROP = bytes(byte for byte in range(256)
+                   if not (0x61 <= byte <= 0x7a or (byte < 0x80 and chr(byte).isspace())))
+
+
+def words(text):
+    '''[word] of text, in order.'''
+    if text.isascii():
+        return text.encode('ascii').lower().translate(None, ASCII_DROP).decode('ascii').split()
+    return NOT_LETTERS.sub('', text.lower()).split()
+
+
+def tokens(text, min_length=1, stop_words=frozenset()):
+    '''Generator of the words of text at least min_length letters long
+    that are not stop words.'''
+    for word in words(text):
+        if len(word) >= min_length and word not in stop_words:
+            yield word
+
+
+def shingles(words, size=2):
+    '''Generator of the runs of size consecutive words, joined by spaces.'''
+    if size == 2:
+        return map(' '.join, zip(words, words[1:]))
+    return map(' '.join, zip(*(words[i:] for i in range(size))))
+
+
+def count(words, min_length=1, stop_words=frozenset()):
+    '''(Counter of the words at least min_length letters long that are not
+    stop words, number of words at least min_length letters long).'''
+    if min_length > 1:
+        words = [word for word in words if len(word) >= min_length]
+    counts = Counter(words)
+    # dropped from the few distinct words rather than looked up for every word
+    for word in stop_words & counts.keys():
+        del counts[word]
+    return counts, len(words)
@@ -0,0 +1,94 @@
+from threading import Lock
+
+from url_filter import split_url
+
+# Templates are only judged after this many of their pages were downloaded.
+MIN_FETCHES = 10
+# Share of new pages under which a template is put on a budget.
+MIN_YIELD = 0.1
+# Downloads a template gets once it is on a budget, and how many more every
+# new page it still finds earns it.
+PROBES = 5
+NEW_PAGE_CREDIT = 2
+# Pages with fewer words than this add nothing new.
+LOW_INFO_WORDS = 50
+
+
+def url_template(url):
+    '''Shape of a url: its host, its path with every segment holding a
+    digit replaced by #, and the set of its query keys. The last segment
+    of a url with a query is replaced by * too, so the query variants of
+    every page of a wiki share one template.'''
+    _, netloc, path, query = split_url(url)
+    shape = ["#" if any(char.isdigit() for char in segment) else segment
+             for segment in path.split("/")]
+    keys = sorted({param.partition("=")[0] for param in query.split("&") if param})
+    if keys and shape:
+        shape[-1] = "*"
+    return f"{netloc}{'/'.join(shape)}?{'&'.join(keys)}"
+
+
+class Template(object):
+    __slots__ = ("fetched", "new", "budget", "skipped")
+
+    def __init__(self):
+        self.fetched = 0
+        self.new = 0
+        self.budget = None
+        self.skipped = 0
+
+
+class TemplateTracker(object):
+    '''Online trap detector. Every downloaded url is counted under its
+    url_template, with whether it added anything new: a page that is not a
+    duplicate or near duplicate of one crawled before and has at least
+    LOW_INFO_WORDS words. Once MIN_FETCHES pages of a template were
+    downloaded and less than min_yield of them were new, the template may
+    only be downloaded PROBES more times, plus NEW_PAGE_CREDIT for every new
+    page found after that. min_yield 0 turns the budgets off.'''
+    def __init__(self, min_yield=MIN_YIELD):
+        self.min_yield = min_yield
+        self.lock = Lock()
+        self.templates = {}
+
+    def observe(self, url, new):
+        ''' Count a downloaded url, new if it added anything. '''
+        key = url_template(url)
+        with self.lock:
+            template = self.templates.get(key)
+            if template is None:
+                template = self.templates[key] = Template()
+            template.fetched += 1
+            if new:
+                template.new += 1
+            if template.budget is not None:
+                if new:
+                    template.budget += NEW_PAGE_CREDIT
+            elif (template.fetched >= MIN_FETCHES
+                    and template.new < self.min_yield * template.fetched):
+                template.budget = template.fetched + PROBES
+
+    def allowed(self, url):
+        ''' Whether url may be downloaded, False once its template used up
+        its budget. '''
+        if not self.min_yield:
+            return True
+        template = self.templates.get(url_template(url))
+        if template is None or template.budget is None:
+            return True
+        if template.fetched < template.budget:
+            return True
+        with self.lock:
+            template.skipped += 1
+        return False
+
+    def budgeted(self):
+        ''' Number of templates on a budget. '''
+        with self.lock:
+            return sum(1 for template in self.templates.values()
+                       if template.budget is not None)
+
+    def skipped(self):
+        ''' Urls not downloaded because their template was out of budget. '''
+        with self.lock:
+            return sum(template.skipped for template in self.templates.values())
@@ -0,0 +1,164 @@
+import re
+from urllib.parse import urlparse, scheme_chars
+
+# Bump whenever the rules below change, so urls saved by an older version
+# are checked again when the crawler resumes.
+FILTER_VERSION = 1
+
+SCHEMES = frozenset(["http", "https"])
+SCHEME_CHARS = frozenset(scheme_chars)
+WEB_URL = re.compile(r"(https?)://([^/?#]*)([^?#]*)(?:\?([^#]*))?", re.IGNORECASE)
+
+# Paths ending in ".<extension>" are not web pages. The empty extension
+# rejects paths ending in a dot.
+EXTENSIONS = frozenset((
+    "css js bmp gif jpg jpeg ico "
+    "png tif tiff mid mp2 mp3 mp4 mpg "
+    "wav avi mov mpeg ram m4v mkv ogg ogv pdf "
+    "ps eps tex ppt pptx ppsx pps doc docx xls xlsx names "
+    "data dat exe bz2 tar msi bin 7z psd dmg iso "
+    "epub dll cnf tgz sha1 scm rkt "
+    "thmx mso arff rtf jar csv ff "
+    "ttf otf woff woff2 eot fon "
+    "img pkg exe msi sql db mdb log sqlite "
+    "cpp cc c h py pix bib war ini o a lib obj ini config "
+    "raw ods key odp ods numbers bat sh bak swp "
+    "rm smil wmv swf wma zip rar gz z xz lz tgz tbz apk ipa").split()) | {""}
+
+DOMAINS = ("ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu")
+DOMAIN_SUFFIXES = tuple("." + domain for domain in DOMAINS)
+TODAY_NETLOC = re.compile(r"^today\.uci\.edu/$")
+TODAY_PATH = re.compile(r"^department/information_computer_sciences/.*$")
+
+# calendar traps, login pages
+BANNED_PATHS = frozenset(["calendar", "pdf", "pix"])
+
+# xxxx-xx anywhere in the path or query, which also covers xxxx-xx-xx
+DATE_TRAP = re.compile(r"\b\d{4}-\d{2}\b")
+
+# query parameters of paging, revisions, sorting and alternate views,
+# where a site can generate urls without end
+TRAP_PARAMS = frozenset((
+    "page p offset start limit oldid diff rev revision version action do "
+    "replytocom share format sort order orderby view filter ical "
+    "tribe-bar-date").split())
+# path segments carrying a number of two digits or more
+NUMBERED = re.compile(r"\d{2,}")
+
+
+def valid_domain(netloc, path):
+    if netloc in DOMAINS or netloc.endswith(DOMAIN_SUFFIXES):
+        return True
+    return bool(TODAY_NETLOC.match(netloc) and TODAY_PATH.match(path))
+
+
+def is_trap(path, query):
+    '''return true if the url looks like a crawler trap'''
+    counts = {}
+    for segment in path.split('/'):
+        if segment in BANNED_PATHS:
+            return True
+        count = counts.get(segment, 0) + 1
+        if count > 2:
+            return True # repeated more than twice, repetitive path trap
+        counts[segment] = count
+
+    # path and query are checked in one pass, the separator keeps a date
+    # from matching across both and still counts as a word boundary
+    if DATE_TRAP.search(f"{path}\n{query}") is not None:
+        return True
+
+    # download links
+    return "action=download" in query
+
+
+def trap_score(path, query):
+    '''how much a url that passed is_trap still looks like one: one point
+    per numbered path segment, repeated word segment, paging or revision
+    query parameter and digit of its value, and for a long path or many
+    parameters, so urls sink the deeper they page'''
+    score = 0
+    seen = set()
+    for segment in path.split('/'):
+        if not segment:
+            continue
+        if segment in seen and not segment.isdigit():
+            score += 1
+        seen.add(segment)
+        if NUMBERED.search(segment):
+            score += 1
+    params = 0
+    for param in query.split('&'):
+        if not param:
+            continue
+        params += 1
+        name, _, value = param.partition('=')
+        if name.lower() in TRAP_PARAMS:
+            score += 1 + (len(value) if value.isdigit() else 0)
+    if params > 3:
+        score += 1
+    if len(path) > 100:
+        score += 1
+    return score
+
+
+def split_url(url):
+    '''(scheme, netloc, path, query) exactly as urlparse would return them
+    for http and https urls; only the scheme is filled in for other urls.
+    Printable ascii urls are split with one regex match, anything unusual
+    goes through urlparse.'''
+    if not (url.isascii() and url.isprintable()) or url[:1] == ' ':
+        parsed = urlparse(url)
+        return parsed.scheme, parsed.netloc, parsed.path, parsed.query
+
+    match = WEB_URL.match(url)
+    if match is None:
+        colon = url.find(':')
+        scheme = ''
+        if colon > 0 and url[0].isalpha() and SCHEME_CHARS.issuperset(url[:colon]):
+            scheme = url[:colon].lower()
+        if scheme not in SCHEMES:
+            return scheme, '', '', ''
+        parsed = urlparse(url)
+        return parsed.scheme, parsed.netloc, parsed.path, parsed.query
+
+    scheme, netloc, path, query = match.groups()
+    if '[' in netloc or ']' in netloc:
+        parsed = urlparse(url)
+        return parsed.scheme, parsed.netloc, parsed.path, parsed.query
+    if ';' in path:
+        # urlparse moves ;params of the last segment out of the path
+        semicolon = path.find(';', max(path.rfind('/'), 0))
+        if semicolon >= 0:
+            path = path[:semicolon]
+    return scheme.lower(), netloc, path, query or ''
+
+
+def check_url(url):
+    '''return true if url passes every rule of scraper.is_valid that does
+    not depend on the urls crawled so far'''
+    try:
+        scheme, netloc, path, query = split_url(url)
+    except ValueError:
+        return False
+    if scheme not in SCHEMES:
+        return False
+
+    if not valid_domain(netloc, path):
+        return False
+
+    lowered = path.lower()
+    dot = lowered.rfind('.')
+    if dot != -1 and lowered[dot + 1:] in EXTENSIONS:
+        return False
+
+    return not is_trap(path, query)
+
+
+def filter_urls(urls):
+    '''return the urls that pass check_url, in order and without repeats'''
+    verdicts = {}
+    for url in urls:
+        if url not in verdicts:
+            verdicts[url] = check_url(url)
+    return [url for url, valid in verdicts.items() if valid]
@@ -0,0 +1,136 @@
+import atexit
+import os
+import struct
+import zlib
+
+from threading import Lock
+
+import cbor
+
+from utils.response import Response
+
+MAGIC = b"CRAWLARCHIVE1\n"
+# flags, length of the url, length of the payload
+HEADER = struct.Struct(">BII")
+COMPRESSED = 1
+
+
+class ResponseArchive(object):
+    '''Append-only file of the cache server payloads of a crawl, keyed on
+    the url they were downloaded for.
+
+    After a short magic line, every record is a header (flags, url length,
+    payload length), the utf-8 url and the CBOR payload exactly as the
+    cache server sent it, zlib compressed when that makes it smaller. A
+    record cut short by a crash is dropped when the archive is opened for
+    recording, and skipped when it is opened `readonly` to be replayed,
+    which leaves the file as it is. The last record of a url wins.'''
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self.lock = Lock()
+        self.index = {}
+        if readonly:
+            self.file = open(path, "rb")
+            self._load()
+            return
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, "r+b" if exists else "w+b")
+        if exists:
+            self._load()
+        else:
+            self.file.write(MAGIC)
+            self.file.flush()
+
+    def _load(self):
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{self.path} is not a response archive")
+        end = os.path.getsize(self.path)
+        position = len(MAGIC)
+        while position + HEADER.size <= end:
+            self.file.seek(position)
+            flags, url_length, length = HEADER.unpack(self.file.read(HEADER.size))
+            start = position + HEADER.size + url_length
+            if start + length > end:
+                break
+            url = self.file.read(url_length).decode("utf-8")
+            self.index[url] = (start, length, flags)
+            position = start + length
+        if not self.readonly:
+            self.file.truncate(position)
+        self.file.seek(position)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, url):
+        return url in self.index
+
+    def urls(self):
+        ''' Every url in the order it was first recorded. '''
+        return list(self.index)
+
+    def record(self, url, payload):
+        compressed = zlib.compress(payload, 1)
+        flags = 0
+        if len(compressed) < len(payload):
+            payload, flags = compressed, COMPRESSED
+        encoded = url.encode("utf-8")
+        with self.lock:
+            self.file.seek(0, os.SEEK_END)
+            self.file.write(HEADER.pack(flags, len(encoded), len(payload)))
+            self.file.write(encoded)
+            start = self.file.tell()
+            self.file.write(payload)
+            self.index[url] = (start, len(payload), flags)
+
+    def get(self, url):
+        ''' The payload recorded for url, None if there is none. '''
+        with self.lock:
+            if url not in self.index:
+                return None
+            start, length, flags = self.index[url]
+            self.file.seek(start)
+            payload = self.file.read(length)
+        return zlib.decompress(payload) if flags & COMPRESSED else payload
+
+    def flush(self):
+        with self.lock:
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+
+
+_archives = {}
+_archives_lock = Lock()
+
+def open_archive(path, readonly=False):
+    ''' The one ResponseArchive of a path and mode in this process. '''
+    with _archives_lock:
+        if (path, readonly) not in _archives:
+            _archives[path, readonly] = ResponseArchive(path, readonly)
+        return _archives[path, readonly]
+
+def close_archives():
+    with _archives_lock:
+        for archive in _archives.values():
+            archive.close()
+        _archives.clear()
+
+atexit.register(close_archives)
+
+def replay(url, config, logger=None):
+    ''' Stand-in for utils.download.download answering from
+    config.replay_file instead of the cache server. '''
+    payload = open_archive(config.replay_file, readonly=True).get(url)
+    if payload is not None:
+        return Response(cbor.loads(payload))
+    if logger:
+        logger.error(f"No recorded response with url {url}.")
+    return Response({
+        "error": f"No recorded response with url {url}.",
+        "status": 404,
+        "url": url})
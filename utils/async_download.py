@@ -0,0 +1,139 @@
+import asyncio
+import cbor
+
+from urllib.parse import urlencode
+
+from utils.response import Response
+from utils.archive import open_archive, replay
+
+
+class CacheClient(object):
+    '''Downloads urls from the cache server over a pool of keep-alive
+    HTTP/1.1 connections shared by every coroutine of the async crawler.
+    Payloads over config.max_body bytes are not read: their connection is
+    dropped instead.'''
+    def __init__(self, config, max_connections=100):
+        self.config = config
+        self.host, self.port = config.cache_server or (None, None)
+        self.user_agent = config.user_agent
+        self.max_body = config.max_body
+        self.idle = list()
+        self.slots = asyncio.Semaphore(max_connections)
+
+    async def download(self, url, logger=None):
+        if self.config.replay_file:
+            return replay(url, self.config, logger)
+        status, body, size = await self._get(
+            [("q", f"{url}"), ("u", f"{self.user_agent}")])
+        if body is None:
+            if logger:
+                logger.error(f"Response of {size} bytes too large with url {url}.")
+            return Response.too_large(url, size, self.max_body)
+        try:
+            if status < 400 and body:
+                response = Response(cbor.loads(body))
+                if self.config.record_file:
+                    open_archive(self.config.record_file).record(url, body)
+                return response
+        except (EOFError, ValueError) as e:
+            pass
+        if logger:
+            logger.error(f"Spacetime Response error <{status}> with url {url}.")
+        return Response({
+            "error": f"Spacetime Response error <{status}> with url {url}.",
+            "status": status,
+            "url": url})
+
+    async def close(self):
+        while self.idle:
+            reader, writer = self.idle.pop()
+            writer.close()
+
+    async def _get(self, params):
+        request = (
+            f"GET /?{urlencode(params)} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            f"Connection: keep-alive\r\n\r\n").encode("utf-8")
+        async with self.slots:
+            while True:
+                reused = bool(self.idle)
+                if reused:
+                    reader, writer = self.idle.pop()
+                else:
+                    reader, writer = await asyncio.open_connection(
+                        self.host, self.port)
+                try:
+                    writer.write(request)
+                    await writer.drain()
+                    status, headers, body, size = await self._read_response(reader)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    if reused:
+                        # the server dropped an idle connection, try another
+                        continue
+                    raise
+                except BaseException:
+                    # a malformed reply or a timeout leaves the connection
+                    # in the middle of a response, it cannot be reused
+                    writer.close()
+                    raise
+                if body is None:
+                    # the rest of the body is still on the connection
+                    writer.close()
+                    return status, None, size
+                if headers.get("connection", "").lower() == "close":
+                    writer.close()
+                else:
+                    self.idle.append((reader, writer))
+                return status, body, size
+
+    async def _read_response(self, reader):
+        ''' (status, headers, body, size), with body None if the size is
+        over max_body, in which case size is as far as it was read. '''
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by cache server")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        limit = self.max_body or float("inf")
+        if "content-length" in headers:
+            length = int(headers["content-length"])
+            if length > limit:
+                return status, headers, None, length
+            body = await reader.readexactly(length)
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = list()
+            length = 0
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                length += size
+                if length > limit:
+                    return status, headers, None, length
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b"".join(chunks)
+        else:
+            # the body ends when the server closes the connection
+            headers["connection"] = "close"
+            chunks = list()
+            length = 0
+            while True:
+                chunk = await reader.read(1 << 16)
+                if not chunk:
+                    break
+                length += len(chunk)
+                if length > limit:
+                    return status, headers, None, length
+                chunks.append(chunk)
+            body = b"".join(chunks)
+        return status, headers, body, len(body)
@@ -0,0 +1,67 @@
+import math
+
+
+class BloomFilter(object):
+    ''' Fixed size bloom filter over keys that already are uniformly
+    distributed hashes, given as two integers (h1, h2). The k bit positions
+    are derived from them by double hashing instead of hashing again. '''
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+    def _positions(self, h1, h2):
+        size = self.size
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % size
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self._positions(*key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, key):
+        bits = self.bits
+        for position in self._positions(*key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+
+class ScalableBloomFilter(object):
+    ''' Bloom filter that adds a twice as large, twice as strict filter
+    whenever the current one is full (Almeida et al., 2007), until the
+    filters would need more than max_bytes. After that the last filter keeps
+    taking keys and its false positive rate grows instead of the memory. '''
+    def __init__(self, capacity=100000, error_rate=0.01, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        # the first filter gets half the error budget, the series sums to it
+        self.filters = [BloomFilter(capacity, error_rate / 2)]
+
+    @property
+    def nbytes(self):
+        return sum(bloom.nbytes for bloom in self.filters)
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    def __contains__(self, key):
+        return any(key in bloom for bloom in self.filters)
+
+    def add(self, key):
+        last = self.filters[-1]
+        if last.count >= last.capacity:
+            bigger = BloomFilter(last.capacity * 2, last.error_rate / 2)
+            if self.nbytes + bigger.nbytes <= self.max_bytes:
+                self.filters.append(bigger)
+                last = bigger
+        last.add(key)
@@ -1,3 +1,4 @@
+import os
 import re
 
 
@@ -8,12 +9,46 @@ class Config(object):
         assert self.user_agent != "DEFAULT AGENT", "Set useragent in config.ini"
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
+        self.concurrency = config["LOCAL PROPERTIES"].getint("CONCURRENCY", 100)
+        self.download_timeout = config["LOCAL PROPERTIES"].getfloat("DOWNLOADTIMEOUT", 60.0)
+        self.parsers = config["LOCAL PROPERTIES"].getint("PARSERS", 0)
+        self.nodes = [
+            (address.strip().rsplit(":", 1)[0], int(address.strip().rsplit(":", 1)[1]))
+            for address in config["LOCAL PROPERTIES"].get("NODES", "").split(",")
+            if address.strip()]
+        self.node = config["LOCAL PROPERTIES"].getint("NODE", 0)
+        # secret shared by the nodes, kept out of config.ini if set in the environment
+        self.shard_key = os.environ.get("CRAWLER_SHARD_KEY") or config["LOCAL PROPERTIES"].get("SHARDKEY", "")
+        self.stats_port = config["LOCAL PROPERTIES"].getint("STATSPORT", 0)
+        self.stats_file = config["LOCAL PROPERTIES"].get("STATSFILE", "")
+        self.stats_interval = config["LOCAL PROPERTIES"].getfloat("STATSINTERVAL", 10.0)
+        self.max_body = config["LOCAL PROPERTIES"].getint("MAXBODY", 10) << 20
+        self.record_file = config["LOCAL PROPERTIES"].get("RECORD", "")
+        self.replay_file = config["LOCAL PROPERTIES"].get("REPLAY", "")
+        self.log_size = config["LOCAL PROPERTIES"].getint("LOGSIZE", 50)
+        self.log_backups = config["LOCAL PROPERTIES"].getint("LOGBACKUPS", 10)
+        self.log_sample = config["LOCAL PROPERTIES"].getint("LOGSAMPLE", 1)
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.store = config["LOCAL PROPERTIES"].get("STORE", "sqlite")
+        self.commit_size = config["LOCAL PROPERTIES"].getint("COMMITSIZE", 1000)
+        self.commit_seconds = config["LOCAL PROPERTIES"].getfloat("COMMITINTERVAL", 1.0)
+        self.seen_capacity = config["LOCAL PROPERTIES"].getint("SEENCAPACITY", 100000)
+        self.seen_error_rate = config["LOCAL PROPERTIES"].getfloat("SEENERRORRATE", 0.01)
+        self.seen_memory = config["LOCAL PROPERTIES"].getint("SEENMEMORY", 64)
+        self.queue_window = config["LOCAL PROPERTIES"].getint("QUEUEWINDOW", 1000)
+        self.trap_yield = config["LOCAL PROPERTIES"].getfloat("TRAPYIELD", 0.1)
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        self.adaptive_delay = config["CRAWLER"].getboolean("ADAPTIVEDELAY", True)
+        self.robots = config["CRAWLER"].getboolean("ROBOTS", True)
+        self.robots_ttl = config["CRAWLER"].getfloat("ROBOTSTTL", 86400.0)
+        self.sitemaps = config["CRAWLER"].getboolean("SITEMAPS", True)
+        self.recrawl_interval = config["CRAWLER"].getfloat("RECRAWLINTERVAL", 86400.0)
+        # set by launch.py --recrawl
+        self.recrawl = False
 
         self.cache_server = None
\ No newline at end of file
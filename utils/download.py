@@ -2,16 +2,67 @@ import requests
 import cbor
 import time
 
+from threading import local
+
 from utils.response import Response
+from utils.archive import open_archive, replay
+
+# One keep-alive session per worker thread, requests.Session is not
+# guaranteed to be thread safe.
+_sessions = local()
+
+def _get_session():
+    if not hasattr(_sessions, "session"):
+        _sessions.session = requests.Session()
+    return _sessions.session
+
+def _content_length(resp):
+    ''' Content-Length of resp, or None if it is missing or malformed. '''
+    try:
+        length = int(resp.headers.get("Content-Length"))
+    except (TypeError, ValueError):
+        return None
+    return length if length >= 0 else None
+
+def _read_capped(resp, limit):
+    ''' Body of a streamed response, or None without reading the rest once
+    it is known to be over limit bytes (0 for no limit). '''
+    if not limit:
+        return resp.content
+    length = _content_length(resp)
+    if length is not None and length > limit:
+        resp.close()
+        return None
+    chunks = list()
+    size = 0
+    for chunk in resp.iter_content(1 << 16):
+        size += len(chunk)
+        if size > limit:
+            resp.close()
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
 
 def download(url, config, logger=None):
+    if config.replay_file:
+        return replay(url, config, logger)
     host, port = config.cache_server
-    resp = requests.get(
+    resp = _get_session().get(
         f"http://{host}:{port}/",
-        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+        params=[("q", f"{url}"), ("u", f"{config.user_agent}")], stream=True,
+        timeout=config.download_timeout)
+    content = _read_capped(resp, config.max_body)
+    if content is None:
+        size = _content_length(resp) or config.max_body + 1
+        if logger:
+            logger.error(f"Response of {size} bytes too large with url {url}.")
+        return Response.too_large(url, size, config.max_body)
     try:
-        if resp and resp.content:
-            return Response(cbor.loads(resp.content))
+        if resp and content:
+            response = Response(cbor.loads(content))
+            if config.record_file:
+                open_archive(config.record_file).record(url, content)
+            return response
     except (EOFError, ValueError) as e:
         pass
     logger.error(f"Spacetime Response error {resp} with url {url}.")
@@ -0,0 +1,185 @@
+import atexit
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from collections import Counter
+from threading import Lock
+
+# What a download of a page found, compared to the last one.
+NEW, UNCHANGED, CHANGED = "new", "unchanged", "changed"
+
+# Bounds of the time between two visits of a page, as multiples of the
+# interval every page starts with. It doubles every time the page is found
+# unchanged and halves when it changed.
+MIN_INTERVAL = 1 / 24
+MAX_INTERVAL = 30
+
+
+class PageHistory(object):
+    ''' What the crawler knows about every page it downloaded, kept across
+    crawls for an incremental recrawl: the ETag and Last-Modified headers
+    and a digest of the content to tell whether it changed, the page's
+    simhash and word counts to replace them when it did, and when the page
+    is due to be visited again. Every page recorded by the scraper also
+    gets its normalized hash and the next number of a sequence, so the
+    report can read only what was recorded since its last run.
+
+    Like the sqlite save file, writes go into a transaction committed once
+    it holds `commit_size` writes or is `commit_seconds` old. '''
+    def __init__(self, path, interval=86400.0, commit_size=1000, commit_seconds=1.0):
+        self.path = path
+        self.interval = interval
+        self.commit_size = commit_size
+        self.commit_seconds = commit_seconds
+        self.lock = Lock()
+        self.db = None
+        self.uncommitted = 0
+        self.last_commit = time.monotonic()
+        self.outcomes = Counter()
+        self.sequence = 0
+
+    @staticmethod
+    def delete(path="pages.db"):
+        for name in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(name):
+                os.remove(name)
+
+    def _open(self):
+        if self.db is not None:
+            return
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+                "digest BLOB, simhash BLOB, counts BLOB, "
+                "visited REAL NOT NULL, interval REAL NOT NULL, "
+                "due REAL NOT NULL, changes INTEGER NOT NULL DEFAULT 0, "
+                "visits INTEGER NOT NULL DEFAULT 1, urlhash BLOB, recorded INTEGER)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS pages_due ON pages (due)")
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS pages_recorded ON pages (recorded)")
+        self.sequence = self.db.execute(
+            "SELECT COALESCE(MAX(recorded), 0) FROM pages").fetchone()[0]
+        atexit.register(self.close)
+
+    def _wrote(self):
+        self.uncommitted += 1
+        if (self.uncommitted >= self.commit_size or
+                time.monotonic() - self.last_commit >= self.commit_seconds):
+            self._commit()
+
+    def _commit(self):
+        self.db.commit()
+        self.uncommitted = 0
+        self.last_commit = time.monotonic()
+
+    def visit(self, url, etag, last_modified, digest, now=None):
+        ''' Record a download of url and return NEW, UNCHANGED or CHANGED.
+        The page is unchanged if its ETag or Last-Modified header is the
+        one seen last time, or else its content digest is. '''
+        if now is None:
+            now = time.time()
+        with self.lock:
+            self._open()
+            row = self.db.execute(
+                "SELECT etag, last_modified, digest, interval FROM pages "
+                "WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                outcome = NEW
+                interval = self.interval
+                self.db.execute(
+                    "INSERT INTO pages (url, etag, last_modified, digest, "
+                    "visited, interval, due) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (url, etag, last_modified, digest, now, interval, now + interval))
+            else:
+                old_etag, old_modified, old_digest, interval = row
+                if etag and old_etag:
+                    same = etag == old_etag
+                elif last_modified and old_modified:
+                    same = last_modified == old_modified
+                else:
+                    same = digest == old_digest
+                if same:
+                    outcome = UNCHANGED
+                    interval = min(MAX_INTERVAL * self.interval, interval * 2)
+                else:
+                    outcome = CHANGED
+                    interval = max(MIN_INTERVAL * self.interval, interval / 2)
+                self.db.execute(
+                    "UPDATE pages SET etag = ?, last_modified = ?, digest = ?, "
+                    "visited = ?, interval = ?, due = ?, visits = visits + 1, "
+                    "changes = changes + ? WHERE url = ?",
+                    (etag, last_modified, digest, now, interval, now + interval,
+                     outcome == CHANGED, url))
+            self.outcomes[outcome] += 1
+            self._wrote()
+            return outcome
+
+    def record(self, url, simhash, counts, urlhash):
+        ''' Remember the simhash, word counts (a Counter or None) and
+        normalized hash (hex) of the version of url just recorded by the
+        scraper. '''
+        blob = zlib.compress(json.dumps(counts or {}).encode("utf-8"))
+        with self.lock:
+            self._open()
+            self.sequence += 1
+            self.db.execute(
+                "UPDATE pages SET simhash = ?, counts = ?, urlhash = ?, "
+                "recorded = ? WHERE url = ?",
+                (simhash.to_bytes(8, "big"), blob, bytes.fromhex(urlhash),
+                 self.sequence, url))
+            self._wrote()
+
+    def previous(self, url):
+        ''' (simhash, Counter of words) recorded for the last version of
+        url, None if there is none. '''
+        with self.lock:
+            self._open()
+            row = self.db.execute(
+                "SELECT simhash, counts FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return (int.from_bytes(row[0], "big"),
+                Counter(json.loads(zlib.decompress(row[1]))))
+
+    def recorded(self, after=0, batch=10000):
+        ''' Iterate over (sequence, url, normalized hash as bytes) of the
+        pages recorded after sequence number `after`, in order. Reads
+        batch rows at a time. '''
+        while True:
+            with self.lock:
+                self._open()
+                rows = self.db.execute(
+                    "SELECT recorded, url, urlhash FROM pages WHERE recorded > ? "
+                    "ORDER BY recorded LIMIT ?", (after, batch)).fetchall()
+            yield from rows
+            if len(rows) < batch:
+                return
+            after = rows[-1][0]
+
+    def due(self, now=None):
+        ''' Every url due for a visit. '''
+        if now is None:
+            now = time.time()
+        with self.lock:
+            self._open()
+            return [url for url, in self.db.execute(
+                "SELECT url FROM pages WHERE due <= ? ORDER BY due", (now,))]
+
+    def flush(self):
+        with self.lock:
+            if self.db is not None:
+                self._commit()
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self._commit()
+                self.db.close()
+                self.db = None
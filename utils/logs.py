@@ -0,0 +1,172 @@
+import atexit
+import gzip
+import logging
+import os
+import shutil
+
+from itertools import count
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from threading import Lock
+
+LOG_DIR = "Logs"
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Passed as extra= on messages logged once per url, which are sampled.
+PER_URL = {"per_url": True}
+
+# Set from config.ini by configure_logging.
+settings = {"max_bytes": 50 << 20, "backups": 10, "sample": 1}
+
+
+class _PerUrlSampler(logging.Filter):
+    '''Keeps one in settings["sample"] of the INFO messages logged with
+    PER_URL, and every other message.'''
+    def __init__(self):
+        super().__init__()
+        self.counter = count()
+
+    def filter(self, record):
+        if record.levelno > logging.INFO or not getattr(record, "per_url", False):
+            return True
+        return next(self.counter) % settings["sample"] == 0
+
+
+class _LogfileHandler(QueueHandler):
+    '''Puts records on the shared queue, tagged with the file they go to.
+    Unlike QueueHandler it neither formats nor copies the record in the
+    logging thread: the messages are already strings, and a record only
+    ever goes to this one handler.'''
+    def __init__(self, queue, logfile):
+        super().__init__(queue)
+        self.logfile = logfile
+
+    def prepare(self, record):
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = _formatter.formatException(record.exc_info)
+            record.exc_info = None
+        record.logfile = self.logfile
+        return record
+
+
+class _ArchivingFileHandler(logging.FileHandler):
+    '''Appends to a log file without flushing after every record, and
+    rotates it into gzipped archives <file>.1.gz, <file>.2.gz ... once it
+    holds max_bytes.'''
+    def __init__(self, filename, max_bytes, backups):
+        super().__init__(filename)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.size = self.stream.tell()
+
+    def emit(self, record):
+        try:
+            line = self.format(record) + self.terminator
+            self.stream.write(line)
+            self.size += len(line)
+            if self.max_bytes and self.size >= self.max_bytes:
+                self.rotate()
+        except Exception:
+            self.handleError(record)
+
+    def rotate(self):
+        self.stream.close()
+        for number in range(self.backups - 1, 0, -1):
+            older = f"{self.baseFilename}.{number}.gz"
+            if os.path.exists(older):
+                os.replace(older, f"{self.baseFilename}.{number + 1}.gz")
+        if self.backups:
+            with open(self.baseFilename, "rb") as f, \
+                    gzip.open(f"{self.baseFilename}.1.gz", "wb") as archive:
+                shutil.copyfileobj(f, archive)
+        os.remove(self.baseFilename)
+        self.stream = self._open()
+        self.size = 0
+
+
+class _FileRouter(logging.Handler):
+    '''Writes every record to Logs/<record.logfile>.log. Files are flushed
+    whenever the writer has caught up with the queue. Only used from the
+    writer thread.'''
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.files = {}
+
+    def emit(self, record):
+        handler = self.files.get(record.logfile)
+        if handler is None:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            handler = _ArchivingFileHandler(
+                os.path.join(LOG_DIR, f"{record.logfile}.log"),
+                settings["max_bytes"], settings["backups"])
+            handler.setFormatter(_formatter)
+            self.files[record.logfile] = handler
+        handler.handle(record)
+        if _queue.empty():
+            self.flush()
+
+    def flush(self):
+        for handler in self.files.values():
+            handler.flush()
+
+    def close(self):
+        for handler in self.files.values():
+            handler.close()
+        super().close()
+
+
+_formatter = logging.Formatter(FORMAT)
+_queue = SimpleQueue()
+_listener = None
+_sampler = _PerUrlSampler()
+_lock = Lock()
+
+
+def _start_listener():
+    global _listener
+    console = logging.StreamHandler()
+    console.setLevel(logging.INFO)
+    console.setFormatter(_formatter)
+    files = _FileRouter()
+    _listener = QueueListener(_queue, console, files, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def get_logger(name, filename=None):
+    ''' Logger that hands its records to a single background writer, which
+    prints them and appends them to Logs/<filename or name>.log. Asking
+    for the same name again returns the same logger without adding
+    handlers. '''
+    logger = logging.getLogger(name)
+    with _lock:
+        if _listener is None:
+            _start_listener()
+        if not any(isinstance(handler, _LogfileHandler)
+                   for handler in logger.handlers):
+            logger.setLevel(logging.INFO)
+            handler = _LogfileHandler(_queue, filename if filename else name)
+            handler.addFilter(_sampler)
+            logger.addHandler(handler)
+            logger.propagate = False
+    return logger
+
+
+def configure_logging(config):
+    settings["max_bytes"] = config.log_size << 20
+    settings["backups"] = config.log_backups
+    settings["sample"] = max(1, config.log_sample)
+
+
+def stop_logging():
+    ''' Write out every queued record and stop the writer. '''
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
@@ -0,0 +1,68 @@
+import atexit
+import glob
+import os
+import shelve
+import time
+
+from threading import Lock
+
+
+class PageCache(object):
+    ''' cache.shelve: the normalized hash of every page recorded, mapped to
+    (url, simhash).
+
+    The shelf is opened once and kept open for the crawl rather than
+    opened and closed for every page, which rewrites the index of a
+    dbm.dumb shelf each time. It is synced once it holds `sync_size`
+    unsynced writes or they are `sync_seconds` old, and on close. '''
+    def __init__(self, path, sync_size=1000, sync_seconds=1.0):
+        self.path = path
+        self.sync_size = sync_size
+        self.sync_seconds = sync_seconds
+        self.lock = Lock()
+        self.shelf = None
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    @staticmethod
+    def exists(path="cache.shelve"):
+        # dbm.dumb and dbm.ndbm add suffixes to the name
+        return bool(glob.glob(glob.escape(path) + "*"))
+
+    @staticmethod
+    def delete(path="cache.shelve"):
+        for name in [path] + [path + suffix for suffix in (".db", ".dat", ".dir", ".bak")]:
+            if os.path.exists(name):
+                os.remove(name)
+
+    def _open(self):
+        if self.shelf is None:
+            self.shelf = shelve.open(self.path)
+            atexit.register(self.close)
+
+    def recorded(self, urlhash):
+        ''' Whether a page with this normalized hash was recorded. '''
+        with self.lock:
+            self._open()
+            entry = self.shelf.get(urlhash)
+            return entry is not None and entry[1] is not None
+
+    def put(self, urlhash, url, simhash):
+        with self.lock:
+            self._open()
+            self.shelf[urlhash] = (url, simhash)
+            self.unsynced += 1
+            if (self.unsynced >= self.sync_size or
+                    time.monotonic() - self.last_sync >= self.sync_seconds):
+                self._sync()
+
+    def _sync(self):
+        self.shelf.sync()
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            if self.shelf is not None:
+                self.shelf.close()
+                self.shelf = None
@@ -1,14 +1,50 @@
 import pickle
 
+# Status given to downloads whose cache server payload is over the size cap.
+TOO_LARGE = 413
+
+_UNSET = object()
+
 class Response(object):
     def __init__(self, resp_dict):
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
-        try:
-            self.raw_response = (
-                pickle.loads(resp_dict["response"])
-                if "response" in resp_dict else
-                None)
-        except TypeError:
-            self.raw_response = None
+        # unpickled on first use, pages that are skipped on their status
+        # never pay for it
+        self._pickled = resp_dict.get("response")
+        self._raw_response = _UNSET
+
+    @property
+    def raw_response(self):
+        if self._raw_response is _UNSET:
+            try:
+                self._raw_response = (
+                    pickle.loads(self._pickled)
+                    if self._pickled is not None else
+                    None)
+            except TypeError:
+                self._raw_response = None
+            self._pickled = None
+        return self._raw_response
+
+    @property
+    def content_type(self):
+        ''' Lowercase media type of the Content-Type header without its
+        parameters, '' if there is none. '''
+        raw = self.raw_response
+        if raw is None:
+            return ''
+        return raw.headers.get("Content-Type", "").split(";")[0].strip().lower()
+
+    @property
+    def body(self):
+        ''' The content as a memoryview, so stages can slice it without
+        copying. Empty without a raw response. '''
+        raw = self.raw_response
+        return memoryview(raw.content if raw is not None and raw.content else b"")
+
+    @classmethod
+    def too_large(cls, url, size, limit):
+        error = f"Response of {size} bytes over the limit of {limit} bytes with url {url}."
+        return cls({"error": error, "status": TOO_LARGE, "url": url})
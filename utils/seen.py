@@ -0,0 +1,145 @@
+import atexit
+import os
+import pickle
+import sqlite3
+
+from threading import Lock
+
+from utils.bloom import ScalableBloomFilter
+
+
+class SeenSet(object):
+    ''' Set of normalized url hashes (sha256 hex digests) the crawler has
+    already queued.
+
+    A bloom filter in memory answers "definitely new" without touching the
+    disk; new hashes are inserted into it and buffered for the exact set in
+    a sqlite database, written in batches. Only a "probably seen" answer
+    from the filter is confirmed against the exact set, so the result is
+    always exact. The filter is saved next to the database on close and
+    reloaded on resume, together with the hashes written after the save.
+
+    A deferred set holds every new hash until release(), and only writes
+    released hashes in flush(). The frontier releases a hash once its url
+    is written to the store and flushes after the store commits, so a url
+    never reads as seen on resume without being in the save file. On close
+    the released hashes are written and those still held are dropped: on
+    resume their urls read as unseen again. The set is closed at exit
+    after any store created later, so the store has committed by then.
+    '''
+    def __init__(self, path, capacity=100000, error_rate=0.01,
+                 max_bytes=64 << 20, batch_size=1000, deferred=False):
+        self.path = path
+        self.snapshot = path + ".bloom"
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.deferred = deferred
+        self.lock = Lock()
+        self.bloom = None
+        self.buffer = set()
+        # hashes in buffer that must not be written yet
+        self.held = set()
+        self.db = None
+        atexit.register(self.close)
+
+    @classmethod
+    def from_config(cls, config, path="seen.db", deferred=False):
+        return cls(path, config.seen_capacity, config.seen_error_rate,
+                   config.seen_memory << 20, deferred=deferred)
+
+    @staticmethod
+    def delete(path="seen.db"):
+        for name in (path, path + "-wal", path + "-shm", path + ".bloom"):
+            if os.path.exists(name):
+                os.remove(name)
+
+    def _open(self):
+        if self.db is not None:
+            return
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS seen (hash BLOB PRIMARY KEY)")
+        self.bloom, saved_until = None, 0
+        if os.path.exists(self.snapshot):
+            with open(self.snapshot, "rb") as f:
+                self.bloom, saved_until = pickle.load(f)
+            # the snapshot is stale as soon as new hashes are written
+            os.remove(self.snapshot)
+        if self.bloom is None:
+            self.bloom = ScalableBloomFilter(
+                self.capacity, self.error_rate, self.max_bytes)
+        for digest, in self.db.execute(
+                "SELECT hash FROM seen WHERE rowid > ?", (saved_until,)):
+            self.bloom.add(_key(digest))
+
+    def _flush(self):
+        if len(self.buffer) > len(self.held):
+            with self.db:
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO seen (hash) VALUES (?)",
+                    ((digest,) for digest in self.buffer - self.held))
+            self.buffer = set(self.held)
+
+    def add(self, urlhash):
+        ''' Remember urlhash. Returns False if it was seen before. '''
+        digest = bytes.fromhex(urlhash)
+        key = _key(digest)
+        with self.lock:
+            self._open()
+            if key in self.bloom:
+                # probably seen, ask the exact set
+                if digest in self.buffer or self.db.execute(
+                        "SELECT 1 FROM seen WHERE hash = ?", (digest,)).fetchone():
+                    return False
+            self.bloom.add(key)
+            self.buffer.add(digest)
+            if self.deferred:
+                self.held.add(digest)
+            elif len(self.buffer) >= self.batch_size:
+                self._flush()
+            return True
+
+    def release(self, urlhash):
+        ''' Let a deferred set write urlhash with the next flush. '''
+        with self.lock:
+            self.held.discard(bytes.fromhex(urlhash))
+
+    def flush(self):
+        ''' Write the released hashes once there are batch_size of them. '''
+        with self.lock:
+            if self.db is not None and \
+                    len(self.buffer) - len(self.held) >= self.batch_size:
+                self._flush()
+
+    def __contains__(self, urlhash):
+        digest = bytes.fromhex(urlhash)
+        with self.lock:
+            self._open()
+            if _key(digest) not in self.bloom:
+                return False
+            return digest in self.buffer or self.db.execute(
+                "SELECT 1 FROM seen WHERE hash = ?", (digest,)).fetchone() is not None
+
+    def close(self):
+        with self.lock:
+            if self.db is None:
+                return
+            self._flush()
+            # held hashes may belong to urls the store never wrote
+            self.buffer, self.held = set(), set()
+            saved_until = self.db.execute(
+                "SELECT MAX(rowid) FROM seen").fetchone()[0] or 0
+            with open(self.snapshot, "wb") as f:
+                pickle.dump((self.bloom, saved_until), f, pickle.HIGHEST_PROTOCOL)
+            self.db.close()
+            self.db = None
+            self.bloom = None
+
+
+def _key(digest):
+    return (int.from_bytes(digest[:8], "big"),
+            int.from_bytes(digest[8:16], "big"))
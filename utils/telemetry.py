@@ -0,0 +1,245 @@
+import json
+import os
+import time
+
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread, Lock, Event
+
+# Upper bounds in seconds of the latency buckets, 10us to ~100s.
+BUCKETS = tuple(10 ** (exponent / 4) for exponent in range(-20, 9))
+# Seconds over which the recent pages per second and host rates are taken.
+RATE_WINDOW = 60.0
+
+
+class Histogram(object):
+    '''Counts of observations per bucket, as in a Prometheus histogram.'''
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        ''' Upper bound of the bucket holding the q-th quantile. '''
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99)}
+
+
+class Rate(object):
+    '''Events per second over the last `window` seconds.'''
+    def __init__(self, window=RATE_WINDOW):
+        self.window = window
+        self.times = deque()
+        self.total = 0
+
+    def mark(self, now):
+        self.times.append(now)
+        self.total += 1
+        self._expire(now)
+
+    def _expire(self, now):
+        while self.times and self.times[0] < now - self.window:
+            self.times.popleft()
+
+    def per_second(self, now, started):
+        self._expire(now)
+        return len(self.times) / max(min(self.window, now - started), 1e-9)
+
+
+class Telemetry(object):
+    '''Per-stage latency histograms, page and per-host fetch rates, and
+    gauges such as queue depths, for the whole crawler process. Every
+    update is an in-memory increment under one short lock; the numbers are
+    only formatted when a snapshot is asked for.'''
+    def __init__(self):
+        self.lock = Lock()
+        self.started = time.monotonic()
+        self.stages = {}
+        self.pages = Rate()
+        self.hosts = {}
+        self.gauges = {}
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    @contextmanager
+    def locked(self, lock, stage):
+        ''' Acquire lock, recording the wait as "<stage>_wait" and the time
+        it is held as stage. '''
+        start = time.perf_counter()
+        with lock:
+            acquired = time.perf_counter()
+            self.observe(f"{stage}_wait", acquired - start)
+            try:
+                yield
+            finally:
+                self.observe(stage, time.perf_counter() - acquired)
+
+    def fetched(self, host):
+        now = time.monotonic()
+        with self.lock:
+            self.pages.mark(now)
+            rate = self.hosts.get(host)
+            if rate is None:
+                rate = self.hosts[host] = Rate()
+            rate.mark(now)
+
+    def gauge(self, name, read):
+        ''' Report read() as name in every snapshot. '''
+        self.gauges[name] = read
+
+    def snapshot(self):
+        gauges = {name: read() for name, read in list(self.gauges.items())}
+        now = time.monotonic()
+        with self.lock:
+            return {
+                "uptime": now - self.started,
+                "pages": self.pages.total,
+                "pages_per_second": self.pages.per_second(now, self.started),
+                "stages": {stage: histogram.snapshot()
+                           for stage, histogram in self.stages.items()},
+                "hosts": {host: {"pages": rate.total,
+                                 "per_second": rate.per_second(now, self.started)}
+                          for host, rate in self.hosts.items()},
+                "gauges": gauges}
+
+    def prometheus(self):
+        ''' Every metric in the Prometheus text exposition format. '''
+        gauges = {name: read() for name, read in list(self.gauges.items())}
+        now = time.monotonic()
+        lines = []
+        with self.lock:
+            lines.append("# TYPE crawler_stage_seconds histogram")
+            for stage, histogram in self.stages.items():
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f'crawler_stage_seconds_bucket{{stage="{stage}",le="{bound:.6g}"}} {cumulative}')
+                lines.append(
+                    f'crawler_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'crawler_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'crawler_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            lines.append("# TYPE crawler_pages_total counter")
+            lines.append(f"crawler_pages_total {self.pages.total}")
+            lines.append("# TYPE crawler_pages_per_second gauge")
+            lines.append(
+                f"crawler_pages_per_second {self.pages.per_second(now, self.started)}")
+            lines.append("# TYPE crawler_host_pages_total counter")
+            for host, rate in self.hosts.items():
+                lines.append(f'crawler_host_pages_total{{host="{host}"}} {rate.total}')
+        for name, value in gauges.items():
+            lines.append(f"# TYPE crawler_{name} gauge")
+            lines.append(f"crawler_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+telemetry = Telemetry()
+
+
+class StatsServer(ThreadingHTTPServer):
+    '''Serves /metrics in the Prometheus text format and /stats as JSON.'''
+    daemon_threads = True
+
+    def __init__(self, telemetry, host="127.0.0.1", port=0):
+        self.telemetry = telemetry
+        super().__init__((host, port), _StatsHandler)
+
+    def start(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address
+
+
+class _StatsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = self.server.telemetry.prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        elif self.path == "/stats":
+            body = json.dumps(self.server.telemetry.snapshot()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Reporter(object):
+    '''Serves telemetry on config.stats_port and writes a JSON snapshot to
+    config.stats_file every config.stats_interval seconds, when set.'''
+    def __init__(self, config, telemetry=telemetry):
+        self.config = config
+        self.telemetry = telemetry
+        self.server = None
+        self.stopped = Event()
+
+    def start(self):
+        if self.config.stats_port:
+            # every node of a sharded crawl on one machine gets its own port
+            self.server = StatsServer(
+                self.telemetry, port=self.config.stats_port + self.config.node)
+            self.server.start()
+        if self.config.stats_file:
+            Thread(target=self._write_loop, daemon=True).start()
+
+    def _write_loop(self):
+        while not self.stopped.wait(self.config.stats_interval):
+            self.write()
+
+    def write(self):
+        ''' Replace the snapshot file in one step, so readers never see
+        half of it. '''
+        partial = self.config.stats_file + ".tmp"
+        with open(partial, "w") as f:
+            json.dump(self.telemetry.snapshot(), f, indent=1)
+        os.replace(partial, self.config.stats_file)
+
+    def stop(self):
+        self.stopped.set()
+        if self.config.stats_file:
+            self.write()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()